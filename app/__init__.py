@@ -1,5 +1,6 @@
 from flask import Flask
 from .extensions import db, migrate
+from .json import OrjsonProvider
 from .customer import customer_bp
 from .subscription import subscription_bp
 from .publication import publication_bp
@@ -7,19 +8,33 @@ from .delivery import delivery_bp
 from .carrier import carrier_bp
 from .location import location_bp
 from .auth import auth_bp
+from .admin import admin_bp
+from .telemetry import telemetry_bp
+from .events import events_bp
 from flask_login import LoginManager
 from flask import jsonify
-from .models import User
+from .models import Location
+from .auth.utils import hasher, load_session_user
+from .location.index import location_index
+from .cache import cache
+from .engine import engine_options, configure_engine
+from .replicas import replicas
+from .telemetry.positions import positions
+from .events.hub import hub
+from .subscription.lifecycle import lifecycle
+from .delivery.partition import pool as dispatch_pool
 
 login_manager = LoginManager()
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # served from the cache: no query per authenticated request
+    return load_session_user(int(user_id))
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object('config.Config')
+    app.json = OrjsonProvider(app)
 
     login_manager.init_app(app)
 
@@ -27,9 +42,21 @@ def create_app():
     def unauthorized():
         return jsonify({'message': 'Unauthorized access'}), 401
 
+    # pool sizing for the engine; explicit SQLALCHEMY_ENGINE_OPTIONS win
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+
     # initialize extensions
     db.init_app(app)
     migrate.init_app(app, db) 
+    replicas.init_app(app)
+    cache.init_app(app)
+    hasher.init_app(app)
+    positions.init_app(app)
+    hub.init_app(app)
+    lifecycle.init_app(app)
+    dispatch_pool.init_app(app)
 
     # register blueprints
     app.register_blueprint(customer_bp)
@@ -39,7 +66,16 @@ def create_app():
     app.register_blueprint(carrier_bp)
     app.register_blueprint(location_bp)
     app.register_blueprint(auth_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(telemetry_bp)
+    app.register_blueprint(events_bp)
 
     with app.app_context():
+        # SQLite pragmas on every connection, including the ones below
+        configure_engine(db.engine, app.config)
         db.create_all()
+
+        # build the nearest-neighbour index over all known locations
+        location_index.cell_size = app.config['LOCATION_INDEX_CELL_SIZE']
+        location_index.rebuild(db.session.execute(db.select(Location.id, Location.latitude, Location.longitude)))
     return app
\ No newline at end of file
@@ -0,0 +1,68 @@
+from flask import jsonify
+from flask_login import login_required
+from . import admin_bp
+from app.extensions import db
+from app.cache import cache
+from app.engine import pool_stats, read_pragmas
+from app.asgi.database import async_db
+from app.replicas import replicas
+from app.telemetry.positions import positions
+from app.events.hub import hub
+from app.subscription.lifecycle import lifecycle
+
+
+@admin_bp.route('/cache', methods=['GET'])
+@login_required
+def get_cache_stats():
+    return jsonify(cache.stats()), 200
+
+
+@admin_bp.route('/cache', methods=['DELETE'])
+@login_required
+def clear_cache():
+    cache.clear()
+    return jsonify({'message': 'Cache cleared'}), 200
+
+
+@admin_bp.route('/database', methods=['GET'])
+@login_required
+def get_database_stats():
+    stats = {'engine': pool_stats(db.engine), 'replicas': [
+        dict(replica.stats(), **pool_stats(replica.engine)) for replica in replicas.replicas
+    ]}
+    if db.engine.dialect.name == 'sqlite':
+        stats['pragmas'] = read_pragmas(db.session.connection())
+    # the async views' engine, when served through asgi.py
+    if async_db.engine is not None:
+        stats['async_engine'] = pool_stats(async_db.engine.sync_engine)
+    return jsonify(stats), 200
+
+
+@admin_bp.route('/events', methods=['GET'])
+@login_required
+def get_event_stats():
+    return jsonify(hub.stats()), 200
+
+
+@admin_bp.route('/telemetry', methods=['GET'])
+@login_required
+def get_telemetry_stats():
+    return jsonify(positions.stats()), 200
+
+
+@admin_bp.route('/telemetry/flush', methods=['POST'])
+@login_required
+def flush_telemetry():
+    return jsonify({'message': 'Positions flushed', 'carriers': positions.flush()}), 200
+
+
+@admin_bp.route('/subscriptions/lifecycle', methods=['GET'])
+@login_required
+def get_lifecycle_stats():
+    return jsonify(lifecycle.stats()), 200
+
+
+@admin_bp.route('/subscriptions/lifecycle', methods=['POST'])
+@login_required
+def run_lifecycle():
+    return jsonify({'message': 'Subscriptions processed', 'counts': lifecycle.run_once()}), 200
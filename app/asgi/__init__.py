@@ -0,0 +1,75 @@
+from werkzeug.exceptions import HTTPException
+
+from app.extensions import db
+
+# ASGI entry point (asgi.py at the repository root; `hypercorn asgi:app`).
+#
+# The read-heavy endpoints of customers, carriers, locations and deliveries
+# are served by async views on a Quart app, querying through an AsyncSession
+# (aiosqlite or asyncpg, see database.py) so a slow query parks a coroutine
+# rather than a worker thread. Every other request, including methods the
+# async blueprints do not define, is handed to the regular Flask app running
+# in the server's thread pool, so the API is the same in both modes and the
+# WSGI entry point (run.py) is untouched.
+#
+# Both apps live in one process and share the reference cache, the location
+# index, the telemetry positions and the live event hub. Needs quart,
+# hypercorn and aiosqlite (or asyncpg for PostgreSQL).
+
+
+class Dispatcher:
+    def __init__(self, async_app, wsgi_app):
+        # optional dependency, only needed in ASGI mode
+        from hypercorn.middleware import AsyncioWSGIMiddleware
+
+        self.async_app = async_app
+        self.wsgi_app = AsyncioWSGIMiddleware(wsgi_app)
+        self.async_routes = async_app.url_map.bind('')
+
+    async def __call__(self, scope, receive, send):
+        # lifespan events go to Quart, which opens and closes the async engine
+        if scope['type'] == 'http' and not self.is_async(scope['path'], scope['method']):
+            return await self.wsgi_app(scope, receive, send)
+        return await self.async_app(scope, receive, send)
+
+    def is_async(self, path, method):
+        try:
+            self.async_routes.match(path, method)
+        except HTTPException:
+            # not found, wrong method or a trailing-slash redirect: the Flask
+            # app knows every route and answers those itself
+            return False
+        return True
+
+
+def create_asgi_app():
+    from app import create_app
+    # optional dependency, only needed in ASGI mode
+    from quart import Quart
+    from quart.json.provider import JSONProvider
+    from app.json import OrjsonMixin
+    from .database import async_db
+    from .carriers import carrier_bp
+    from .customers import customer_bp
+    from .deliveries import delivery_bp
+    from .locations import location_bp
+
+    wsgi_app = create_app()
+
+    app = Quart(__name__, static_folder=None)
+    app.config.from_object('config.Config')
+
+    class OrjsonProvider(OrjsonMixin, JSONProvider):
+        """The Flask app's JSON, for Quart"""
+
+    app.json = OrjsonProvider(app)
+
+    with wsgi_app.app_context():
+        async_db.init_app(app, db.engine.url)
+
+    app.register_blueprint(customer_bp)
+    app.register_blueprint(delivery_bp)
+    app.register_blueprint(carrier_bp)
+    app.register_blueprint(location_bp)
+
+    return Dispatcher(app, wsgi_app)
@@ -0,0 +1,54 @@
+from quart import Blueprint, jsonify, request
+from app.models import DeliveryPerson
+from app.serializers import CARRIER
+from app.telemetry.positions import positions
+from app.telemetry.routes import publish_positions
+from .conditional import conditional
+from .pagination import wants_page, page_response, rows_only
+from .reference import all_carriers, carriers_by_id
+
+carrier_bp = Blueprint('carrier', __name__, url_prefix='/carriers')
+
+
+@carrier_bp.route('/', methods=['GET'])
+@conditional('carrier')
+async def get_carriers():
+    if wants_page():
+        return await page_response(CARRIER.select(), DeliveryPerson.id, rows_only(CARRIER), 'carriers')
+
+    carriers = await all_carriers()
+    if not carriers:
+        return jsonify({'message': 'No carriers found.'}), 404
+
+    return jsonify(carriers)
+
+
+@carrier_bp.route('/<int:id>', methods=['GET'])
+@conditional('carrier')
+async def get_carrier(id):
+    carrier = (await carriers_by_id([id])).get(id)
+
+    if not carrier:
+        return jsonify({'message': 'No carrier found.'}), 404
+
+    return jsonify(carrier)
+
+
+@carrier_bp.route('/update_location/<int:carrier_id>', methods=['POST'])
+async def update_carrier_location(carrier_id):
+    data = await request.get_json()
+
+    latitude = data.get('latitude')
+    longitude = data.get('longitude')
+
+    if latitude is None or longitude is None:
+        return jsonify({'message': 'Latitude and Longitude are required'}), 400
+
+    if carrier_id not in await carriers_by_id([carrier_id]):
+        return jsonify({'message': 'Carrier not found'}), 404
+
+    # written to the database by the telemetry flusher, batched with other pings
+    positions.record(carrier_id, latitude, longitude)
+    publish_positions([carrier_id])
+
+    return jsonify({'message': 'Carrier location updated successfully'}), 200
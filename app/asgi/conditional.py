@@ -0,0 +1,27 @@
+from functools import wraps
+
+from quart import make_response, request
+from app.cache import cache
+from app.conditional import validators, not_modified, with_validators
+
+
+def conditional(*entities):
+    """app.conditional.conditional for async views"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            if not cache.shared_versions:
+                return await view(*args, **kwargs)
+
+            etag, last_modified = validators([cache.version(entity) for entity in entities], request.full_path)
+
+            if not_modified(request, etag, last_modified):
+                response = await make_response('', 304)
+            else:
+                response = await make_response(await view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            return with_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
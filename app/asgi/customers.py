@@ -0,0 +1,71 @@
+from quart import Blueprint, jsonify, request
+from app.models import Customer
+from app.cache import cache
+from app.serializers import CUSTOMER
+from .conditional import conditional
+from .database import async_db
+from .pagination import wants_page, page_response, rows_only
+from .reference import locations_by_id
+
+customer_bp = Blueprint('customer', __name__, url_prefix='/customers')
+
+
+@customer_bp.route('/', methods=['GET'])
+@conditional('customer')
+async def get_customers():
+    try:
+        if wants_page():
+            return await page_response(CUSTOMER.select(), Customer.id, rows_only(CUSTOMER), 'customers')
+
+        async with async_db.session() as session:
+            customers = CUSTOMER.many(await session.execute(CUSTOMER.select().order_by(Customer.id)))
+
+        if not customers:
+            return jsonify({'message': 'No customers found.'}), 200
+
+        return jsonify(customers)
+    except Exception as e:
+        return jsonify({'message': f"An error occurred: {str(e)}"}), 500
+
+
+@customer_bp.route('/<int:id>', methods=['GET'])
+@conditional('customer')
+async def get_customer(id):
+    try:
+        async with async_db.session() as session:
+            row = (await session.execute(CUSTOMER.select().where(Customer.id == id))).first()
+
+        if not row:
+            return jsonify({'message': 'Customer not found'}), 404
+
+        return jsonify(CUSTOMER.one(row))
+    except Exception as e:
+        return jsonify({'message': f"An error occurred: {str(e)}"}), 500
+
+
+@customer_bp.route('/', methods=['POST'])
+async def create_customer():
+    try:
+        data = await request.get_json()
+
+        if not data or 'name' not in data or 'address' not in data:
+            return jsonify({'message': 'Name and address are required fields.'}), 400
+
+        location_id = data.get('location_id')
+        if location_id is not None and location_id not in await locations_by_id([location_id]):
+            return jsonify({'message': 'Location not found'}), 400
+
+        new_customer = Customer(
+            name=data['name'],
+            address=data['address'],
+            phone=data.get('phone'),
+            location_id=location_id
+        )
+
+        async with async_db.session() as session:
+            session.add(new_customer)
+            await session.commit()
+        cache.bump('customer')
+        return jsonify({'message': 'Customer added', 'id': new_customer.id}), 201
+    except Exception as e:
+        return jsonify({'message': f"An error occurred: {str(e)}"}), 500
@@ -0,0 +1,61 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from app.engine import engine_options, configure_engine
+
+# AsyncSession access for the async views. The URL is the WSGI app's own with
+# the driver swapped for its asyncio counterpart, unless
+# ASYNC_SQLALCHEMY_DATABASE_URI says otherwise. The engine is created when the
+# server starts and disposed when it stops, so it lives on the server's loop.
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg'
+}
+
+
+def async_url(url, override=None):
+    if override:
+        return make_url(override)
+
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(
+            f"No async driver known for '{backend}'. Set ASYNC_SQLALCHEMY_DATABASE_URI "
+            f"or use one of {', '.join(ASYNC_DRIVERS)}"
+        )
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    def __init__(self):
+        self.url = None
+        self.engine = None
+        self._sessionmaker = None
+
+    def init_app(self, app, sync_url):
+        self.url = async_url(sync_url, app.config['ASYNC_SQLALCHEMY_DATABASE_URI'])
+        app.extensions['async_db'] = self
+
+        @app.before_serving
+        async def connect():
+            self.engine = create_async_engine(self.url, **engine_options(app.config, self.url))
+            configure_engine(self.engine.sync_engine, app.config)
+            self._sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        @app.after_serving
+        async def disconnect():
+            await self.engine.dispose()
+
+    def session(self):
+        """A new AsyncSession; use as `async with async_db.session() as session`"""
+        return self._sessionmaker()
+
+    async def run(self, loader, *args):
+        """Call one of the synchronous loaders (app.reference,
+        app.delivery.queries) as loader(*args, session=<Session>) on a fresh
+        session, through AsyncSession.run_sync"""
+        async with self.session() as session:
+            return await session.run_sync(lambda sync_session: loader(*args, session=sync_session))
+
+
+async_db = AsyncDatabase()
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+from quart import Blueprint, jsonify, request
+from app.models import DeliveryAssignment
+from app.delivery.queries import assignment_filter, assignment_columns, load_assignments, with_details
+from app.delivery.routes import serialize_assignments
+from .conditional import conditional
+from .database import async_db
+from .pagination import wants_page, page_response
+
+delivery_bp = Blueprint('delivery', __name__, url_prefix='/deliveries')
+
+# Only the read endpoints; writes, assignment and the route view of
+# /person/<id>?date= stay on the WSGI app, see app/asgi/__init__.py.
+
+
+def serialize_assignment_rows(session, rows):
+    return serialize_assignments(with_details(rows, session=session))
+
+
+@delivery_bp.route('/', methods=['GET'])
+@conditional('delivery', 'location', 'publication')
+async def get_delivery_assignments():
+    delivery_person_id = request.args.get('delivery_person_id', type=int)
+    date_str = request.args.get('date')
+
+    date_obj = None
+    if date_str:
+        try:
+            date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'message': 'Invalid date format. Please use YYYY-MM-DD'}), 400
+
+    criteria = assignment_filter(date=date_obj, delivery_person_id=delivery_person_id or None)
+
+    if wants_page():
+        return await page_response(assignment_columns(criteria), DeliveryAssignment.id, serialize_assignment_rows, 'deliveries')
+
+    assignments = await async_db.run(load_assignments, criteria)
+
+    if not assignments:
+        return jsonify({'message': 'No delivery assignments found.'}), 404
+
+    return jsonify(serialize_assignments(assignments))
+
+
+@delivery_bp.route('/<int:id>', methods=['GET'])
+@conditional('delivery', 'location', 'publication')
+async def get_delivery_assignment(id):
+    assignments = await async_db.run(load_assignments, assignment_filter(ids=[id]))
+
+    if not assignments:
+        return jsonify({'message': 'Delivery assignment not found'}), 404
+
+    assignment = assignments[0]
+    return jsonify({
+        'id': assignment['id'],
+        'delivery_person_id': assignment['delivery_person_id'],
+        'date': assignment['date'].isoformat(),
+        'locations': assignment['addresses'],
+        'publications': assignment['publications']
+    })
+
+
+@delivery_bp.route('/daily/<date>', methods=['GET'])
+@conditional('delivery', 'location', 'publication')
+async def get_daily_deliveries(date):
+    try:
+        date_obj = datetime.strptime(date, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Please use YYYY-MM-DD'}), 400
+
+    delivery_person_id = request.args.get('delivery_person_id', type=int)  # optional filter
+
+    deliveries = await async_db.run(
+        load_assignments, assignment_filter(date=date_obj, delivery_person_id=delivery_person_id or None)
+    )
+
+    if not deliveries:
+        return jsonify({'message': 'No deliveries found for the specified date'}), 404
+
+    result = [
+        {
+            'id': delivery['id'],
+            'delivery_person_id': delivery['delivery_person_id'],
+            'locations': delivery['addresses'],
+            'publications': delivery['publications']
+        }
+        for delivery in deliveries
+    ]
+
+    return jsonify({'deliveries': result}), 200
@@ -0,0 +1,68 @@
+from quart import Blueprint, current_app, jsonify, request
+from app.geo import METRICS
+from app.models import Location
+from app.serializers import LOCATION
+from app.location.index import location_index
+from .conditional import conditional
+from .pagination import wants_page, page_response, rows_only
+from .reference import all_locations, locations_by_id
+
+location_bp = Blueprint('location', __name__, url_prefix='/locations')
+
+
+@location_bp.route('/', methods=['GET'])
+@conditional('location')
+async def get_all_locations():
+    if wants_page():
+        return await page_response(LOCATION.select(), Location.id, rows_only(LOCATION), 'locations')
+
+    locations = await all_locations()
+
+    if not locations:
+        return jsonify({'message': 'No locations found'}), 404
+
+    return jsonify({'locations': locations}), 200
+
+
+@location_bp.route('/nearest', methods=['GET'])
+@conditional('location')
+async def get_nearest_locations():
+    latitude = request.args.get('lat', type=float)
+    longitude = request.args.get('lon', type=float)
+    k = request.args.get('k', default=5, type=int)
+    metric = request.args.get('metric', current_app.config['DISTANCE_METRIC'])
+
+    if latitude is None or longitude is None:
+        return jsonify({'message': 'Query parameters lat and lon are required'}), 400
+
+    if metric not in METRICS:
+        return jsonify({'message': f"Invalid metric. Must be one of {', '.join(METRICS)}"}), 400
+
+    if k < 1 or k > 100:
+        return jsonify({'message': 'k must be between 1 and 100'}), 400
+
+    matches = location_index.nearest(latitude, longitude, k, metric)
+
+    if not matches:
+        return jsonify({'message': 'No locations found'}), 404
+
+    locations = await locations_by_id([location_id for _, location_id in matches])
+
+    result = [
+        dict(locations[location_id], distance=distance)
+        for distance, location_id in matches
+        if location_id in locations
+    ]
+
+    return jsonify({'metric': metric, 'locations': result}), 200
+
+
+@location_bp.route('/<int:id>', methods=['GET'])
+@conditional('location')
+async def get_location(id):
+    location = (await locations_by_id([id])).get(id)
+
+    if not location:
+        return jsonify({'message': 'Location not found'}), 404
+
+    return jsonify(location), 200
@@ -0,0 +1,72 @@
+from quart import Response, current_app, jsonify, request, url_for
+from app.pagination import PAGE_ARGS, page_args, keyset
+from .database import async_db
+
+# app.pagination for async views. `serialize(session, rows)` runs under
+# AsyncSession.run_sync, so it may load related rows through the synchronous
+# Session it is given.
+
+
+def wants_page():
+    return any(arg in request.args for arg in PAGE_ARGS)
+
+
+async def page_response(statement, id_column, serialize, key):
+    try:
+        after_id, limit, stream = page_args(request.args, current_app.config['MAX_PAGE_SIZE'])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    statement = keyset(statement, id_column, after_id)
+
+    if stream:
+        if limit:
+            statement = statement.limit(limit)
+        return stream_response(statement, serialize, stream)
+
+    limit = limit or current_app.config['PAGE_SIZE']
+    async with async_db.session() as session:
+        # one extra row tells us whether there is a next page
+        rows = (await session.execute(statement.limit(limit + 1))).all()
+        items = await session.run_sync(serialize, rows[:limit])
+
+    next_url = None
+    if len(rows) > limit:
+        args = request.args.to_dict()
+        args.update(after_id=items[-1]['id'], limit=limit)
+        next_url = url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    response = jsonify({key: items, 'next': next_url})
+    if next_url:
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+
+def stream_response(statement, serialize, stream_format):
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    dumps = current_app.json.dumps
+
+    async def generate():
+        async with async_db.session() as session:
+            result = await session.stream(statement.execution_options(yield_per=batch_size))
+            separator = ''
+
+            if stream_format == 'json':
+                yield '['
+            async for batch in result.partitions():
+                items = [dumps(item) for item in await session.run_sync(serialize, batch)]
+                if stream_format == 'ndjson':
+                    yield ''.join(item + '\n' for item in items)
+                elif items:
+                    yield separator + ','.join(items)
+                    separator = ','
+            if stream_format == 'json':
+                yield ']'
+
+    mimetype = 'application/x-ndjson' if stream_format == 'ndjson' else 'application/json'
+    return Response(generate(), mimetype=mimetype)
+
+
+def rows_only(serialize):
+    """Adapt a plain serialize(rows) for page_response"""
+    return lambda session, rows: serialize(rows)
@@ -0,0 +1,27 @@
+from app.cache import cache
+from app.reference import _load_all, _load_by_id
+from app.serializers import CARRIER, LOCATION
+from .database import async_db
+
+# app.reference for async views: the same cache entries, filled through the
+# async engine on a miss.
+
+
+async def all_carriers():
+    return await cache.get_async('carrier', 'list:all', lambda: async_db.run(_load_all, CARRIER))
+
+
+async def carriers_by_id(ids):
+    return await cache.get_many_async(
+        'carrier', ids, lambda missing: async_db.run(_load_by_id, CARRIER, missing)
+    )
+
+
+async def all_locations():
+    return await cache.get_async('location', 'list:all', lambda: async_db.run(_load_all, LOCATION))
+
+
+async def locations_by_id(ids):
+    return await cache.get_many_async(
+        'location', ids, lambda missing: async_db.run(_load_by_id, LOCATION, missing)
+    )
@@ -2,7 +2,8 @@ from flask import jsonify, request
 from . import auth_bp
 from app.extensions import db
 from app.models import User
-from .utils import hash_password, check_password
+from app.cache import cache
+from .utils import hash_password, check_password, hasher, HasherBusy
 from flask_login import login_user, logout_user, login_required
 
 @auth_bp.route('/register', methods=['POST'])
@@ -19,7 +20,10 @@ def register():
     
     username = data.get('username', None)
     
-    hashed_password = hash_password(data['password'])
+    try:
+        hashed_password = hash_password(data['password'])
+    except HasherBusy as e:
+        return busy(e)
     new_user = User(
         username=username,
         email=data['email'],
@@ -29,6 +33,7 @@ def register():
     try:
         db.session.add(new_user)
         db.session.commit()
+        cache.invalidate('user', new_user.id)
         return jsonify({
             'message': 'User registered successfully',
             'user': {
@@ -47,12 +52,26 @@ def login():
     password = data.get('password')
 
     user = User.query.filter_by(email=email).first()
+    if not user or not password:
+        return jsonify({'error': 'Invalid credentials'}), 401
+
+    try:
+        if not check_password(password, user.password):
+            return jsonify({'error': 'Invalid credentials'}), 401
+
+        # bring hashes made at another cost up to BCRYPT_LOG_ROUNDS
+        if hasher.needs_rehash(user.password):
+            user.password = hash_password(password)
+            db.session.commit()
+    except HasherBusy as e:
+        return busy(e)
+
+    login_user(user)
+    return jsonify({'message': 'Logged in successfully'}), 200
+
 
-    print(f"Login attempt for user: {user}")
-    if user.email == email and check_password(password, user.password):
-        login_user(user)
-        return jsonify({'message': 'Logged in successfully'}), 200
-    return jsonify({'error': 'Invalid credentials'}), 401
+def busy(error):
+    return jsonify({'message': f'{error}, please retry'}), 503, {'Retry-After': '1'}
 
 @auth_bp.route('/logout', methods=['POST'])
 @login_required
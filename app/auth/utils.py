@@ -1,8 +1,87 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from flask_bcrypt import bcrypt
+from flask_login import UserMixin
+from app.cache import cache
+from app.extensions import db
+from app.models import User
+
+# bcrypt is deliberately slow: at the default cost of 12 one hash or check
+# takes a few hundred milliseconds of CPU. Hashing runs on a pool of
+# AUTH_HASH_WORKERS threads (bcrypt releases the GIL), so at most that many
+# run at once and the remaining workers keep serving other requests; at most
+# AUTH_HASH_QUEUE more may wait, beyond that HasherBusy is raised and the
+# caller answers 503. BCRYPT_LOG_ROUNDS sets the cost of new hashes; hashes of
+# another cost are replaced on the user's next successful login.
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.rounds = 12
+        self._executor = None
+        self._slots = None
+
+    def init_app(self, app):
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        workers = app.config['AUTH_HASH_WORKERS'] or os.cpu_count() or 1
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + app.config['AUTH_HASH_QUEUE'])
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def check(self, password, hashed):
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed):
+        # $2b$<cost>$<salt and hash>
+        return hashed.split('$')[2] != f'{self.rounds:02d}'
+
+    def _run(self, function, *args):
+        if self._executor is None:
+            return function(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Too many password checks in progress')
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+
+hasher = PasswordHasher()
+
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), salt=bcrypt.gensalt()).decode('utf-8')
+    return hasher.hash(password)
 
 def check_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-    
\ No newline at end of file
+    return hasher.check(password, hashed)
+
+
+class SessionUser(UserMixin):
+    """What Flask-Login keeps as current_user: the cached columns of a User"""
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+
+def load_session_user(user_id):
+    """The logged-in user for a session, from the cache; None if it is gone"""
+    users = cache.get_many('user', [user_id], lambda missing: {
+        row.id: {'id': row.id, 'username': row.username, 'email': row.email}
+        for row in db.session.execute(db.select(User.id, User.username, User.email).where(User.id.in_(missing)))
+    })
+    user = users.get(user_id)
+    return SessionUser(**user) if user else None
@@ -0,0 +1,150 @@
+import json
+
+from flask import current_app, request
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+
+# Shared plumbing for the POST /<resource>/bulk endpoints. A body is either a
+# JSON array of objects or NDJSON (one object per line). Each endpoint
+# validates the whole payload first, recording a result per row, then writes
+# the valid rows with executemany in transactions of BULK_BATCH_SIZE rows.
+
+
+def read_rows():
+    """Parse the request body into a list of dicts. Raises ValueError with a
+    message fit for the client if the body is not a JSON array or NDJSON."""
+    body = request.get_data(as_text=True).strip()
+    if not body:
+        raise ValueError('Request body is empty')
+
+    if body.startswith('['):
+        try:
+            rows = json.loads(body)
+        except ValueError as e:
+            raise ValueError(f'Invalid JSON: {e}')
+    else:
+        rows = []
+        for number, line in enumerate(body.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f'Invalid JSON on line {number}: {e}')
+
+    if not all(isinstance(row, dict) for row in rows):
+        raise ValueError('Every row must be a JSON object')
+    return rows
+
+
+def in_chunks(values, size=None):
+    """Split a list so IN (...) lists stay under database parameter limits"""
+    size = size or current_app.config['BULK_BATCH_SIZE']
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class BulkResults:
+    """Per-row outcome of a bulk request, reported in payload order"""
+
+    def __init__(self, count):
+        self.rows = [None] * count
+
+    def fail(self, index, message):
+        self.rows[index] = {'index': index, 'status': 'error', 'message': message}
+
+    def succeed(self, index, status, row_id):
+        self.rows[index] = {'index': index, 'status': status, 'id': row_id}
+
+    def failed(self, index):
+        return self.rows[index] is not None and self.rows[index]['status'] == 'error'
+
+    def summary(self):
+        counts = {'created': 0, 'updated': 0, 'error': 0}
+        for row in self.rows:
+            counts[row['status']] += 1
+        return {
+            'created': counts['created'],
+            'updated': counts['updated'],
+            'failed': counts['error'],
+            'results': self.rows
+        }
+
+
+def insert_rows(model, indexed_values, results):
+    """INSERT (index, values) pairs in batches, recording the new ids.
+
+    A batch that trips a constraint (e.g. a concurrent insert of the same
+    phone number) is retried row by row so only the offending rows fail."""
+    statement = db.insert(model).returning(model.id, sort_by_parameter_order=True)
+
+    for batch in in_chunks(indexed_values):
+        try:
+            ids = db.session.scalars(statement, [values for _, values in batch]).all()
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            _insert_one_by_one(model, batch, results)
+            continue
+
+        for (index, _), row_id in zip(batch, ids):
+            results.succeed(index, 'created', row_id)
+
+
+def _insert_one_by_one(model, batch, results):
+    for index, values in batch:
+        try:
+            row_id = db.session.execute(db.insert(model).values(**values).returning(model.id)).scalar_one()
+            db.session.commit()
+        except IntegrityError as e:
+            db.session.rollback()
+            results.fail(index, f'Constraint violated: {e.orig}')
+            continue
+        results.succeed(index, 'created', row_id)
+
+
+def update_rows(model, indexed_values, results):
+    """UPDATE (index, values) pairs by primary key in batches; every values
+    dict carries its row's id"""
+    for batch in in_chunks(indexed_values):
+        try:
+            db.session.execute(db.update(model), [values for _, values in batch])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            for index, values in batch:
+                try:
+                    db.session.execute(db.update(model), [values])
+                    db.session.commit()
+                except IntegrityError as e:
+                    db.session.rollback()
+                    results.fail(index, f'Constraint violated: {e.orig}')
+                    continue
+                results.succeed(index, 'updated', values['id'])
+            continue
+
+        for index, values in batch:
+            results.succeed(index, 'updated', values['id'])
+
+
+def is_id(value):
+    """Whether a row value can be a row id (JSON true/false cannot)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def bad_id(row, *keys):
+    """The first of `keys` whose value in `row` is neither null nor an
+    integer, or None if they all are"""
+    for key in keys:
+        value = row.get(key)
+        if value is not None and not is_id(value):
+            return key
+    return None
+
+
+def existing_ids(model, ids):
+    """The subset of `ids` that exist in `model`'s table"""
+    found = set()
+    for chunk in in_chunks(list(ids)):
+        found.update(db.session.scalars(db.select(model.id).where(model.id.in_(chunk))))
+    return found
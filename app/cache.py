@@ -0,0 +1,286 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Read-through cache for reference data (publications, carriers, locations).
+#
+# Keys are "<entity>:<id>" for single rows and "<entity>:list:<name>" for
+# collections such as the full listing. Writers call invalidate(entity, *ids),
+# which drops the given rows and every collection of that entity. Cached
+# values are plain serialized data, never ORM instances, so they can be shared
+# across sessions and processes.
+#
+# Each entity also has a version: the time.time_ns() of its last write, bumped
+# by invalidate() (or bump() for tables that are not cached). Conditional GETs
+# build their ETag and Last-Modified from it; see app/conditional.py. Versions
+# live in the backend, so with Redis every worker sees the same ones. The
+# memory backend's are per process and miss other workers' writes, so 304s
+# are only answered from them with CACHE_SINGLE_PROCESS set.
+#
+# Backends:
+#   memory  per-process LRU with a TTL (default)
+#   redis   any Redis-compatible server at CACHE_REDIS_URL; needs `redis`
+#   none    caching disabled, every read goes to the loader
+
+MISSING = object()
+
+
+class MemoryBackend:
+    # versions seen by every process serving the app
+    shared = False
+
+    def __init__(self, max_entries=10000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._versions = {}            # entity -> (expires_at, version), never evicted
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+    # other workers' writes are invisible to this backend, so versions expire
+    # like entries do; that bounds how long a stale 304 can be served
+    def get_version(self, entity):
+        entry = self._versions.get(entity)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def init_version(self, entity, value):
+        with self._lock:
+            current = self.get_version(entity)
+            if current is not None:
+                return current
+            self._versions[entity] = (time.monotonic() + self.ttl, value)
+            return value
+
+    def set_version(self, entity, value):
+        with self._lock:
+            self._versions[entity] = (time.monotonic() + self.ttl, value)
+
+
+class RedisBackend:
+    shared = True
+
+    def __init__(self, url, ttl=300, namespace='news_agency:'):
+        # optional dependency, only needed when this backend is configured
+        import redis
+
+        self.ttl = ttl
+        self.namespace = namespace
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(self.namespace + key)
+        return MISSING if value is None else pickle.loads(value)
+
+    def set(self, key, value):
+        self._client.set(self.namespace + key, pickle.dumps(value), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*[self.namespace + key for key in keys])
+
+    def delete_prefix(self, prefix):
+        keys = list(self._client.scan_iter(match=self.namespace + prefix + '*'))
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self):
+        self.delete_prefix('')
+
+    def size(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.namespace + '*'))
+
+    def get_version(self, entity):
+        value = self._client.get(f'{self.namespace}version:{entity}')
+        return None if value is None else int(value)
+
+    def init_version(self, entity, value):
+        # another worker may have got there first; theirs wins
+        self._client.set(f'{self.namespace}version:{entity}', value, nx=True)
+        return self.get_version(entity)
+
+    def set_version(self, entity, value):
+        self._client.set(f'{self.namespace}version:{entity}', value)
+
+
+class NullBackend(MemoryBackend):
+    """Caches nothing, but still tracks versions for conditional GETs"""
+
+    def get(self, key):
+        return MISSING
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def delete_prefix(self, prefix):
+        pass
+
+    def clear(self):
+        pass
+
+    def size(self):
+        return 0
+
+
+class Cache:
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.shared_versions = self.backend.shared
+
+    def init_app(self, app):
+        name = app.config['CACHE_BACKEND']
+        ttl = app.config['CACHE_TTL']
+
+        if name == 'memory':
+            self.backend = MemoryBackend(app.config['CACHE_MAX_ENTRIES'], ttl)
+        elif name == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'], ttl)
+        elif name == 'none':
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f"Unknown cache backend '{name}'. Must be one of memory, redis, none")
+
+        # whether a version here accounts for every write, so 304s can rely on it
+        self.shared_versions = self.backend.shared or app.config['CACHE_SINGLE_PROCESS']
+        app.extensions['cache'] = self
+
+    def get(self, entity, key, loader):
+        """Return the cached value for entity/key, calling loader() on a miss.
+        Use a str key such as 'list:all' for collections."""
+        value = self._lookup(f'{entity}:{key}')
+        if value is MISSING:
+            value = loader()
+            self.backend.set(f'{entity}:{key}', value)
+        return value
+
+    def get_many(self, entity, ids, loader):
+        """{id: value} for the given ids; loader(missing_ids) must return a
+        {id: value} dict for the ids it can find. Ids it cannot find are not
+        cached and are absent from the result."""
+        found, missing = self._lookup_many(entity, ids)
+        if missing:
+            found.update(self._store_many(entity, loader(missing)))
+        return found
+
+    # the same for the async views in app/asgi, whose loaders are coroutines;
+    # backend calls stay synchronous (the Redis client blocks briefly)
+    async def get_async(self, entity, key, loader):
+        value = self._lookup(f'{entity}:{key}')
+        if value is MISSING:
+            value = await loader()
+            self.backend.set(f'{entity}:{key}', value)
+        return value
+
+    async def get_many_async(self, entity, ids, loader):
+        found, missing = self._lookup_many(entity, ids)
+        if missing:
+            found.update(self._store_many(entity, await loader(missing)))
+        return found
+
+    def _lookup(self, cache_key):
+        value = self.backend.get(cache_key)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def _lookup_many(self, entity, ids):
+        found = {}
+        missing = []
+        for item_id in dict.fromkeys(ids):
+            value = self.backend.get(f'{entity}:{item_id}')
+            if value is MISSING:
+                missing.append(item_id)
+            else:
+                found[item_id] = value
+
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def _store_many(self, entity, loaded):
+        for item_id, value in loaded.items():
+            self.backend.set(f'{entity}:{item_id}', value)
+        return loaded
+
+    def invalidate(self, entity, *ids):
+        """Drop cached rows for ids and every cached collection of the entity"""
+        self.invalidations += 1
+        self.backend.delete(*[f'{entity}:{item_id}' for item_id in ids])
+        self.backend.delete_prefix(f'{entity}:list:')
+        self.bump(entity)
+
+    def version(self, entity):
+        """Current version of an entity: time.time_ns() of its last known write.
+        An entity never written since startup counts as written now."""
+        value = self.backend.get_version(entity)
+        if value is None:
+            value = self.backend.init_version(entity, time.time_ns())
+        return value
+
+    def bump(self, *entities):
+        """Record a write to the entities' tables"""
+        for entity in entities:
+            current = self.backend.get_version(entity) or 0
+            self.backend.set_version(entity, max(time.time_ns(), current + 1))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': self.backend.size(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'shared_versions': self.shared_versions
+        }
+
+
+cache = Cache()
@@ -1,50 +1,38 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from . import carrier_bp
 from app.extensions import db
 from app.models import DeliveryPerson
+from app.pagination import wants_page, page_response
+from app.cache import cache
+from app.conditional import conditional
+from app.reference import all_carriers, carriers_by_id
+from app.serializers import CARRIER
+from app.delivery.replan import replan_stranded
+from app.telemetry.positions import positions
+from app.telemetry.routes import publish_positions
+from app.events.hub import hub
 
 @carrier_bp.route("/", methods=['GET'])
+@conditional('carrier')
 def get_carriers():
-    carriers = DeliveryPerson.query.all()
+    if wants_page():
+        return page_response(CARRIER.select(), DeliveryPerson.id, CARRIER, 'carriers')
+
+    carriers = all_carriers()
     if not carriers:
         return jsonify({'message': 'No carriers found.'}), 404
 
-    results = [
-    {
-        "id": c.id,
-        "name": c.name,
-        "vehicle_type": c.vehicle_type,
-        "vehicle_id": c.vehicle_id,
-        "phone": c.phone,
-        "hire_date": c.hire_date,
-        "is_active": c.is_active,
-        "latitude": c.latitude,
-        "longitude": c.longitude
-    }
-    for c in carriers
-    ]
-
-    return jsonify(results)
+    return jsonify(carriers)
 
 @carrier_bp.route("/<int:id>", methods=['GET'])
+@conditional('carrier')
 def get_carrier(id):
-    carrier = DeliveryPerson.query.get(id)
+    carrier = carriers_by_id([id]).get(id)
 
     if not carrier:
         return jsonify({'message': 'No carrier found.'}), 404
     
-    result = {
-        "id": carrier.id,
-        "name": carrier.name,
-        "vehicle_type": carrier.vehicle_type,
-        "vehicle_id": carrier.vehicle_id,
-        "phone": carrier.phone,
-        "hire_date": carrier.hire_date,
-        "is_active": carrier.is_active,
-        "latitude": carrier.latitude,
-        "longitude": carrier.longitude
-    }
-    return jsonify(result)
+    return jsonify(carrier)
 
 @carrier_bp.route("/", methods=['POST'])
 def create_carrier():
@@ -75,19 +63,11 @@ def create_carrier():
         # Add to the session and commit to the database
         db.session.add(new_carrier)
         db.session.commit()
+        cache.invalidate('carrier', new_carrier.id)
 
         return jsonify({
             'message': 'Carrier created successfully',
-            'carrier': {
-                'id': new_carrier.id,
-                'name': new_carrier.name,
-                'vehicle_type': new_carrier.vehicle_type,
-                'vehicle_id': new_carrier.vehicle_id,
-                'phone': new_carrier.phone,
-                'is_active': new_carrier.is_active,
-                "latitude": new_carrier.latitude,
-                "longitude": new_carrier.longitude
-            }
+            'carrier': CARRIER.from_instance(new_carrier)
         }), 201
 
     except Exception as e:
@@ -119,18 +99,13 @@ def update_carrier(id):
 
     try:
         db.session.commit()
+        cache.invalidate('carrier', id)
+        if 'latitude' in data or 'longitude' in data:
+            # an explicit position wins over any ping still waiting to be flushed
+            positions.forget(id)
         return jsonify({
             'message': 'Carrier updated successfully',
-            'carrier': {
-                'id': carrier.id,
-                'name': carrier.name,
-                'vehicle_type': carrier.vehicle_type,
-                'vehicle_id': carrier.vehicle_id,
-                'phone': carrier.phone,
-                'is_active': carrier.is_active,
-                "latitude": carrier.latitude,
-                "longitude": carrier.longitude
-            }
+            'carrier': CARRIER.from_instance(carrier)
         }), 200
     except Exception as e:
         db.session.rollback() 
@@ -145,6 +120,8 @@ def delete_carrier(id):
     try:
         db.session.delete(carrier)
         db.session.commit()
+        cache.invalidate('carrier', id)
+        positions.forget(id)
         return jsonify({'message': 'Carrier deleted successfully'}), 200
     except Exception as e:
         db.session.rollback() 
@@ -156,6 +133,14 @@ def activate_carrier(carrier_id):
     
     carrier.is_active = True
     db.session.commit()
+    cache.invalidate('carrier', carrier_id)
+    hub.publish('carrier', 'status', {'id': carrier_id, 'is_active': True})
+
+    # take over drops stranded from today on, while nobody was on shift
+    replan = replan_stranded(
+        metric=current_app.config['DISTANCE_METRIC'], receiver_id=carrier_id,
+        slack=current_app.config['REPLAN_CAPACITY_SLACK']
+    )
     
     return jsonify({
         'message': 'Carrier activated successfully',
@@ -163,7 +148,8 @@ def activate_carrier(carrier_id):
             'id': carrier.id,
             'name': carrier.name,
             'is_active': carrier.is_active
-        }
+        },
+        'replan': replan
     })
 
 @carrier_bp.route('/<int:carrier_id>/deactivate', methods=['PUT'])
@@ -172,6 +158,14 @@ def deactivate_carrier(carrier_id):
     
     carrier.is_active = False
     db.session.commit()
+    cache.invalidate('carrier', carrier_id)
+    hub.publish('carrier', 'status', {'id': carrier_id, 'is_active': False})
+
+    # hand this carrier's drops from today on to the nearest carriers on shift
+    replan = replan_stranded(
+        metric=current_app.config['DISTANCE_METRIC'], carrier_id=carrier_id,
+        slack=current_app.config['REPLAN_CAPACITY_SLACK']
+    )
     
     return jsonify({
         'message': 'Carrier deactivated successfully',
@@ -179,7 +173,8 @@ def deactivate_carrier(carrier_id):
             'id': carrier.id,
             'name': carrier.name,
             'is_active': carrier.is_active
-        }
+        },
+        'replan': replan
 })
 
 @carrier_bp.route('/update_location/<int:carrier_id>', methods=['POST'])
@@ -192,13 +187,25 @@ def update_carrier_location(carrier_id):
     if latitude is None or longitude is None:
         return jsonify({'message': 'Latitude and Longitude are required'}), 400
 
- 
-    carrier = DeliveryPerson.query.get(carrier_id)
-    if not carrier:
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return jsonify({'message': 'latitude and longitude must be numbers'}), 400
+
+    if not -90 <= latitude <= 90:
+        return jsonify({'message': 'latitude must be a number between -90 and 90'}), 400
+    if not -180 <= longitude <= 180:
+        return jsonify({'message': 'longitude must be a number between -180 and 180'}), 400
+
+    if carrier_id not in carriers_by_id([carrier_id]):
         return jsonify({'message': 'Carrier not found'}), 404
 
-    carrier.latitude = latitude
-    carrier.longitude = longitude
-    db.session.commit()
+    # written to the database by the telemetry flusher, batched with other
+    # pings, which then drops the carrier from the cache; with the flusher
+    # disabled it is written, and the cached carrier dropped, right away
+    positions.record(carrier_id, latitude, longitude)
+    if current_app.config['TELEMETRY_FLUSH_INTERVAL'] <= 0:
+        positions.flush()
+    publish_positions([carrier_id])
 
     return jsonify({'message': 'Carrier location updated successfully'}), 200
\ No newline at end of file
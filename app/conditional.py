@@ -0,0 +1,74 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import make_response, request
+from app.cache import cache
+from app.replicas import replicas
+
+# Conditional GET for read endpoints. A response's ETag is derived from the
+# request URL and the versions of the entities it is built from, which write
+# paths bump through cache.invalidate() / cache.bump(). Both are known before
+# the view runs, so a matching If-None-Match (or an If-Modified-Since no older
+# than the newest version) is answered with 304 without touching the database.
+# While a version is younger than the replica lag window the view reads from
+# the primary, so a stale replica row is never served under the new ETag.
+#
+# Only versions every worker sees (cache.shared_versions: the Redis backend,
+# or CACHE_SINGLE_PROCESS) are trusted. With per-process versions another
+# worker's write would not change the ETag, so the view is served in full,
+# without validators.
+
+
+def conditional(*entities):
+    """Serve the decorated GET view conditionally on the versions of `entities`"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = [cache.version(entity) for entity in entities]
+            if not cache.shared_versions:
+                replicas.follow_versions(versions)
+                return view(*args, **kwargs)
+
+            etag, last_modified = validators(versions, request.full_path)
+
+            if not_modified(request, etag, last_modified):
+                response = make_response('', 304)
+            else:
+                replicas.follow_versions(versions)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            return with_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def validators(versions, full_path):
+    """(etag, last_modified) of a response to `full_path` built from entities
+    at `versions`"""
+    fingerprint = hashlib.sha1(full_path.encode('utf-8'))
+    for version in versions:
+        fingerprint.update(f':{version}'.encode('utf-8'))
+    modified_second = max(versions) // 1_000_000_000
+    return fingerprint.hexdigest(), datetime.fromtimestamp(modified_second, tz=timezone.utc)
+
+
+def not_modified(request, etag, last_modified):
+    """Whether the request's If-None-Match / If-Modified-Since already match"""
+    if request.if_none_match:
+        return etag in request.if_none_match
+    return request.if_modified_since is not None and request.if_modified_since >= last_modified
+
+
+def with_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    # Last-Modified has one-second resolution, so it is only a safe
+    # validator once that second is over and no later write can share it
+    if last_modified.timestamp() < int(time.time()):
+        response.last_modified = last_modified
+    # clients may keep the body but must revalidate before using it
+    response.cache_control.no_cache = True
+    return response
@@ -1,41 +1,40 @@
 from flask import request, jsonify
 from . import customer_bp
 from app.extensions import db
-from app.models import Customer
+from app.models import Customer, DeliveryAssignment
+from app.reference import locations_by_id
+from app.cache import cache
+from app.conditional import conditional
+from app.pagination import wants_page, page_response
+from app.serializers import CUSTOMER
+from app.bulk import read_rows, in_chunks, BulkResults, insert_rows, update_rows, existing_ids, bad_id, is_id
+
 
 @customer_bp.route('/', methods=['GET'])
+@conditional('customer')
 def get_customers():
     try:
-        customers = Customer.query.all()
+        if wants_page():
+            return page_response(CUSTOMER.select(), Customer.id, CUSTOMER, 'customers')
+
+        customers = CUSTOMER.many(db.session.execute(CUSTOMER.select().order_by(Customer.id)))
 
         if not customers:
             return jsonify({'message': 'No customers found.'}), 200
         
-        return jsonify([
-            {
-                'id': c.id,
-                'name': c.name,
-                'address': c.address,
-                'phone': c.phone
-            }
-            for c in customers
-        ])
+        return jsonify(customers)
     except Exception as e:
         return jsonify({'message': f"An error occurred: {str(e)}"}), 500
 
 @customer_bp.route('/<int:id>', methods=['GET'])
+@conditional('customer')
 def get_customer(id):
     try:
-        customer = Customer.query.get(id)
-        if not customer:
+        row = db.session.execute(CUSTOMER.select().where(Customer.id == id)).first()
+        if not row:
             return jsonify({'message': 'Customer not found'}), 404
 
-        return jsonify({
-            'id': customer.id,
-            'name': customer.name,
-            'address': customer.address,
-            'phone': customer.phone
-        })
+        return jsonify(CUSTOMER.one(row))
     except Exception as e:
         return jsonify({'message': f"An error occurred: {str(e)}"}), 500
 
@@ -47,11 +46,16 @@ def create_customer():
         if not data or 'name' not in data or 'address' not in data:
             return jsonify({'message': 'Name and address are required fields.'}), 400
 
+        location_id = data.get('location_id')
+        if location_id is not None and location_id not in locations_by_id([location_id]):
+            return jsonify({'message': 'Location not found'}), 400
+
         # create new instance of the customer model
         new_customer = Customer(
             name=data['name'],
             address=data['address'],
-            phone=data.get('phone')
+            phone=data.get('phone'),
+            location_id=location_id
         )
 
         # add a new object (Customer) to the session (staging area in memory)
@@ -59,12 +63,86 @@ def create_customer():
 
         # execute all staged operations, if success; store to the db permanently
         db.session.commit()
+        cache.bump('customer')
         return jsonify({'message': 'Customer added', 'id': new_customer.id}), 201
     except KeyError as e:
         return jsonify({'message': f'Missing field: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'message': f"An error occurred: {str(e)}"}), 500
 
+@customer_bp.route('/bulk', methods=['POST'])
+def bulk_customers():
+    """Create customers, or update them when a row carries an id"""
+    try:
+        rows = read_rows()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        results = BulkResults(len(rows))
+
+        update_ids = existing_ids(Customer, {row['id'] for row in rows if is_id(row.get('id'))})
+
+        # delivery locations referenced by the rows
+        locations = locations_by_id(list({row['location_id'] for row in rows if is_id(row.get('location_id'))}))
+
+        # phone numbers are unique; find who already holds the ones being sent
+        phones = list({row['phone'] for row in rows if row.get('phone') is not None})
+        phone_owners = {}
+        for chunk in in_chunks(phones):
+            phone_owners.update(db.session.execute(db.select(Customer.phone, Customer.id).where(Customer.phone.in_(chunk))).all())
+
+        inserts, updates = [], []
+        seen_phones = {}
+        for index, row in enumerate(rows):
+            customer_id = row.get('id')
+
+            key = bad_id(row, 'id', 'location_id')
+            if key:
+                results.fail(index, f'{key} must be an integer')
+                continue
+            if customer_id is None:
+                if 'name' not in row or 'address' not in row:
+                    results.fail(index, 'Name and address are required fields.')
+                    continue
+            elif customer_id not in update_ids:
+                results.fail(index, 'Customer not found')
+                continue
+
+            location_id = row.get('location_id')
+            if location_id is not None and location_id not in locations:
+                results.fail(index, 'Location not found')
+                continue
+
+            phone = row.get('phone')
+            if phone is not None:
+                if phone in seen_phones:
+                    results.fail(index, f'Phone {phone} is repeated in this request (row {seen_phones[phone]})')
+                    continue
+                owner = phone_owners.get(phone)
+                if owner is not None and owner != customer_id:
+                    results.fail(index, f'Phone {phone} already belongs to customer {owner}')
+                    continue
+                seen_phones[phone] = index
+
+            if customer_id is None:
+                inserts.append((index, {'name': row['name'], 'address': row['address'], 'phone': phone, 'location_id': location_id}))
+            else:
+                values = {key: row[key] for key in ('name', 'address', 'phone', 'location_id') if key in row}
+                if not values:
+                    results.fail(index, 'Nothing to update')
+                    continue
+                updates.append((index, dict(values, id=customer_id)))
+
+        insert_rows(Customer, inserts, results)
+        update_rows(Customer, updates, results)
+        cache.bump('customer')
+
+        return jsonify(results.summary()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f"An error occurred: {str(e)}"}), 500
+
 @customer_bp.route('/<int:id>', methods=['PUT'])
 def update_customer(id):
     try:
@@ -75,21 +153,22 @@ def update_customer(id):
 
         data = request.get_json()
 
+        location_id = data.get('location_id')
+        if location_id is not None and location_id not in locations_by_id([location_id]):
+            return jsonify({'message': 'Location not found'}), 400
+
         # update only the field sent for update, use the customer.<value> as the fallback
         customer.name = data.get('name', customer.name)
         customer.address = data.get('address', customer.address)
         customer.phone = data.get('phone', customer.phone)
+        customer.location_id = data.get('location_id', customer.location_id)
 
         db.session.commit()
+        cache.bump('customer')
 
         return jsonify({
             'message': 'Customer updated successfully',
-            'customer': {
-                'id': customer.id,
-                'name': customer.name,
-                'address': customer.address,
-                'phone': customer.phone
-            }
+            'customer': CUSTOMER.from_instance(customer)
         }), 200
     except KeyError as e:
         return jsonify({'message': f'Missing field: {str(e)}'}), 400
@@ -104,8 +183,14 @@ def delete_customer(id):
         if not customer:
             return jsonify({'message': 'Customer not found'}), 404
 
+        # delivery stops outlive the customer they were generated for
+        db.session.execute(
+            db.update(DeliveryAssignment.__table__).where(DeliveryAssignment.customer_id == id).values(customer_id=None)
+        )
         db.session.delete(customer)
         db.session.commit()
+        # subscriptions are deleted along with the customer
+        cache.bump('customer', 'subscription')
 
         return jsonify({'message': f'Customer with ID {id} has been deleted.'}), 200
     except Exception as e:
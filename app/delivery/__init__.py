@@ -2,4 +2,4 @@ from flask import Blueprint
 
 delivery_bp = Blueprint('delivery', __name__, url_prefix="/deliveries")
 
-from . import routes
\ No newline at end of file
+from . import routes, manifest
\ No newline at end of file
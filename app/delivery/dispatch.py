@@ -0,0 +1,58 @@
+import numpy as np
+import sqlalchemy as sa
+
+from app.extensions import db
+from app.models import DeliveryAssignment, Location, delivery_assignment_location
+from app.reference import active_carriers
+
+# A day's dispatch state as NumPy structured arrays, which is all the
+# assignment solvers in optimizer.py work on.
+#
+# Deliveries are read with one Core SELECT joining each assignment to its
+# locations, streamed from the cursor straight into a record array: no ORM
+# instances, and no lazy load of `locations` per assignment. An assignment
+# with several locations is dispatched to its first (lowest id), as
+# replan.py does. Carriers come from the cached active carrier list. Results
+# are written back by id with queries.save_assignments.
+
+DELIVERY_DTYPE = np.dtype([
+    ('id', np.int64),
+    ('location_id', np.int64),
+    ('latitude', np.float64),
+    ('longitude', np.float64),
+    ('carrier_id', np.int64)
+])
+
+CARRIER_DTYPE = np.dtype([('id', np.int64), ('latitude', np.float64), ('longitude', np.float64)])
+
+# carrier_id of a delivery nobody holds
+UNASSIGNED = -1
+
+
+def load_deliveries(criteria, session=None):
+    """Deliveries matching `criteria` as a DELIVERY_DTYPE array ordered by
+    id. Deliveries without a location have nowhere to go and are left out."""
+    link = delivery_assignment_location.c
+    result = (session or db.session).execute(
+        db.select(
+            DeliveryAssignment.id, Location.id, Location.latitude, Location.longitude,
+            sa.func.coalesce(DeliveryAssignment.delivery_person_id, UNASSIGNED)
+        )
+        .join(delivery_assignment_location, link.delivery_assignment_id == DeliveryAssignment.id)
+        .join(Location, Location.id == link.location_id)
+        .where(*criteria)
+        .order_by(DeliveryAssignment.id, Location.id)
+        # fetched in batches, so only the array grows with the day
+        .execution_options(yield_per=2000)
+    )
+    deliveries = np.fromiter(map(tuple, result), dtype=DELIVERY_DTYPE)
+
+    # keep each assignment's first location
+    first = np.ones(len(deliveries), dtype=bool)
+    first[1:] = deliveries['id'][1:] != deliveries['id'][:-1]
+    return deliveries if first.all() else deliveries[first]
+
+
+def load_carriers():
+    """The active carriers as a CARRIER_DTYPE array ordered by id"""
+    return np.array(active_carriers(), dtype=CARRIER_DTYPE)
@@ -0,0 +1,112 @@
+from datetime import datetime
+
+import click
+import sqlalchemy as sa
+from sqlalchemy.orm import aliased
+
+from app.cache import cache
+from app.events.hub import hub
+from app.extensions import db
+from app.models import Customer, DeliveryAssignment, DeliveryAssignmentPublication, Subscription, delivery_assignment_location
+from . import delivery_bp
+
+# A day's delivery manifest, generated from the subscriptions.
+#
+# Every customer with a subscription active on the day and a location
+# (Customer.location_id) gets one stop: a DeliveryAssignment carrying the
+# customer, linked to their location and to every publication they take.
+# Generation is three INSERT ... SELECT statements in one transaction (stops,
+# then their location links, then their publication links), so no row passes
+# through Python whatever the number of subscribers.
+#
+# Each statement only adds what is missing, so generating a day again creates
+# nothing, or only the stops and publications of subscriptions activated
+# since; it never removes a publication from a stop. The unique index on
+# (date, customer_id) turns a concurrent second run into an IntegrityError
+# rather than duplicate stops. Stops are created unassigned; POST
+# /deliveries/assign/<date> hands them to carriers.
+
+
+def active_subscriptions(day):
+    """WHERE criteria for the subscriptions to deliver on `day`"""
+    return (
+        Subscription.status == 'subscribed',
+        sa.or_(Subscription.start_date.is_(None), Subscription.start_date <= day),
+        Subscription.is_active(day)
+    )
+
+
+def generate_manifest(day):
+    """Create the stops and links for `day` that do not exist yet and commit.
+    Returns the number of stops, location links and publication links
+    created, and of subscribed customers skipped for having no location."""
+    stop = aliased(DeliveryAssignment)
+    link = delivery_assignment_location.c
+
+    subscribers = db.select(Subscription.customer_id).where(*active_subscriptions(day))
+
+    stops = db.insert(DeliveryAssignment.__table__).from_select(
+        ['date', 'customer_id', 'location_id'],
+        db.select(sa.literal(day, DeliveryAssignment.date.type), Customer.id, Customer.location_id)
+        .where(
+            Customer.location_id.is_not(None),
+            Customer.id.in_(subscribers),
+            ~db.select(stop.id).where(stop.date == day, stop.customer_id == Customer.id).exists()
+        )
+    )
+
+    location_links = db.insert(delivery_assignment_location).from_select(
+        ['delivery_assignment_id', 'location_id'],
+        db.select(DeliveryAssignment.id, DeliveryAssignment.location_id)
+        .where(
+            DeliveryAssignment.date == day,
+            DeliveryAssignment.customer_id.is_not(None),
+            ~db.select(link.delivery_assignment_id).where(link.delivery_assignment_id == DeliveryAssignment.id).exists()
+        )
+    )
+
+    publication_links = db.insert(DeliveryAssignmentPublication.__table__).from_select(
+        ['delivery_assignment_id', 'publication_id'],
+        db.select(DeliveryAssignment.id, Subscription.publication_id).distinct()
+        .join(Subscription, Subscription.customer_id == DeliveryAssignment.customer_id)
+        .where(
+            DeliveryAssignment.date == day,
+            *active_subscriptions(day),
+            ~db.select(DeliveryAssignmentPublication.id).where(
+                DeliveryAssignmentPublication.delivery_assignment_id == DeliveryAssignment.id,
+                DeliveryAssignmentPublication.publication_id == Subscription.publication_id
+            ).exists()
+        )
+    )
+
+    try:
+        counts = {
+            'stops': db.session.execute(stops).rowcount,
+            'location_links': db.session.execute(location_links).rowcount,
+            'publication_links': db.session.execute(publication_links).rowcount
+        }
+        counts['without_location'] = db.session.scalar(
+            db.select(sa.func.count()).where(Customer.location_id.is_(None), Customer.id.in_(subscribers))
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if counts['stops'] or counts['publication_links']:
+        cache.bump('delivery')
+        hub.publish('delivery', 'generated', dict(counts, date=day.isoformat()))
+    return counts
+
+
+@delivery_bp.cli.command('generate')
+@click.argument('day')
+def generate_command(day):
+    """Create the delivery stops for DAY (YYYY-MM-DD) from the subscriptions."""
+    try:
+        day = datetime.strptime(day, '%Y-%m-%d').date()
+    except ValueError:
+        raise click.BadParameter('Please use YYYY-MM-DD', param_hint='DAY')
+
+    for name, count in generate_manifest(day).items():
+        click.echo(f'{name}: {count}')
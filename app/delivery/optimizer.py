@@ -1,4 +1,5 @@
 import numpy as np
+from app.geo import distance_matrix, DEFAULT_METRIC
 # KNN to calculate the nearest coordinates (addresses) to a specific coordinate (address)
 """ 
 starting point
@@ -27,39 +28,334 @@ destination
 
 """
 
-def euclidean_distance(point1, point2):
-    return np.linalg.norm(np.array(point1) - np.array(point2))
+# carrier rows of the distance matrix computed per pass, so peak memory stays
+# around CHUNK_ROWS * len(deliveries) floats instead of the whole matrix
+CHUNK_ROWS = 64
 
-def distribute_work(deliveries, delivery_persons, deliveries_per_carrier, remaining):
-    print(deliveries)
-    assignment_list = []
+def pack_coordinates(points):
+    """Pack (latitude, longitude) pairs into a contiguous (n, 2) float64 array"""
+    return np.ascontiguousarray(np.asarray(points, dtype=np.float64).reshape(-1, 2))
 
-    for carrier in delivery_persons:
-        distances = []
-        carrier_coordinates = (carrier.latitude, carrier.longitude)
-        
-        for delivery in deliveries:
-            coordinates = (delivery.locations[0].latitude, delivery.locations[0].longitude)
-            distance = euclidean_distance(coordinates, carrier_coordinates)
-            distances.append((distance, delivery))
+def nearest_indices(distances, k):
+    """Indices of the k smallest distances, ordered by (distance, index) like a stable sort"""
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(distances):
+        partitioned = np.argpartition(distances, k - 1)
+        cutoff = distances[partitioned[k - 1]]
+        # keep everything tied with the k-th value so ties resolve by index
+        candidates = np.flatnonzero(distances <= cutoff)
+    else:
+        candidates = np.arange(len(distances))
+    order = np.lexsort((candidates, distances[candidates]))
+    return candidates[order[:k]]
 
-        distances.sort(key=lambda x: x[0])
+def weighted_prefix(weights, limit):
+    """How many of `weights`, taken in order, bring their sum closest to
+    `limit`: a stop is taken while that gets nearer than leaving it, since
+    stops are never split. For unit weights, min(len(weights), limit)."""
+    return int(np.count_nonzero(np.cumsum(weights) - weights / 2 < limit))
 
-        nearest_deliveries = [delivery for _, delivery in distances[:deliveries_per_carrier]]
+def assign_nearest(delivery_coords, carrier_coords, deliveries_per_carrier, remaining, metric=DEFAULT_METRIC, weights=None):
+    """Greedy nearest-k assignment over packed coordinate arrays.
 
-        assignment_list.append((carrier, nearest_deliveries))
+    Each carrier in turn takes its nearest deliveries_per_carrier unconsumed
+    deliveries, then every carrier gets up to `remaining` of the leftovers in
+    list order. With `weights` the points are consolidated stops counting
+    for that many deliveries each; a carrier takes whole stops, as near its
+    count as they come, and the next carrier's count makes up the difference.
+    Returns (carrier_index, delivery_indices) pairs.
+    """
+    consumed = np.zeros(len(delivery_coords), dtype=bool)
+    available = len(delivery_coords)
+    assignments = []
+    # deliveries taken so far, against which the weighted counts are kept
+    taken = 0
 
-        deliveries = [delivery for delivery in deliveries if delivery not in nearest_deliveries]
+    for start in range(0, len(carrier_coords), CHUNK_ROWS):
+        block = distance_matrix(carrier_coords[start:start + CHUNK_ROWS], delivery_coords, metric)
 
-    if remaining > 0:
-        for carrier in delivery_persons:
-            remaining_deliveries = deliveries[:remaining]
-            assignment_list.append((carrier, remaining_deliveries))
-            deliveries = deliveries[remaining:]
+        for offset, distances in enumerate(block):
+            distances[consumed] = np.inf
+            if weights is None:
+                picked = nearest_indices(distances, min(deliveries_per_carrier, available))
+            else:
+                count = (start + offset + 1) * deliveries_per_carrier - taken
+                picked = nearest_indices(distances, min(count, available))
+                picked = picked[:weighted_prefix(weights[picked], count)]
+                taken += int(weights[picked].sum())
+            consumed[picked] = True
+            available -= len(picked)
+            assignments.append((start + offset, picked))
 
-    return assignment_list
+    # whole stops can also fall short of the counts, leaving some with none left over
+    if remaining > 0 or (weights is not None and available):
+        leftover = np.flatnonzero(~consumed)
+        for carrier_index in range(len(carrier_coords)):
+            if weights is None:
+                take = remaining
+            elif carrier_index == len(carrier_coords) - 1:
+                # stops are not split, so the counts may leave more than `remaining` each
+                take = len(leftover)
+            else:
+                take = weighted_prefix(weights[leftover], remaining)
+            assignments.append((carrier_index, leftover[:take]))
+            leftover = leftover[take:]
 
+    return assignments
 
-    
-        
+def coordinates(records):
+    """Packed coordinates of a dispatch snapshot array (deliveries or carriers)"""
+    return np.column_stack((records['latitude'], records['longitude']))
 
+def consolidate(keys):
+    """Group the points sharing a key (a location id, or rounded coordinates)
+    into stops, numbered in order of first appearance. Returns the first point
+    of each stop, the stop of every point and the points per stop."""
+    keys = np.asarray(keys)
+    _, first, stop_of, weights = np.unique(keys, axis=0, return_index=True, return_inverse=True, return_counts=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return first[order], rank[stop_of.reshape(-1)], weights[order]
+
+def stop_members(stop_of, stops):
+    """The point indices of each stop, in list order"""
+    order = np.argsort(stop_of, kind='stable')
+    return np.split(order, np.cumsum(np.bincount(stop_of, minlength=stops))[:-1])
+
+def stop_keys(deliveries, delivery_coords, by, precision):
+    """What deliveries are consolidated on: their location id, their
+    coordinates rounded to `precision` decimal places, or nothing (None)"""
+    if by == 'location':
+        return deliveries['location_id']
+    if by == 'coordinates':
+        # + 0.0 folds -0.0 into 0.0 so both round to the same key
+        return np.round(delivery_coords, precision) + 0.0
+    return None
+
+def distribute_work(deliveries, carriers, deliveries_per_carrier, remaining, metric=DEFAULT_METRIC,
+                    consolidate_by=None, precision=4):
+    """Greedy assignment of a dispatch snapshot (see dispatch.py). Returns
+    the index into `carriers` of each delivery, or -1 if none took it."""
+    delivery_coords = coordinates(deliveries)
+    carrier_coords = coordinates(carriers)
+    owner = np.full(len(deliveries), -1, dtype=np.intp)
+
+    keys = stop_keys(deliveries, delivery_coords, consolidate_by, precision)
+    if keys is None:
+        for carrier_index, picked in assign_nearest(delivery_coords, carrier_coords, deliveries_per_carrier, remaining, metric):
+            owner[picked] = carrier_index
+        return owner
+
+    # solve over the stops, then hand every carrier all the deliveries of its stops
+    first, stop_of, weights = consolidate(keys)
+    stop_owner = np.full(len(first), -1, dtype=np.intp)
+    for carrier_index, picked in assign_nearest(
+        delivery_coords[first], carrier_coords, deliveries_per_carrier, remaining, metric, weights
+    ):
+        stop_owner[picked] = carrier_index
+    return stop_owner[stop_of]
+
+
+def assign_balanced(delivery_coords, carrier_coords, capacity, metric=DEFAULT_METRIC):
+    """Capacitated min-cost assignment of deliveries to carriers.
+
+    Every delivery starts at its nearest carrier, then overloaded carriers are
+    drained along the cheapest chains of moves to carriers with spare capacity
+    (successive shortest paths over the carrier graph, with potentials so
+    Dijkstra applies). The result minimises the total carrier-to-delivery
+    distance. Returns the carrier index of each delivery.
+    """
+    owner = np.zeros(len(delivery_coords), dtype=np.intp)
+    units = np.ones(len(delivery_coords), dtype=np.intp)
+    for carrier, held in enumerate(_balance_units(delivery_coords, carrier_coords, capacity, metric, units)):
+        owner[list(held)] = carrier
+    return owner
+
+def _balance_units(delivery_coords, carrier_coords, capacity, metric, units):
+    """assign_balanced's solver, for points of units[i] deliveries each that
+    may be split between carriers. Returns {point: units} for each carrier."""
+    distances = distance_matrix(delivery_coords, carrier_coords, metric)
+    total_deliveries, total_carriers = distances.shape
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=np.intp), (total_carriers,))
+
+    if units.sum() > capacity.sum():
+        raise ValueError('Carrier capacity is smaller than the number of deliveries')
+
+    owner = distances.argmin(axis=1)
+    holders = [{} for _ in range(total_carriers)]
+    if total_deliveries == 0:
+        return holders
+
+    load = np.bincount(owner, weights=units, minlength=total_carriers).astype(np.intp)
+    for carrier in range(total_carriers):
+        held = np.flatnonzero(owner == carrier)
+        holders[carrier] = dict(zip(held.tolist(), units[held].tolist()))
+
+    # node total_carriers is a sink that carriers with spare capacity drain
+    # into at no cost. move_cost[a, b] is the cheapest extra distance for
+    # handing one of a's deliveries to b, and mover[a, b] that delivery.
+    sink = total_carriers
+    move_cost = np.full((total_carriers, total_carriers + 1), np.inf)
+    mover = np.zeros((total_carriers, total_carriers), dtype=np.intp)
+    for carrier in range(total_carriers):
+        _refresh_moves(distances, holders, carrier, move_cost, mover, np.arange(total_carriers))
+    move_cost[:, sink] = np.where(load < capacity, 0.0, np.inf)
+
+    potentials = np.zeros(total_carriers + 1)
+
+    while (load > capacity).any():
+        dist, previous = _move_distances(move_cost, potentials, load > capacity)
+        if not np.isfinite(dist[sink]):
+            raise ValueError('No carrier with spare capacity is reachable')
+
+        # keeps every reduced cost non-negative for the next search
+        potentials += np.minimum(dist, dist[sink])
+
+        path = []
+        node = previous[sink]
+        while load[node] <= capacity[node]:
+            path.append((previous[node], node))
+            node = previous[node]
+
+        # as many units as the overload, the spare room and every move allow
+        end = path[0][1]
+        amount = min(load[node] - capacity[node], capacity[end] - load[end])
+        amount = min(amount, *(holders[source][mover[source, destination]] for source, destination in path))
+
+        for source, destination in path:
+            delivery = int(mover[source, destination])
+            holders[source][delivery] -= amount
+            if not holders[source][delivery]:
+                del holders[source][delivery]
+                _drop_mover(distances, holders, source, delivery, move_cost, mover)
+            holders[destination][delivery] = holders[destination].get(delivery, 0) + amount
+            _add_mover(distances, destination, delivery, move_cost, mover)
+
+        load[node] -= amount
+        load[end] += amount
+        move_cost[end, sink] = 0.0 if load[end] < capacity[end] else np.inf
+
+    return holders
+
+def _refresh_moves(distances, holders, carrier, move_cost, mover, columns):
+    held = np.fromiter(holders[carrier], dtype=np.intp, count=len(holders[carrier]))
+    if not len(held):
+        move_cost[carrier, columns] = np.inf
+        return
+
+    extra = distances[np.ix_(held, columns)] - distances[held, carrier][:, None]
+    best = extra.argmin(axis=0)
+    move_cost[carrier, columns] = extra[best, np.arange(len(columns))]
+    mover[carrier, columns] = held[best]
+    move_cost[carrier, carrier] = np.inf
+
+def _add_mover(distances, carrier, delivery, move_cost, mover):
+    extra = distances[delivery] - distances[delivery, carrier]
+    better = extra < move_cost[carrier, :len(extra)]
+    better[carrier] = False
+    move_cost[carrier, :len(extra)][better] = extra[better]
+    mover[carrier, better] = delivery
+
+def _drop_mover(distances, holders, carrier, delivery, move_cost, mover):
+    stale = np.flatnonzero(mover[carrier] == delivery)
+    stale = stale[stale != carrier]
+    if len(stale):
+        _refresh_moves(distances, holders, carrier, move_cost, mover, stale)
+
+def _move_distances(move_cost, potentials, sources):
+    """Dijkstra over reduced move costs from every overloaded carrier to the
+    sink. Stops once the sink is settled; returns tentative distances and
+    predecessors on the shortest path tree.
+    """
+    sink = len(move_cost)
+
+    source_rows = np.flatnonzero(sources)
+    first_hop = move_cost[source_rows] + (potentials[source_rows, None] - potentials)
+    dist = first_hop.min(axis=0)
+    previous = source_rows[first_hop.argmin(axis=0)]
+    dist[source_rows] = 0.0
+
+    done = np.append(sources, False)
+    pending = np.where(done, np.inf, dist)
+
+    while True:
+        current = int(pending.argmin())
+        if current == sink or pending[current] == np.inf:
+            return dist, previous
+        done[current] = True
+        pending[current] = np.inf
+
+        relaxed = move_cost[current] + (dist[current] + potentials[current]) - potentials
+        better = relaxed < pending
+        better &= ~done
+        dist[better] = relaxed[better]
+        pending[better] = relaxed[better]
+        previous[better] = current
+
+def assign_balanced_stops(delivery_coords, stops, carrier_coords, capacity, metric=DEFAULT_METRIC):
+    """assign_balanced over the consolidated stops (first, stop_of, weights)
+    of the deliveries, keeping every stop with one carrier where capacity
+    allows.
+
+    Solves the min-cost assignment over the stops, free to split them, then
+    gives each split stop to the carrier holding most of it and solves the
+    single deliveries again over the capacity left. Where that overfills a
+    carrier, the deliveries of the split stops are solved one by one with the
+    singles instead. Returns the carrier index of each delivery.
+    """
+    first, stop_of, weights = stops
+    owner = np.zeros(len(weights), dtype=np.intp)
+    largest = np.zeros(len(weights), dtype=np.intp)
+    for carrier, held in enumerate(_balance_units(delivery_coords[first], carrier_coords, capacity, metric, weights)):
+        held_stops = np.fromiter(held, dtype=np.intp, count=len(held))
+        counts = np.fromiter(held.values(), dtype=np.intp, count=len(held))
+        larger = counts > largest[held_stops]
+        owner[held_stops[larger]] = carrier
+        largest[held_stops[larger]] = counts[larger]
+
+    split = largest < weights
+    if not split.any():
+        return owner[stop_of]
+
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=np.intp), (len(carrier_coords),))
+    fixed = weights > 1
+    spare = capacity - np.bincount(owner[fixed], weights=weights[fixed], minlength=len(carrier_coords)).astype(np.intp)
+    if (spare < 0).any():
+        fixed &= ~split
+        spare = capacity - np.bincount(owner[fixed], weights=weights[fixed], minlength=len(carrier_coords)).astype(np.intp)
+
+    owner = owner[stop_of]
+    open_deliveries = np.flatnonzero(~fixed[stop_of])
+    owner[open_deliveries] = assign_balanced(delivery_coords[open_deliveries], carrier_coords, spare, metric)
+    return owner
+
+def balance_work(deliveries, carriers, capacity, metric=DEFAULT_METRIC, consolidate_by=None, precision=4):
+    """Like distribute_work, but with the capacitated min-cost solver"""
+    delivery_coords = coordinates(deliveries)
+    carrier_coords = coordinates(carriers)
+
+    keys = stop_keys(deliveries, delivery_coords, consolidate_by, precision)
+    if keys is None:
+        owner = assign_balanced(delivery_coords, carrier_coords, capacity, metric)
+    else:
+        owner = assign_balanced_stops(delivery_coords, consolidate(keys), carrier_coords, capacity, metric)
+    return owner
+
+def summarize_work(deliveries, carriers, owner, metric=DEFAULT_METRIC):
+    """Per-carrier delivery count plus total and maximum carrier-to-drop distance"""
+    delivery_coords = coordinates(deliveries)
+    carrier_coords = coordinates(carriers)
+
+    summary = []
+    for carrier_index, carrier_id in enumerate(carriers['id'].tolist()):
+        held = np.flatnonzero(owner == carrier_index)
+        entry = {'delivery_person_id': carrier_id, 'deliveries': len(held), 'total_distance': 0.0, 'max_distance': 0.0}
+        if len(held):
+            distances = distance_matrix(carrier_coords[carrier_index:carrier_index + 1], delivery_coords[held], metric)[0]
+            entry['total_distance'] = float(distances.sum())
+            entry['max_distance'] = float(distances.max())
+        summary.append(entry)
+
+    return summary
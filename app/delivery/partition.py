@@ -0,0 +1,249 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app.extensions import db
+from app.geo import DEFAULT_METRIC, distance_matrix
+from app.models import DeliveryAssignment, Location, delivery_assignment_location
+from .optimizer import assign_balanced, balance_work, coordinates, distribute_work
+
+# Region-partitioned assignment for days too large for one city-wide pass.
+#
+# The day's deliveries are split into groups by their location's city or
+# postal code, and every group gets a share of the carriers proportional to
+# its deliveries, matched to the groups by the capacitated solver (nearest
+# group centroid, exact shares). Or deliveries and carriers are split
+# together into regions by recursive bisection, each region with the same
+# deliveries per carrier, so groups hardly overflow. Each group is then
+# solved on its own with the requested strategy, in a pool of worker
+# processes: the snapshot arrays (dispatch.py) are copied once into shared
+# memory, laid out group by group, so a job is just a pair of slices and the
+# workers write their result into a shared owner array.
+#
+# A group whose carriers end up over the day's capacity per carrier hands
+# each overloaded carrier's farthest deliveries back, and those are solved
+# over every carrier's spare capacity, which in practice means the carriers
+# of the neighbouring groups.
+
+PARTITIONS = ('none', 'city', 'postal_code', 'spatial')
+
+
+def location_groups(criteria, location_ids, column, session=None):
+    """Group number per delivery from `column` (Location.city or
+    Location.postal_code) of its location. `criteria` selects the same
+    deliveries as the snapshot holding `location_ids`."""
+    link = delivery_assignment_location.c
+    rows = (session or db.session).execute(
+        db.select(Location.id, column).distinct()
+        .join(delivery_assignment_location, link.location_id == Location.id)
+        .join(DeliveryAssignment, DeliveryAssignment.id == link.delivery_assignment_id)
+        .where(*criteria)
+        .order_by(Location.id)
+    ).all()
+
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    _, labels = np.unique([str(row[1]) for row in rows], return_inverse=True)
+    return labels[np.searchsorted(ids, location_ids)]
+
+
+def spatial_groups(delivery_points, carrier_points, parts):
+    """Split the deliveries and carriers together into `parts` regions by
+    recursive bisection: each cut is across the wider axis, puts a share of
+    the carriers on either side and as many deliveries as keep both sides
+    at the same deliveries per carrier. Returns the region of every delivery
+    and of every carrier."""
+    groups = np.zeros(len(delivery_points), dtype=np.intp)
+    carrier_groups = np.zeros(len(carrier_points), dtype=np.intp)
+
+    def bisect(indices, carrier_indices, parts, first):
+        # a region left without deliveries (a small day) is not cut further:
+        # its carriers share its number and only take overflow
+        if parts <= 1 or len(carrier_indices) < 2 or not len(indices):
+            groups[indices] = first
+            carrier_groups[carrier_indices] = first
+            return
+        left = parts // 2
+        region = delivery_points[indices]
+        axis = int(np.ptp(region, axis=0).argmax())
+        ordered = indices[np.argsort(region[:, axis], kind='stable')]
+        carriers_ordered = carrier_indices[np.argsort(carrier_points[carrier_indices, axis], kind='stable')]
+        carrier_cut = len(carriers_ordered) * left // parts
+        cut = len(ordered) * carrier_cut // len(carriers_ordered)
+        bisect(ordered[:cut], carriers_ordered[:carrier_cut], left, first)
+        bisect(ordered[cut:], carriers_ordered[carrier_cut:], parts - left, first + left)
+
+    bisect(np.arange(len(delivery_points)), np.arange(len(carrier_points)), parts, 0)
+    return groups, carrier_groups
+
+
+def carrier_shares(sizes, carriers):
+    """Carriers per group in proportion to its deliveries (largest remainder),
+    at least one each while there are carriers for every group"""
+    base = np.ones(len(sizes), dtype=np.intp) if carriers >= len(sizes) else np.zeros(len(sizes), dtype=np.intp)
+    share = sizes * (carriers - base.sum()) / sizes.sum()
+    shares = base + np.floor(share).astype(np.intp)
+    short = carriers - int(shares.sum())
+    shares[np.argsort(np.floor(share) - share, kind='stable')[:short]] += 1
+    return shares
+
+
+def partitioned_work(deliveries, carriers, groups, strategy, capacity, metric=DEFAULT_METRIC,
+                     consolidate_by=None, precision=4, carrier_group=None):
+    """Assign a dispatch snapshot group by group with `strategy` (greedy or
+    balanced), at most `capacity` deliveries per carrier. The carriers are
+    shared out over the groups unless `carrier_group` gives theirs. Returns
+    the index into `carriers` of each delivery, like distribute_work."""
+    labels, groups = np.unique(groups, return_inverse=True)
+    groups = groups.reshape(-1)
+    sizes = np.bincount(groups)
+    if carrier_group is None:
+        centroids = np.column_stack((
+            np.bincount(groups, weights=deliveries['latitude']) / sizes,
+            np.bincount(groups, weights=deliveries['longitude']) / sizes
+        ))
+        carrier_group = assign_balanced(coordinates(carriers), centroids, carrier_shares(sizes, len(carriers)), metric)
+    else:
+        # numbered like `groups`; the carriers of a group without deliveries
+        # go after the last one and only take overflow
+        position = np.searchsorted(labels, carrier_group)
+        known = (position < len(labels)) & (labels[np.minimum(position, len(labels) - 1)] == carrier_group)
+        carrier_group = np.where(known, position, len(labels))
+
+    # lay both out group by group, so every job is a pair of slices
+    delivery_order = np.argsort(groups, kind='stable')
+    carrier_order = np.argsort(carrier_group, kind='stable')
+    delivery_bounds = np.concatenate(([0], np.cumsum(sizes)))
+    carrier_bounds = np.concatenate(([0], np.cumsum(np.bincount(carrier_group, minlength=len(sizes)))))
+
+    jobs = []
+    for group in range(len(sizes)):
+        start, stop = int(delivery_bounds[group]), int(delivery_bounds[group + 1])
+        first, last = int(carrier_bounds[group]), int(carrier_bounds[group + 1])
+        if last == first:
+            # no carrier for this group: all of it goes to the rebalancing
+            continue
+        count, held = stop - start, last - first
+        if strategy == 'balanced':
+            parameters = (max(capacity, -(-count // held)),)
+        else:
+            # the leftovers spread one per carrier, so no carrier passes capacity needlessly
+            parameters = (min(count // held, capacity), 1 if count % held else 0)
+        jobs.append((start, stop, first, last, strategy, parameters, metric, consolidate_by, precision))
+
+    local = pool.run(deliveries[delivery_order], carriers[carrier_order], jobs)
+
+    owner = np.full(len(deliveries), -1, dtype=np.intp)
+    owner[delivery_order] = np.where(local >= 0, carrier_order[local], -1)
+    return rebalance(deliveries, carriers, owner, capacity, metric)
+
+
+def rebalance(deliveries, carriers, owner, capacity, metric=DEFAULT_METRIC):
+    """Take every carrier above `capacity` back down to its nearest
+    deliveries, and solve those handed back, and any unassigned, over the
+    carriers' spare capacity"""
+    delivery_coords = coordinates(deliveries)
+    carrier_coords = coordinates(carriers)
+    load = np.bincount(owner[owner >= 0], minlength=len(carriers))
+
+    overflow = [np.flatnonzero(owner < 0)]
+    for carrier in np.flatnonzero(load > capacity):
+        held = np.flatnonzero(owner == carrier)
+        distances = distance_matrix(carrier_coords[carrier:carrier + 1], delivery_coords[held], metric)[0]
+        overflow.append(held[np.argsort(distances, kind='stable')[capacity:]])
+    overflow = np.concatenate(overflow)
+    if not len(overflow):
+        return owner
+
+    owner[overflow] = -1
+    spare = capacity - np.bincount(owner[owner >= 0], minlength=len(carriers))
+    open_carriers = np.flatnonzero(spare > 0)
+    owner[overflow] = open_carriers[
+        assign_balanced(delivery_coords[overflow], carrier_coords[open_carriers], spare[open_carriers], metric)
+    ]
+    return owner
+
+
+def _solve(deliveries, carriers, owner, job):
+    start, stop, first, last, strategy, parameters, metric, consolidate_by, precision = job
+    solve = balance_work if strategy == 'balanced' else distribute_work
+    local = solve(deliveries[start:stop], carriers[first:last], *parameters, metric, consolidate_by, precision)
+    owner[start:stop] = np.where(local >= 0, local + first, -1)
+
+
+def _share(array):
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype)
+
+
+def _solve_shared(specs, job):
+    """Worker side: attach the shared arrays, solve one job into the shared owner array"""
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in specs]
+    try:
+        arrays = [np.ndarray(shape, dtype, buffer=block.buf) for block, (_, shape, dtype) in zip(blocks, specs)]
+        _solve(*arrays, job)
+        # the views must go before the blocks can close
+        del arrays
+    finally:
+        for block in blocks:
+            block.close()
+
+
+class PartitionPool:
+    """Worker processes for partitioned_work, started on first use and kept
+    for later requests, from a forkserver rather than forked from the app.
+    With DISPATCH_WORKERS of 1 the groups are solved in the request's own
+    process."""
+
+    def __init__(self):
+        self.workers = 1
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config['DISPATCH_WORKERS']
+        app.extensions['dispatch_pool'] = self
+
+    def run(self, deliveries, carriers, jobs):
+        """Solve `jobs` over the group-ordered snapshot; returns the owner array"""
+        owner = np.full(len(deliveries), -1, dtype=np.intp)
+        if self.workers <= 1 or len(jobs) <= 1:
+            for job in jobs:
+                _solve(deliveries, carriers, owner, job)
+            return owner
+
+        shared = [_share(array) for array in (deliveries, carriers, owner)]
+        try:
+            specs = [spec for _, spec in shared]
+            for future in [self._pool().submit(_solve_shared, specs, job) for job in jobs]:
+                future.result()
+            _, shape, dtype = specs[2]
+            return np.ndarray(shape, dtype, buffer=shared[2][0].buf).copy()
+        finally:
+            for block, _ in shared:
+                block.close()
+                block.unlink()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # never forked from here: this process already runs the
+                # telemetry, lifecycle and bcrypt threads and holds pooled
+                # connections. Workers come from a fresh forkserver (spawned
+                # where there is none) and import only what _solve_shared
+                # needs, plus the entry module, which run.py keeps app-free
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(method))
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+pool = PartitionPool()
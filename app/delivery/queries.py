@@ -0,0 +1,147 @@
+from collections import defaultdict
+
+from app.extensions import db
+from app.models import DeliveryAssignment, DeliveryAssignmentPublication, Location, Publication, delivery_assignment_location
+
+# Read side of the delivery endpoints. Listings are loaded as plain column
+# projections in three statements whatever the number of assignments: one for
+# the assignments, one for their location addresses and one for their
+# publication titles. The child queries reuse the assignment filter as a
+# subquery so no id list is shipped back to the database. The loaders use
+# db.session unless given another Session, e.g. an AsyncSession's run_sync().
+
+
+def assignment_filter(date=None, delivery_person_id=None, ids=None):
+    """WHERE criteria for the common delivery listing filters"""
+    criteria = []
+    if date is not None:
+        criteria.append(DeliveryAssignment.date == date)
+    if delivery_person_id is not None:
+        criteria.append(DeliveryAssignment.delivery_person_id == delivery_person_id)
+    if ids is not None:
+        criteria.append(DeliveryAssignment.id.in_(ids))
+    return criteria
+
+
+def load_assignments(criteria, session=None):
+    """Assignments matching `criteria` as dicts with id, delivery_person_id,
+    date, addresses and publications, ordered by id"""
+    session = session or db.session
+    rows = session.execute(assignment_columns(criteria).order_by(DeliveryAssignment.id)).all()
+    if not rows:
+        return []
+
+    return with_details(rows, db.select(DeliveryAssignment.id).where(*criteria), session)
+
+
+def assignment_columns(criteria):
+    """Column select for the assignments matching `criteria`, unordered"""
+    return db.select(DeliveryAssignment.id, DeliveryAssignment.delivery_person_id, DeliveryAssignment.date).where(*criteria)
+
+
+def with_details(rows, assignment_ids=None, session=None):
+    """Turn (id, delivery_person_id, date) rows into dicts carrying their
+    addresses and publication titles. `assignment_ids` may be a subquery
+    covering the rows; by default the rows' own ids are used."""
+    if assignment_ids is None:
+        assignment_ids = [row[0] for row in rows]
+    addresses = load_addresses(assignment_ids, session)
+    publications = load_publication_titles(assignment_ids, session)
+
+    return [
+        {
+            'id': assignment_id,
+            'delivery_person_id': delivery_person_id,
+            'date': date,
+            'addresses': addresses.get(assignment_id, []),
+            'publications': publications.get(assignment_id, [])
+        }
+        for assignment_id, delivery_person_id, date in rows
+    ]
+
+
+def load_addresses(assignment_ids, session=None):
+    """{assignment_id: [address, ...]} for an id list or id subquery"""
+    link = delivery_assignment_location.c
+    rows = (session or db.session).execute(
+        db.select(link.delivery_assignment_id, Location.address)
+        .join(Location, Location.id == link.location_id)
+        .where(link.delivery_assignment_id.in_(assignment_ids))
+        .order_by(link.delivery_assignment_id, Location.id)
+    )
+
+    addresses = defaultdict(list)
+    for assignment_id, address in rows:
+        addresses[assignment_id].append(address)
+    return addresses
+
+
+def load_publication_titles(assignment_ids, session=None):
+    """{assignment_id: [title, ...]} for an id list or id subquery"""
+    rows = (session or db.session).execute(
+        db.select(DeliveryAssignmentPublication.delivery_assignment_id, Publication.title)
+        .join(Publication, Publication.id == DeliveryAssignmentPublication.publication_id)
+        .where(DeliveryAssignmentPublication.delivery_assignment_id.in_(assignment_ids))
+        .order_by(DeliveryAssignmentPublication.delivery_assignment_id, DeliveryAssignmentPublication.id)
+    )
+
+    titles = defaultdict(list)
+    for assignment_id, title in rows:
+        titles[assignment_id].append(title)
+    return titles
+
+
+# Write side: a whole day's assignment is persisted as one executemany UPDATE
+# rather than an ORM flush of every changed instance. Rows another request has
+# assigned in the meantime are matched by the "still unassigned" guard and
+# left alone, which save_assignments reports through its return value.
+ASSIGN_STATEMENT = (
+    db.update(DeliveryAssignment.__table__)
+    .where(DeliveryAssignment.id == db.bindparam('assignment_id'))
+    .where(DeliveryAssignment.delivery_person_id.is_(None))
+    .values(delivery_person_id=db.bindparam('carrier_id'))
+)
+
+
+def save_assignments(assignment_ids, carrier_ids):
+    """Give each assignment id the carrier id at the same position, in a
+    single statement. Returns the number of rows updated, or None if the
+    driver cannot count them for an executemany. The caller commits."""
+    parameters = [
+        {'assignment_id': assignment_id, 'carrier_id': carrier_id}
+        for assignment_id, carrier_id in zip(assignment_ids, carrier_ids)
+    ]
+    if not parameters:
+        return 0
+
+    result = db.session.execute(ASSIGN_STATEMENT, parameters)
+    if not db.engine.dialect.supports_sane_multi_rowcount:
+        return None
+    return result.rowcount
+
+
+# Moves between carriers are guarded the same way: a row only moves if it is
+# still with the carrier it was taken from.
+MOVE_STATEMENT = (
+    db.update(DeliveryAssignment.__table__)
+    .where(DeliveryAssignment.id == db.bindparam('assignment_id'))
+    .where(DeliveryAssignment.delivery_person_id == db.bindparam('from_id'))
+    .values(delivery_person_id=db.bindparam('carrier_id'))
+)
+
+
+def move_assignments(moves):
+    """Write (assignment_id, from_id, carrier_id) moves in a single statement.
+    Returns the number of rows moved, or None if the driver cannot count them
+    for an executemany. The caller commits."""
+    parameters = [
+        {'assignment_id': assignment_id, 'from_id': from_id, 'carrier_id': carrier_id}
+        for assignment_id, from_id, carrier_id in moves
+    ]
+    if not parameters:
+        return 0
+
+    result = db.session.execute(MOVE_STATEMENT, parameters)
+    if not db.engine.dialect.supports_sane_multi_rowcount:
+        return None
+    return result.rowcount
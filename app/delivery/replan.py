@@ -0,0 +1,149 @@
+from collections import defaultdict
+from datetime import date
+
+import numpy as np
+from app.extensions import db
+from app.geo import DEFAULT_METRIC, distance_matrix
+from app.models import DeliveryAssignment, DeliveryPerson, Location, delivery_assignment_location
+from app.cache import cache
+from app.events.hub import hub
+from .dispatch import load_carriers
+from .optimizer import assign_balanced, coordinates, pack_coordinates
+from .queries import move_assignments
+from .routing import extend_route_plans
+
+# Incremental re-planning for carriers going on or off shift. Drops from today
+# on that belong to an inactive carrier are "stranded"; each date's stranded
+# drops are handed to the active carriers with the capacitated solver, limited
+# to the carriers' spare capacity for that date. Nobody else's drops move, and
+# the receiving carriers' route plans are extended by cheapest insertion
+# rather than re-sequenced. Drops without a location, or with no active
+# carrier to take them, stay where they are until the next re-plan.
+#
+# A carrier going off shift only has its own drops moved; one coming on shift
+# only takes stranded drops for itself. Spare capacity is the even share of
+# the day plus `slack` of it, so the drops go to the few nearest carriers and
+# only their plans are extended, instead of one drop to nearly everyone.
+
+
+def _stranded_drops(since, carrier_id=None):
+    """{date: [(assignment_id, carrier_id, latitude, longitude), ...]} for
+    drops held by inactive carriers, or by `carrier_id` alone, using each
+    drop's first location"""
+    criteria = [DeliveryPerson.is_active == False, DeliveryAssignment.date >= since]
+    if carrier_id is not None:
+        criteria.append(DeliveryAssignment.delivery_person_id == carrier_id)
+    rows = db.session.execute(
+        db.select(
+            DeliveryAssignment.id, DeliveryAssignment.date, DeliveryAssignment.delivery_person_id,
+            Location.latitude, Location.longitude
+        )
+        .join(DeliveryPerson, DeliveryPerson.id == DeliveryAssignment.delivery_person_id)
+        .join(delivery_assignment_location, delivery_assignment_location.c.delivery_assignment_id == DeliveryAssignment.id)
+        .join(Location, Location.id == delivery_assignment_location.c.location_id)
+        .where(*criteria)
+        .order_by(DeliveryAssignment.id, Location.id)
+    )
+
+    seen = set()
+    by_date = defaultdict(list)
+    for assignment_id, day, carrier_id, latitude, longitude in rows:
+        if assignment_id in seen:
+            continue
+        seen.add(assignment_id)
+        by_date[day].append((assignment_id, carrier_id, latitude, longitude))
+    return by_date
+
+
+def _loads(dates, carrier_ids):
+    """{(date, carrier_id): number of drops}"""
+    rows = db.session.execute(
+        db.select(DeliveryAssignment.date, DeliveryAssignment.delivery_person_id, db.func.count())
+        .where(DeliveryAssignment.date.in_(dates), DeliveryAssignment.delivery_person_id.in_(carrier_ids))
+        .group_by(DeliveryAssignment.date, DeliveryAssignment.delivery_person_id)
+    )
+    return {(day, carrier_id): count for day, carrier_id, count in rows}
+
+
+def replan_stranded(since=None, metric=DEFAULT_METRIC, carrier_id=None, receiver_id=None, slack=0.0):
+    """Move stranded drops dated `since` (default today) or later to active
+    carriers: only those of `carrier_id` if given, and only to `receiver_id`
+    if given. Each carrier takes at most its share of the day, the share
+    being the day's drops divided evenly over the active carriers, plus
+    `slack` (a fraction) of it.
+
+    Returns {'moved': n, 'stranded': n, 'carriers': [...]}, the carriers
+    listing how many drops each one received per date."""
+    since = since or date.today()
+    stranded = _stranded_drops(since, carrier_id)
+    remaining = sum(len(drops) for drops in stranded.values())
+
+    carriers = load_carriers()
+    if not stranded or not len(carriers):
+        return {'moved': 0, 'stranded': remaining, 'carriers': []}
+
+    carrier_ids = carriers['id'].tolist()
+    carrier_coords = coordinates(carriers)
+    loads = _loads(list(stranded), carrier_ids)
+    if receiver_id is not None:
+        # the share is still the even one over every active carrier
+        receivers = np.flatnonzero(carriers['id'] == receiver_id)
+        if not len(receivers):
+            return {'moved': 0, 'stranded': remaining, 'carriers': []}
+    else:
+        receivers = np.arange(len(carriers))
+
+    moves = []
+    received = defaultdict(int)
+    for day, drops in sorted(stranded.items()):
+        load = np.array([loads.get((day, carrier_id), 0) for carrier_id in carrier_ids])
+        share = int(-(-(int(load.sum()) + len(drops)) * (1 + slack) // len(carrier_ids)))
+        spare = np.zeros(len(carrier_ids), dtype=np.int64)
+        spare[receivers] = np.maximum(share - load[receivers], 0)
+
+        drop_coords = pack_coordinates([(latitude, longitude) for _, _, latitude, longitude in drops])
+        if spare.sum() < len(drops):
+            # a lone receiver takes its nearest drops; the rest stay stranded
+            nearest = np.argsort(distance_matrix(carrier_coords[receivers], drop_coords, metric)[0], kind='stable')
+            keep = np.sort(nearest[:int(spare.sum())])
+            drops = [drops[index] for index in keep]
+            drop_coords = drop_coords[keep]
+        if not drops:
+            continue
+
+        open_carriers = np.flatnonzero(spare > 0)
+        owner = open_carriers[assign_balanced(drop_coords, carrier_coords[open_carriers], spare[open_carriers], metric)]
+        for (assignment_id, from_id, _, _), carrier_index in zip(drops, owner):
+            moves.append((assignment_id, from_id, carrier_ids[carrier_index]))
+            received[(day, carrier_ids[carrier_index])] += 1
+
+    if not moves:
+        return {'moved': 0, 'stranded': remaining, 'carriers': []}
+
+    moved = move_assignments(moves)
+    if moved is not None and moved != len(moves):
+        # some drops changed hands meanwhile; leave them for the next run
+        db.session.rollback()
+        return {'moved': 0, 'stranded': remaining, 'carriers': []}
+    db.session.commit()
+    cache.bump('delivery')
+    if hub.listening('delivery'):
+        hub.publish('delivery', 'assigned', {'assignments': [
+            {'id': assignment_id, 'delivery_person_id': carrier_id} for assignment_id, _, carrier_id in moves
+        ]})
+
+    # receivers keep their sequence; the carriers the drops left lose their plan
+    extend_route_plans(
+        {(carrier_id, day) for day, carrier_id in received}
+        | {(from_id, day) for day, drops in stranded.items() for _, from_id, _, _ in drops},
+        fallback_metric=metric
+    )
+
+    return {
+        'moved': len(moves),
+        'stranded': remaining - len(moves),
+        'carriers': [
+            {'delivery_person_id': carrier_id, 'date': day.isoformat(), 'received': count}
+            for (day, carrier_id), count in sorted(received.items())
+        ]
+    }
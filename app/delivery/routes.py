@@ -1,9 +1,24 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from . import delivery_bp
 from app.extensions import db
-from app.models import DeliveryAssignment, Publication, DeliveryPerson, Location
+from app.geo import METRICS
+from app.models import DeliveryAssignment, DeliveryAssignmentPublication, Publication, DeliveryPerson, Location, delivery_assignment_location
+from app.reference import publications_by_id, locations_by_id
 from datetime import datetime
-from .optimizer import distribute_work
+from sqlalchemy.exc import IntegrityError
+from .dispatch import load_carriers, load_deliveries
+from .optimizer import coordinates, distribute_work, balance_work, summarize_work
+from .partition import PARTITIONS, location_groups, partitioned_work, spatial_groups
+from .routing import get_route_plan, refresh_route_plans
+from .queries import assignment_filter, assignment_columns, load_assignments, with_details, save_assignments
+from .manifest import generate_manifest
+from app.pagination import wants_page, page_response
+from app.cache import cache
+from app.conditional import conditional
+from app.events.hub import hub
+
+STRATEGIES = ('greedy', 'balanced')
+CONSOLIDATIONS = ('location', 'coordinates', 'none')
 
 @delivery_bp.route('/', methods=['POST'])
 def create_delivery_assignment():
@@ -18,61 +33,92 @@ def create_delivery_assignment():
         date=assignment_date
     )
 
-    new_assignment.locations = []
-
-    # Add publications (many-to-many relationship)
+    # Add publications and locations (many-to-many relationships); ids are
+    # checked against the reference cache and linked without loading rows
     publication_ids = data.get('publication_ids', [])
-    publications = Publication.query.filter(Publication.id.in_(publication_ids)).all()
-    new_assignment.publications.extend(publications)
+    publications = publications_by_id(publication_ids)
 
     location_ids = data.get("location_ids", [])
-    locations = Location.query.filter(Location.id.in_(location_ids)).all()
-    new_assignment.locations.extend(locations)
+    locations = locations_by_id(location_ids)
 
     # Add to the session and commit
     db.session.add(new_assignment)
+    db.session.flush()
+
+    publication_links = [
+        {'delivery_assignment_id': new_assignment.id, 'publication_id': publication_id}
+        for publication_id in dict.fromkeys(publication_ids) if publication_id in publications
+    ]
+    if publication_links:
+        db.session.execute(db.insert(DeliveryAssignmentPublication), publication_links)
+
+    location_links = [
+        {'delivery_assignment_id': new_assignment.id, 'location_id': location_id}
+        for location_id in dict.fromkeys(location_ids) if location_id in locations
+    ]
+    if location_links:
+        db.session.execute(db.insert(delivery_assignment_location), location_links)
     db.session.commit()
+    cache.bump('delivery')
+    publish_assignment('created', new_assignment.id)
 
     return jsonify({'message': 'Delivery assignment created', 'id': new_assignment.id}), 201
 
 @delivery_bp.route('/', methods=['GET'])
+@conditional('delivery', 'location', 'publication')
 def get_delivery_assignments():
     delivery_person_id = request.args.get('delivery_person_id', type=int)
     date_str = request.args.get('date')
 
-    query = DeliveryAssignment.query
-
-    if delivery_person_id:
-        query = query.filter(DeliveryAssignment.delivery_person_id == delivery_person_id)
-
+    date_obj = None
     if date_str:
         try:
             date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-            query = query.filter(DeliveryAssignment.date == date_obj)
         except ValueError:
             return jsonify({'message': 'Invalid date format. Please use YYYY-MM-DD'}), 400
 
-    assignments = query.all()
+    criteria = assignment_filter(date=date_obj, delivery_person_id=delivery_person_id or None)
+
+    if wants_page():
+        return page_response(assignment_columns(criteria), DeliveryAssignment.id, serialize_assignment_rows, 'deliveries')
+
+    assignments = load_assignments(criteria)
 
     if not assignments:
         return jsonify({'message': 'No delivery assignments found.'}), 404
 
-    result = [
+    return jsonify(serialize_assignments(assignments))
+
+
+def publish_assignment(event, assignment_id):
+    """Push an assignment as it now stands to the live feed"""
+    if not hub.listening('delivery'):
+        return
+    assignments = serialize_assignments(load_assignments(assignment_filter(ids=[assignment_id])))
+    if assignments:
+        hub.publish('delivery', event, assignments[0])
+
+
+def serialize_assignment_rows(rows):
+    return serialize_assignments(with_details(rows))
+
+
+def serialize_assignments(assignments):
+    return [
         {
-            'id': assignment.id,
-            'delivery_person_id': assignment.delivery_person_id,
-            'date': assignment.date.isoformat(),
-            'address': [location.address for location in assignment.locations],
-            'publications': [publication.title for publication in assignment.publications]
+            'id': assignment['id'],
+            'delivery_person_id': assignment['delivery_person_id'],
+            'date': assignment['date'].isoformat(),
+            'address': assignment['addresses'],
+            'publications': assignment['publications']
         }
         for assignment in assignments
     ]
 
-    return jsonify(result)
-
 
 
 @delivery_bp.route('/<int:id>', methods=['GET'])
+@conditional('delivery', 'location', 'publication')
 def get_delivery_assignment(id):
     assignment = DeliveryAssignment.query.get(id)
 
@@ -98,6 +144,11 @@ def update_delivery_assignment(id):
         return jsonify({'message': 'Delivery assignment not found'}), 404
 
     data = request.get_json()
+    planned = (assignment.delivery_person_id, assignment.date)
+
+    delivery_person_id = data.get('delivery_person_id')
+    if delivery_person_id is not None and not db.session.get(DeliveryPerson, delivery_person_id):
+        return jsonify({'message': 'Delivery person not found'}), 404
 
     assignment.delivery_person_id = data.get('delivery_person_id', assignment.delivery_person_id)
     assignment.date = data.get('date', assignment.date)
@@ -113,6 +164,10 @@ def update_delivery_assignment(id):
         assignment.locations = locations 
 
     db.session.commit()
+    cache.bump('delivery')
+    # the plans the assignment left and joined
+    refresh_route_plans([planned, (assignment.delivery_person_id, assignment.date)])
+    publish_assignment('updated', id)
 
     return jsonify({'message': 'Delivery assignment updated successfully'}), 200
 
@@ -124,12 +179,17 @@ def delete_delivery_assignment(id):
     if not assignment:
         return jsonify({'message': 'Delivery assignment not found'}), 404
 
+    planned = (assignment.delivery_person_id, assignment.date)
     db.session.delete(assignment)
     db.session.commit()
+    cache.bump('delivery')
+    refresh_route_plans([planned])
+    hub.publish('delivery', 'deleted', {'id': id})
 
     return jsonify({'message': f'Delivery assignment {id} deleted successfully'}), 200
 
 @delivery_bp.route('/daily/<date>', methods=['GET'])
+@conditional('delivery', 'location', 'publication')
 def get_daily_deliveries(date):
     try:
         date_obj = datetime.strptime(date, '%Y-%m-%d').date()
@@ -138,22 +198,17 @@ def get_daily_deliveries(date):
 
     delivery_person_id = request.args.get('delivery_person_id', type=int)  # optional filter
 
-    deliveries = DeliveryAssignment.query.filter_by(date=date_obj)
-
-    if delivery_person_id:
-        deliveries = deliveries.filter(DeliveryAssignment.delivery_person_id == delivery_person_id)
-
-    deliveries = deliveries.all()
+    deliveries = load_assignments(assignment_filter(date=date_obj, delivery_person_id=delivery_person_id or None))
 
     if not deliveries:
         return jsonify({'message': 'No deliveries found for the specified date'}), 404
 
     result = [
         {
-            'id': delivery.id,
-            'delivery_person_id': delivery.delivery_person_id,
-            'locations': [d.address for d in delivery.locations],
-            'publications': [pub.title for pub in delivery.publications]
+            'id': delivery['id'],
+            'delivery_person_id': delivery['delivery_person_id'],
+            'locations': delivery['addresses'],
+            'publications': delivery['publications']
         }
         for delivery in deliveries
     ]
@@ -162,24 +217,87 @@ def get_daily_deliveries(date):
 
 
 @delivery_bp.route('/person/<int:id>', methods=['GET'])
+@conditional('delivery', 'location', 'publication')
 def get_person_deliveries(id):
-    deliveries = DeliveryAssignment.query.filter_by(delivery_person_id=id).all()
+    date_str = request.args.get('date')
+    if date_str:
+        return get_person_route(id, date_str)
+
+    deliveries = load_assignments(assignment_filter(delivery_person_id=id))
 
     if not deliveries:
         return jsonify({'message': 'No deliveries found for this delivery person'}), 404
 
     result = [
         {
-            'id': delivery.id,
-            'date': delivery.date.strftime('%Y-%m-%d'),
-            'locations': [d.address for d in delivery.locations],
-            'publications': [pub.title for pub in delivery.publications]
+            'id': delivery['id'],
+            'date': delivery['date'].strftime('%Y-%m-%d'),
+            'locations': delivery['addresses'],
+            'publications': delivery['publications']
         }
         for delivery in deliveries
     ]
 
     return jsonify({'deliveries': result}), 200
 
+
+def get_person_route(id, date_str):
+    """A carrier's deliveries for one day in visiting order, from the stored route plan"""
+    try:
+        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Please use YYYY-MM-DD'}), 400
+
+    metric = request.args.get('metric')
+    if metric is not None and metric not in METRICS:
+        return jsonify({'message': f"Invalid metric. Must be one of {', '.join(METRICS)}"}), 400
+
+    if not db.session.get(DeliveryPerson, id):
+        return jsonify({'message': 'Delivery person not found'}), 404
+
+    plan = get_route_plan(id, date_obj, metric, current_app.config['DISTANCE_METRIC'])
+    if not plan:
+        return jsonify({'message': 'No deliveries found for this delivery person on the specified date'}), 404
+
+    assignment_ids = [assignment_id for assignment_id, _ in plan.stops]
+    deliveries = {
+        delivery['id']: delivery
+        for delivery in load_assignments(assignment_filter(ids=assignment_ids))
+    }
+
+    result = [
+        {
+            'id': assignment_id,
+            'sequence': sequence,
+            'leg_distance': leg_distance,
+            'date': deliveries[assignment_id]['date'].strftime('%Y-%m-%d'),
+            'locations': deliveries[assignment_id]['addresses'],
+            'publications': deliveries[assignment_id]['publications']
+        }
+        for sequence, (assignment_id, leg_distance) in enumerate(plan.stops, start=1)
+    ]
+
+    return jsonify({
+        'deliveries': result,
+        'metric': plan.metric,
+        'total_distance': plan.total_distance
+    }), 200
+
+@delivery_bp.route('/generate/<date>', methods=['POST'])
+def generate_deliveries(date):
+    """Create the day's stops from the active subscriptions; safe to repeat"""
+    try:
+        date_obj = datetime.strptime(date, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format. Please use YYYY-MM-DD'}), 400
+
+    try:
+        counts = generate_manifest(date_obj)
+    except IntegrityError:
+        return jsonify({'message': 'The manifest for this date is being generated by another request. Please retry'}), 409
+
+    return jsonify({'message': 'Delivery manifest generated', 'date': date_obj.isoformat(), **counts}), 200
+
 @delivery_bp.route('/assign/<date>', methods=['POST'])
 def assign_deliveries(date):
     try:
@@ -187,18 +305,38 @@ def assign_deliveries(date):
     except ValueError:
         return jsonify({'message': 'Invalid date format. Please use YYYY-MM-DD'}), 400
 
-    unassigned_deliveries = DeliveryAssignment.query.filter_by(date=date_obj, delivery_person_id=None).all()
+    metric = request.args.get('metric', current_app.config['DISTANCE_METRIC'])
+    if metric not in METRICS:
+        return jsonify({'message': f"Invalid metric. Must be one of {', '.join(METRICS)}"}), 400
+
+    strategy = request.args.get('strategy', 'greedy')
+    if strategy not in STRATEGIES:
+        return jsonify({'message': f"Invalid strategy. Must be one of {', '.join(STRATEGIES)}"}), 400
 
-    is_active = request.args.get('is_active', type=bool)
-    if is_active is not None:
-        delivery_persons = DeliveryPerson.query.filter_by(is_active=is_active).all()
-        unassigned_deliveries = unassigned_deliveries.filter(DeliveryAssignment.delivery_person_id.in_([dp.id for dp in delivery_persons]))
+    consolidate_by = request.args.get('consolidate', current_app.config['STOP_CONSOLIDATION'])
+    if consolidate_by not in CONSOLIDATIONS:
+        return jsonify({'message': f"Invalid consolidate. Must be one of {', '.join(CONSOLIDATIONS)}"}), 400
+    precision = request.args.get('precision', current_app.config['STOP_COORDINATE_PRECISION'], type=int)
 
-    if not unassigned_deliveries:
+    partition = request.args.get('partition', current_app.config['DISPATCH_PARTITION'])
+    if partition not in PARTITIONS:
+        return jsonify({'message': f"Invalid partition. Must be one of {', '.join(PARTITIONS)}"}), 400
+
+    # only active carriers take deliveries; is_active=true is accepted for
+    # older clients, anything else is refused rather than ignored
+    is_active = request.args.get('is_active')
+    if is_active is not None and is_active.lower() not in ('true', '1'):
+        return jsonify({'message': 'Deliveries can only be assigned to active delivery persons (is_active=true)'}), 400
+
+    criteria = assignment_filter(date=date_obj) + [DeliveryAssignment.delivery_person_id.is_(None)]
+
+    # plain arrays of (id, location, coordinates) and (id, coordinates); no ORM instances
+    unassigned_deliveries = load_deliveries(criteria)
+    if not len(unassigned_deliveries):
         return jsonify({'message': 'No unassigned deliveries for the specified date'}), 404
     
-    delivery_persons = DeliveryPerson.query.filter_by(is_active=True).all()
-    if not delivery_persons:
+    delivery_persons = load_carriers()
+    if not len(delivery_persons):
         return jsonify({'message': 'No active delivery persons available for assignment'}), 400
 
     total_deliveries = len(unassigned_deliveries)
@@ -214,19 +352,74 @@ def assign_deliveries(date):
         deliveries_per_carrier = 1
         remaining = 0 
     
-    # Distribute the work equally
-    assignment_list = distribute_work(unassigned_deliveries, delivery_persons, deliveries_per_carrier, remaining)
-    
-    for carrier, deliveries in assignment_list:
-        for delivery in deliveries:
-            delivery.delivery_person_id = carrier.id
-            db.session.add(delivery)
+    if partition != 'none':
+        # each region solved apart, in the worker processes, then overflow rebalanced
+        carrier_groups = None
+        if partition == 'spatial':
+            groups, carrier_groups = spatial_groups(
+                coordinates(unassigned_deliveries), coordinates(delivery_persons), current_app.config['DISPATCH_REGIONS']
+            )
+        else:
+            groups = location_groups(criteria, unassigned_deliveries['location_id'], getattr(Location, partition))
+
+        capacity = -(-total_deliveries // total_carriers)
+        if strategy == 'balanced':
+            capacity = request.args.get('capacity', type=int) or capacity
+            if capacity * total_carriers < total_deliveries:
+                return jsonify({'message': f'Capacity {capacity} is too small for {total_deliveries} deliveries across {total_carriers} carriers'}), 400
+
+        owner = partitioned_work(
+            unassigned_deliveries, delivery_persons, groups, strategy, capacity, metric, consolidate_by, precision,
+            carrier_groups
+        )
+    elif strategy == 'balanced':
+        # min-cost assignment; each carrier takes at most `capacity` drops
+        capacity = request.args.get('capacity', type=int) or -(-total_deliveries // total_carriers)
+        if capacity * total_carriers < total_deliveries:
+            return jsonify({'message': f'Capacity {capacity} is too small for {total_deliveries} deliveries across {total_carriers} carriers'}), 400
+
+        owner = balance_work(unassigned_deliveries, delivery_persons, capacity, metric, consolidate_by, precision)
+    else:
+        # Distribute the work equally
+        owner = distribute_work(
+            unassigned_deliveries, delivery_persons, deliveries_per_carrier, remaining, metric, consolidate_by, precision
+        )
+
+    carriers = summarize_work(unassigned_deliveries, delivery_persons, owner, metric)
+
+    taken = owner >= 0
+    assignment_ids = unassigned_deliveries['id'][taken].tolist()
+    carrier_ids = delivery_persons['id'][owner[taken]].tolist()
+    updated = save_assignments(assignment_ids, carrier_ids)
+    if updated is not None and updated != len(assignment_ids):
+        db.session.rollback()
+        return jsonify({'message': 'Some deliveries were assigned by another request meanwhile. Please retry'}), 409
+
+    assigned = [
+        {'id': assignment_id, 'delivery_person_id': carrier_id}
+        for assignment_id, carrier_id in zip(assignment_ids, carrier_ids)
+    ] if hub.listening('delivery') else None
 
     db.session.commit()
+    cache.bump('delivery')
+    if assigned is not None:
+        hub.publish('delivery', 'assigned', {'date': date_obj.isoformat(), 'assignments': assigned})
 
-    # Debug 
-    for carrier, deliveries in assignment_list:
-        print(f"Carrier {carrier.id} assigned deliveries: {[delivery.id for delivery in deliveries]}")
-
-    return jsonify({'message': 'Deliveries assigned successfully'}), 200
+    # sequence every carrier's stops now, in one batch, so drivers get a route straight away
+    route_distances = refresh_route_plans(
+        [(carrier['delivery_person_id'], date_obj) for carrier in carriers], metric
+    )
+    for carrier in carriers:
+        carrier['route_distance'] = route_distances.get((carrier['delivery_person_id'], date_obj), 0.0)
+
+    return jsonify({
+        'message': 'Deliveries assigned successfully',
+        'strategy': strategy,
+        'metric': metric,
+        'consolidate': consolidate_by,
+        'partition': partition,
+        'total_distance': sum(carrier['total_distance'] for carrier in carriers),
+        'max_distance': max(carrier['max_distance'] for carrier in carriers),
+        'carriers': carriers
+    }), 200
 
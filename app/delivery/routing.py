@@ -0,0 +1,345 @@
+import hashlib
+
+import numpy as np
+from app.extensions import db
+from app.geo import distance_matrix, DEFAULT_METRIC
+from app.models import DeliveryAssignment, DeliveryPerson, Location, RoutePlan, delivery_assignment_location
+
+# Stop sequencing for a single carrier: nearest-neighbour construction from
+# the carrier's position, then 2-opt and Or-opt moves until neither finds an
+# improvement. Routes are open paths; the carrier does not return to start.
+
+MAX_IMPROVEMENT_ROUNDS = 50
+
+
+def sequence_stops(start, stops, metric=DEFAULT_METRIC):
+    """Order stops for a carrier starting at `start`.
+
+    Returns (order, legs): indices into `stops` in visiting order and the
+    distance of each leg, the first leg being from the start to order[0].
+    """
+    points = np.vstack([np.asarray(start, dtype=np.float64).reshape(1, 2), np.asarray(stops, dtype=np.float64).reshape(-1, 2)])
+    distances = distance_matrix(points, points, metric)
+    if len(points) == 1:
+        return np.empty(0, dtype=np.intp), np.empty(0)
+
+    # the projected metric is slightly asymmetric; reversals assume symmetry
+    symmetric = (distances + distances.T) * 0.5
+
+    tour = _nearest_neighbour(symmetric)
+    for _ in range(MAX_IMPROVEMENT_ROUNDS):
+        improved = _two_opt(tour, symmetric)
+        improved = _or_opt(tour, symmetric) or improved
+        if not improved:
+            break
+
+    legs = distances[tour[:-1], tour[1:]]
+    return tour[1:] - 1, legs
+
+
+def insert_stops(start, stops, order, legs, metric=DEFAULT_METRIC):
+    """Extend an existing visiting order with the stops it does not cover.
+
+    `order` holds indices into `stops` in their current visiting order and
+    `legs` its leg distances, as returned by sequence_stops; every other stop
+    is inserted where it adds the least distance, so the carrier's existing
+    sequence is kept. Returns the extended (order, legs).
+    """
+    points = np.vstack([np.asarray(start, dtype=np.float64).reshape(1, 2), np.asarray(stops, dtype=np.float64).reshape(-1, 2)])
+
+    # only distances touching the stop being inserted are needed, not the
+    # whole matrix; legs[p] is the distance from tour[p] to tour[p + 1]
+    tour = [0] + [index + 1 for index in order]
+    legs = np.asarray(legs, dtype=np.float64)
+
+    covered = set(tour)
+    for stop in range(1, len(points)):
+        if stop in covered:
+            continue
+        point = points[stop:stop + 1]
+        here = points[tour]
+        into = distance_matrix(here, point, metric)[:, 0]
+        out_of = distance_matrix(point, here, metric)[0]
+
+        cost = into.copy()
+        cost[:-1] += out_of[1:] - legs
+        position = int(cost.argmin())
+
+        replaced = [into[position]] if position == len(legs) else [into[position], out_of[position + 1]]
+        legs = np.concatenate([legs[:position], replaced, legs[position + 1:]])
+        tour.insert(position + 1, stop)
+
+    return np.asarray(tour[1:], dtype=np.intp) - 1, legs
+
+
+def _nearest_neighbour(distances):
+    count = len(distances)
+    tour = np.zeros(count, dtype=np.intp)
+    visited = np.zeros(count, dtype=bool)
+    visited[0] = True
+
+    for position in range(1, count):
+        candidates = np.where(visited, np.inf, distances[tour[position - 1]])
+        tour[position] = candidates.argmin()
+        visited[tour[position]] = True
+
+    return tour
+
+
+def _two_opt(tour, distances):
+    """Reverse tour[i:j + 1] whenever that shortens the path. Position 0 stays put."""
+    count = len(tour)
+    improved = False
+    tolerance = distances.max() * 1e-12
+
+    for i in range(1, count - 1):
+        before, first = tour[i - 1], tour[i]
+        ends = tour[i + 1:]
+        # the stop after each candidate end; the last one has nothing after it
+        after = np.append(tour[i + 2:], 0)
+        has_next = np.arange(len(ends)) < len(ends) - 1
+
+        removed = distances[before, first] + np.where(has_next, distances[ends, after], 0.0)
+        added = distances[before, ends] + np.where(has_next, distances[first, after], 0.0)
+        gain = removed - added
+
+        best = int(gain.argmax())
+        if gain[best] > tolerance:
+            tour[i:i + best + 2] = tour[i:i + best + 2][::-1].copy()
+            improved = True
+
+    return improved
+
+
+def _or_opt(tour, distances):
+    """Move runs of up to three stops, optionally reversed, to a better position"""
+    count = len(tour)
+    improved = False
+    tolerance = distances.max() * 1e-12
+
+    for length in (1, 2, 3):
+        i = 1
+        while i + length <= count:
+            segment = tour[i:i + length].copy()
+            before = tour[i - 1]
+            after = tour[i + length] if i + length < count else None
+
+            saved = distances[before, segment[0]]
+            if after is not None:
+                saved += distances[segment[-1], after] - distances[before, after]
+
+            rest = np.concatenate([tour[:i], tour[i + length:]])
+            left = rest
+            right = np.append(rest[1:], 0)
+            has_right = np.arange(len(rest)) < len(rest) - 1
+            bridge = np.where(has_right, distances[left, right], 0.0)
+
+            forward = distances[left, segment[0]] + np.where(has_right, distances[segment[-1], right], 0.0) - bridge
+            backward = distances[left, segment[-1]] + np.where(has_right, distances[segment[0], right], 0.0) - bridge
+            # putting the segment back where it came from is not a move
+            forward[i - 1] = backward[i - 1] = np.inf
+
+            position = int(np.minimum(forward, backward).argmin())
+            cost = min(forward[position], backward[position])
+            if saved - cost > tolerance:
+                if backward[position] < forward[position]:
+                    segment = segment[::-1]
+                tour[:] = np.concatenate([rest[:position + 1], segment, rest[position + 1:]])
+                improved = True
+            else:
+                i += 1
+
+    return improved
+
+
+def _stop_rows(*criteria):
+    """(assignment_id, delivery_person_id, date, latitude, longitude) for the
+    assignments matching `criteria`, one row per location"""
+    return db.session.execute(
+        db.select(
+            DeliveryAssignment.id, DeliveryAssignment.delivery_person_id, DeliveryAssignment.date,
+            Location.latitude, Location.longitude
+        )
+        .join(delivery_assignment_location, delivery_assignment_location.c.delivery_assignment_id == DeliveryAssignment.id)
+        .join(Location, Location.id == delivery_assignment_location.c.location_id)
+        .where(*criteria)
+        .order_by(DeliveryAssignment.id, Location.id)
+    )
+
+
+def _group_stops(rows):
+    """{(delivery_person_id, date): [(assignment_id, latitude, longitude), ...]},
+    using each assignment's first location"""
+    stops = {}
+    seen = set()
+    for assignment_id, delivery_person_id, date, latitude, longitude in rows:
+        if assignment_id in seen:
+            continue
+        seen.add(assignment_id)
+        stops.setdefault((delivery_person_id, date), []).append((assignment_id, latitude, longitude))
+    return stops
+
+
+def _route_stops(delivery_person_id, date):
+    """(assignment_id, latitude, longitude) for a carrier's stops on a date"""
+    rows = _stop_rows(DeliveryAssignment.delivery_person_id == delivery_person_id, DeliveryAssignment.date == date)
+    return _group_stops(rows).get((delivery_person_id, date), [])
+
+
+def _signature(stops, metric):
+    digest = hashlib.sha1(metric.encode('utf-8'))
+    digest.update(''.join(
+        f'{assignment_id}:{latitude!r}:{longitude!r};' for assignment_id, latitude, longitude in stops
+    ).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def get_route_plan(delivery_person_id, date, metric=None, fallback_metric=DEFAULT_METRIC):
+    """Return the route plan for a carrier and date without writing anything.
+    The stored plan is returned while the carrier's assignments for that date
+    (and the requested metric) are those it was built from; otherwise a plan
+    is sequenced for this call only, the stored ones being kept up to date by
+    the writes (refresh_route_plans). Without a metric the plan keeps the one
+    it was built with. Returns None when the carrier has nothing assigned."""
+    stops = _route_stops(delivery_person_id, date)
+    if not stops:
+        return None
+
+    plan = RoutePlan.query.filter_by(delivery_person_id=delivery_person_id, date=date).first()
+    metric = metric or (plan.metric if plan else fallback_metric)
+    signature = _signature(stops, metric)
+    if plan and plan.signature == signature:
+        return plan
+
+    # transient: never added to the session, so nothing is flushed
+    carrier = db.session.get(DeliveryPerson, delivery_person_id)
+    return RoutePlan(
+        delivery_person_id=delivery_person_id, date=date,
+        **_plan_values((carrier.latitude, carrier.longitude), stops, metric, signature)
+    )
+
+
+def refresh_route_plans(keys, metric=None, fallback_metric=DEFAULT_METRIC, keep_order=False):
+    """Bring the stored plans of several (delivery_person_id, date) pairs up
+    to date in a handful of statements and one commit. Plans are rebuilt
+    with `metric`, or the one they were built with. With keep_order a plan
+    keeps its existing sequence and has the stops added since it was built
+    inserted, unless its planned stops were removed or have moved.
+
+    Returns {key: total_distance} for the pairs that have stops; the plans
+    of pairs left without any are deleted. Pairs whose carrier does not
+    exist are skipped."""
+    keys = [key for key in dict.fromkeys(keys) if key[0] is not None]
+    if not keys:
+        return {}
+
+    carrier_ids = {delivery_person_id for delivery_person_id, _ in keys}
+    dates = {date for _, date in keys}
+
+    stops_by_key = _group_stops(_stop_rows(
+        DeliveryAssignment.delivery_person_id.in_(carrier_ids), DeliveryAssignment.date.in_(dates)
+    ))
+    plans = {
+        (plan.delivery_person_id, plan.date): plan
+        for plan in db.session.execute(
+            db.select(
+                RoutePlan.id, RoutePlan.delivery_person_id, RoutePlan.date, RoutePlan.metric, RoutePlan.signature,
+                RoutePlan.stops, RoutePlan.total_distance
+            )
+            .where(RoutePlan.delivery_person_id.in_(carrier_ids), RoutePlan.date.in_(dates))
+        )
+    }
+    starts = {
+        carrier_id: (latitude, longitude)
+        for carrier_id, latitude, longitude in db.session.execute(
+            db.select(DeliveryPerson.id, DeliveryPerson.latitude, DeliveryPerson.longitude)
+            .where(DeliveryPerson.id.in_(carrier_ids))
+        )
+    }
+
+    # written as three executemany statements rather than flushed plan by plan
+    refreshed, inserts, updates, deletes = {}, [], [], []
+    for key in keys:
+        if key[0] not in starts:
+            continue
+        stops = stops_by_key.get(key)
+        plan = plans.get(key)
+        if not stops:
+            if plan:
+                deletes.append(plan.id)
+            continue
+
+        plan_metric = metric or (plan.metric if plan else fallback_metric)
+        signature = _signature(stops, plan_metric)
+        if plan and plan.signature == signature:
+            refreshed[key] = plan.total_distance
+            continue
+
+        values = _plan_values(starts[key[0]], stops, plan_metric, signature, plan if keep_order else None)
+        if plan is None:
+            inserts.append({'delivery_person_id': key[0], 'date': key[1], **values})
+        else:
+            updates.append({'id': plan.id, **values})
+        refreshed[key] = values['total_distance']
+
+    if inserts:
+        db.session.execute(db.insert(RoutePlan), inserts)
+    if updates:
+        db.session.execute(db.update(RoutePlan), updates)
+    if deletes:
+        db.session.execute(db.delete(RoutePlan).where(RoutePlan.id.in_(deletes)))
+    db.session.commit()
+    return refreshed
+
+
+def extend_route_plans(keys, fallback_metric=DEFAULT_METRIC):
+    """refresh_route_plans keeping each plan's existing sequence, for drops
+    handed to carriers that are already on their rounds"""
+    return refresh_route_plans(keys, fallback_metric=fallback_metric, keep_order=True)
+
+
+def route_keys_at(location_ids):
+    """(delivery_person_id, date) pairs with assigned stops at `location_ids`,
+    whose plans have to follow those locations when they move"""
+    return [tuple(row) for row in db.session.execute(
+        db.select(DeliveryAssignment.delivery_person_id, DeliveryAssignment.date).distinct()
+        .join(delivery_assignment_location, delivery_assignment_location.c.delivery_assignment_id == DeliveryAssignment.id)
+        .where(delivery_assignment_location.c.location_id.in_(location_ids), DeliveryAssignment.delivery_person_id.isnot(None))
+    )]
+
+
+def _plan_values(start, stops, metric, signature, previous=None):
+    """Column values of a plan over `stops`; extends the order of `previous`
+    when it still applies, sequences from scratch otherwise"""
+    points = [(latitude, longitude) for _, latitude, longitude in stops]
+
+    planned = _planned_order(previous, stops, metric) if previous is not None else None
+    if planned is not None:
+        order, legs = insert_stops(start, points, *planned, metric)
+    else:
+        order, legs = sequence_stops(start, points, metric)
+
+    return {
+        'signature': signature,
+        'metric': metric,
+        'stops': [[stops[index][0], float(leg)] for index, leg in zip(order, legs)],
+        'total_distance': float(legs.sum())
+    }
+
+
+def _planned_order(plan, stops, metric):
+    """(order, legs) of the plan as indices into `stops`, or None if the plan
+    cannot be extended: a new plan, another metric, or planned stops that are
+    gone or have moved"""
+    if plan.stops is None or plan.metric != metric:
+        return None
+
+    positions = {assignment_id: index for index, (assignment_id, _, _) in enumerate(stops)}
+    planned = [assignment_id for assignment_id, _ in plan.stops]
+    if not all(assignment_id in positions for assignment_id in planned):
+        return None
+
+    kept = set(planned)
+    if _signature([stop for stop in stops if stop[0] in kept], metric) != plan.signature:
+        return None
+    return [positions[assignment_id] for assignment_id in planned], [leg for _, leg in plan.stops]
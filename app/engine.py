@@ -0,0 +1,88 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Engine configuration, driven by the DB_* and SQLITE_* settings in config.py.
+#
+# Server databases (PostgreSQL, MySQL) get a pool of DB_POOL_SIZE connections
+# plus DB_MAX_OVERFLOW, pinged before use and recycled after DB_POOL_RECYCLE
+# seconds so connections dropped by the server or a proxy are never handed out.
+# SQLite files get the same pool sizing and the SQLITE_* pragmas on every new
+# connection: WAL lets readers carry on while one connection writes,
+# synchronous=NORMAL drops the fsync per commit (safe under WAL), and
+# busy_timeout makes a writer wait for the write lock instead of failing with
+# "database is locked". In-memory SQLite keeps its single shared connection.
+
+
+def is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and (
+        url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+    )
+
+
+def engine_options(config, url=None):
+    """create_engine() keyword arguments for `url` (by default
+    SQLALCHEMY_DATABASE_URI)"""
+    url = make_url(url or config['SQLALCHEMY_DATABASE_URI'])
+    if is_memory_sqlite(url):
+        return {}
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT']
+    }
+    if url.get_backend_name() != 'sqlite':
+        options['pool_pre_ping'] = config['DB_POOL_PRE_PING']
+        options['pool_recycle'] = config['DB_POOL_RECYCLE']
+    return options
+
+
+def sqlite_pragmas(config):
+    return {
+        'journal_mode': config['SQLITE_JOURNAL_MODE'],
+        'synchronous': config['SQLITE_SYNCHRONOUS'],
+        'busy_timeout': config['SQLITE_BUSY_TIMEOUT'],
+        'mmap_size': config['SQLITE_MMAP_SIZE'],
+        'cache_size': config['SQLITE_CACHE_SIZE']
+    }
+
+
+def configure_engine(engine, config):
+    """Set the SQLite pragmas on every new connection of `engine`. Takes a
+    sync Engine; pass an AsyncEngine's .sync_engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+def pool_stats(engine):
+    """Pool occupancy of `engine`, plus the pragmas in effect on SQLite"""
+    pool = engine.pool
+    stats = {'url': engine.url.render_as_string(hide_password=True), 'pool': type(pool).__name__}
+
+    # QueuePool and its async variant; the single-connection pools have no counters
+    if hasattr(pool, 'checkedout'):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            timeout=pool.timeout()
+        )
+    return stats
+
+
+def read_pragmas(connection):
+    """The SQLite pragmas configure_engine() sets, as the database reports them"""
+    return {
+        name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+        for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size')
+    }
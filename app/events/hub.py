@@ -0,0 +1,126 @@
+import itertools
+import threading
+import time
+from collections import Counter, deque
+
+from flask import current_app
+
+# In-process publish/subscribe for the live dispatch feed (GET /events).
+#
+# Write paths publish a small diff once; the hub serializes it into a
+# server-sent-events frame a single time and appends it to a shared ring of
+# the last EVENTS_BUFFER_SIZE frames. Every subscriber keeps a cursor into
+# that ring and reads whatever it has not seen yet, so publishing costs the
+# same for one dashboard or five hundred, and no dashboard queries the
+# database per tick.
+#
+# The ring bounds how far a client may fall behind. One whose cursor has been
+# overtaken by the ring loses the backlog and gets a single "resync" event
+# instead, telling the dashboard to refetch through the regular GET endpoints
+# (which answer 304 when nothing changed). Publishers never block.
+#
+# Subscribers only see events published by their own process.
+
+TOPICS = ('carrier', 'delivery')
+
+
+class Subscriber:
+    def __init__(self, hub, topics, cursor):
+        self.hub = hub
+        self.topics = frozenset(topics)
+        self.cursor = cursor  # id of the last frame this subscriber has seen
+        self.dropped = 0
+
+    def next_frames(self, timeout):
+        """Every unseen frame of the subscriber's topics as one chunk, or None
+        if nothing arrived within timeout"""
+        return self.hub._read(self, timeout)
+
+
+class EventHub:
+    def __init__(self, buffer_size=256):
+        self.app = None
+        self._frames = deque(maxlen=buffer_size)  # (event_id, topic, frame)
+        self._last_id = 0
+        self._condition = threading.Condition()
+        self._subscribers = set()
+        self._listeners = Counter()  # topic -> number of subscribers
+        self.published = 0
+
+    def init_app(self, app):
+        self.app = app
+        with self._condition:
+            self._frames = deque(self._frames, maxlen=app.config['EVENTS_BUFFER_SIZE'])
+        app.extensions['events'] = self
+
+    def subscribe(self, topics=TOPICS):
+        with self._condition:
+            subscriber = Subscriber(self, topics, self._last_id)
+            self._subscribers.add(subscriber)
+            self._listeners.update(subscriber.topics)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._condition:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+                self._listeners.subtract(subscriber.topics)
+
+    def listening(self, topic):
+        """Whether anyone subscribes to `topic`; lets publishers skip building
+        a payload nobody will read"""
+        return self._listeners[topic] > 0
+
+    def publish(self, topic, event, data):
+        """Send `data` as event "<topic>.<event>" to the topic's subscribers.
+        Serializes with the app's JSON provider, so it also works outside a
+        Flask app context (the async views in app/asgi) once init_app ran."""
+        self.published += 1
+        if not self.listening(topic):
+            return
+
+        payload = (self.app or current_app).json.dumps(data)
+        with self._condition:
+            self._last_id += 1
+            self._frames.append((self._last_id, topic, _frame(self._last_id, f'{topic}.{event}', payload)))
+            self._condition.notify_all()
+
+    def _read(self, subscriber, timeout):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                remaining = deadline - time.monotonic()
+                if not self._condition.wait_for(lambda: self._last_id > subscriber.cursor, remaining):
+                    return None
+
+                behind = self._last_id - subscriber.cursor
+                subscriber.cursor = self._last_id
+                if behind > len(self._frames):
+                    # overtaken by the ring: the frames it missed are gone
+                    subscriber.dropped += behind - len(self._frames)
+                    return _frame(self._last_id, 'resync', '{}')
+
+                frames = [
+                    frame for _, topic, frame in itertools.islice(self._frames, len(self._frames) - behind, None)
+                    if topic in subscriber.topics
+                ]
+                if frames:
+                    return b''.join(frames)
+
+    def stats(self):
+        with self._condition:
+            subscribers = list(self._subscribers)
+            return {
+                'subscribers': len(subscribers),
+                'published': self.published,
+                'buffered': len(self._frames),
+                'lagging': sum(1 for subscriber in subscribers if self._last_id - subscriber.cursor > 0),
+                'dropped': sum(subscriber.dropped for subscriber in subscribers)
+            }
+
+
+def _frame(event_id, name, payload):
+    return f'id: {event_id}\nevent: {name}\ndata: {payload}\n\n'.encode('utf-8')
+
+
+hub = EventHub()
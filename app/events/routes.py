@@ -0,0 +1,33 @@
+from flask import Response, request, jsonify, current_app
+from . import events_bp
+from .hub import hub, TOPICS
+
+
+@events_bp.route('/', methods=['GET'])
+def stream_events():
+    """Server-sent events for the dispatch screen. ?topics=carrier,delivery
+    picks the feeds (both by default)."""
+    topics = request.args.get('topics')
+    topics = [topic.strip() for topic in topics.split(',')] if topics else list(TOPICS)
+    unknown = [topic for topic in topics if topic not in TOPICS]
+    if unknown:
+        return jsonify({'message': f"Unknown topics {', '.join(unknown)}. Must be among {', '.join(TOPICS)}"}), 400
+
+    heartbeat = current_app.config['EVENTS_HEARTBEAT']
+    subscriber = hub.subscribe(topics)
+
+    def generate():
+        try:
+            # reconnect after 3s if the connection drops
+            yield b'retry: 3000\n\n'
+            while True:
+                frames = subscriber.next_frames(heartbeat)
+                # comments keep proxies from closing an idle connection
+                yield frames if frames is not None else b': keepalive\n\n'
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -0,0 +1,88 @@
+import numpy as np
+
+# Distance kernels over (n, 2) arrays of (latitude, longitude) in degrees.
+# Every kernel returns a (len(origins), len(destinations)) matrix.
+#
+#   haversine        great-circle distance in km
+#   equirectangular  planar approximation projected around each origin's
+#                    latitude, in km; cheaper and accurate at city scale
+#   euclidean        norm of the raw degree difference (the old behaviour)
+
+EARTH_RADIUS_KM = 6371.0088
+
+METRICS = ('haversine', 'equirectangular', 'euclidean')
+DEFAULT_METRIC = 'haversine'
+
+
+def haversine_matrix(origins, destinations):
+    half_lat1 = np.radians(origins[:, 0]) * 0.5
+    half_lon1 = np.radians(origins[:, 1]) * 0.5
+    half_lat2 = np.radians(destinations[:, 0]) * 0.5
+    half_lon2 = np.radians(destinations[:, 1]) * 0.5
+
+    # sin(b - a) = sin b cos a - cos b sin a keeps the trig on the input
+    # vectors; only arcsin/sqrt run over the full matrix
+    sin_dlat = np.outer(np.cos(half_lat1), np.sin(half_lat2)) - np.outer(np.sin(half_lat1), np.cos(half_lat2))
+    sin_dlon = np.outer(np.cos(half_lon1), np.sin(half_lon2)) - np.outer(np.sin(half_lon1), np.cos(half_lon2))
+    cos_lat = np.outer(np.cos(2.0 * half_lat1), np.cos(2.0 * half_lat2))
+
+    a = sin_dlat * sin_dlat + cos_lat * (sin_dlon * sin_dlon)
+
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def equirectangular_matrix(origins, destinations):
+    lat1 = np.radians(origins[:, 0])[:, None]
+    lon1 = np.radians(origins[:, 1])[:, None]
+    lat2 = np.radians(destinations[:, 0])[None, :]
+    lon2 = np.radians(destinations[:, 1])[None, :]
+
+    # only one cosine per origin row, which is what makes this mode cheap
+    x = (lon2 - lon1) * np.cos(lat1)
+    y = lat2 - lat1
+
+    return EARTH_RADIUS_KM * np.sqrt(x * x + y * y)
+
+
+def euclidean_matrix(origins, destinations):
+    dlat = origins[:, 0, None] - destinations[None, :, 0]
+    dlon = origins[:, 1, None] - destinations[None, :, 1]
+    return np.sqrt(dlat * dlat + dlon * dlon)
+
+
+KERNELS = {
+    'haversine': haversine_matrix,
+    'equirectangular': equirectangular_matrix,
+    'euclidean': euclidean_matrix,
+}
+
+
+def distance_matrix(origins, destinations, metric=DEFAULT_METRIC):
+    """Distances from every origin to every destination using the named metric"""
+    try:
+        kernel = KERNELS[metric]
+    except KeyError:
+        raise ValueError(f"Unknown distance metric '{metric}'. Must be one of {', '.join(METRICS)}")
+
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    destinations = np.asarray(destinations, dtype=np.float64).reshape(-1, 2)
+    return kernel(origins, destinations)
+
+
+def ring_lower_bound(metric, degrees, latitude, max_abs_latitude):
+    """Smallest possible distance from a point at `latitude` to any point that
+    differs from it by at least `degrees` in latitude or longitude and lies
+    within max_abs_latitude of the equator. Used to prune grid searches."""
+    if metric == 'euclidean':
+        return degrees
+
+    delta = np.radians(degrees)
+
+    if metric == 'haversine':
+        along_meridian = EARTH_RADIUS_KM * delta
+        hav = np.cos(np.radians(latitude)) * np.cos(np.radians(max_abs_latitude)) * np.sin(delta * 0.5) ** 2
+        along_parallel = 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(min(hav, 1.0)))
+        return float(min(along_meridian, along_parallel))
+
+    # equirectangular scales longitude by the query (origin) latitude only
+    return float(EARTH_RADIUS_KM * delta * np.cos(np.radians(latitude)))
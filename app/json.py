@@ -0,0 +1,50 @@
+import decimal
+
+import orjson
+from flask.json.provider import JSONProvider
+
+# JSON for every response and event, through orjson. Dates and datetimes go
+# out as ISO 8601 ("2025-07-22", "2025-07-22T06:30:00"), numpy values as
+# numbers and arrays, and keys keep the order the view built them in.
+# Anything else orjson does not know is handled by default() below.
+
+OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def default(obj):
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (tuple, set, frozenset)):
+        # namedtuples such as CarrierPosition
+        return list(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps_bytes(obj, indent=False):
+    return orjson.dumps(obj, default=default, option=OPTIONS | orjson.OPT_INDENT_2 if indent else OPTIONS)
+
+
+class OrjsonMixin:
+    """dumps/loads/response for a Flask (or Quart) JSONProvider"""
+
+    mimetype = 'application/json'
+    # None: indented in debug mode only, like Flask's provider
+    compact = None
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj, indent='indent' in kwargs).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # straight from orjson's bytes; no str round trip
+        return self._app.response_class(dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+class OrjsonProvider(OrjsonMixin, JSONProvider):
+    pass
@@ -0,0 +1,132 @@
+import math
+import threading
+from collections import defaultdict
+
+import numpy as np
+from app.geo import distance_matrix, ring_lower_bound, DEFAULT_METRIC
+
+# Grid bucket index over (latitude, longitude) for nearest-neighbour lookups.
+# Points are hashed into square cells of `cell_size` degrees; a query walks
+# rings of cells outward from the query cell and stops as soon as no unvisited
+# cell can hold anything closer than the k-th best match found so far.
+
+
+class SpatialIndex:
+    def __init__(self, cell_size=0.01):
+        self.cell_size = cell_size
+        self._cells = defaultdict(dict)  # (row, col) -> {id: (lat, lon)}
+        self._points = {}                # id -> (lat, lon)
+        self._max_abs_latitude = 0.0     # only grows; keeps search bounds safe
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, point_id):
+        return point_id in self._points
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size))
+
+    def rebuild(self, rows):
+        """Replace the index contents with (id, latitude, longitude) rows"""
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+            self._max_abs_latitude = 0.0
+            for point_id, latitude, longitude in rows:
+                self._add(point_id, latitude, longitude)
+
+    def insert(self, point_id, latitude, longitude):
+        """Add a point, or move it if it is already indexed"""
+        with self._lock:
+            self._discard(point_id)
+            self._add(point_id, latitude, longitude)
+
+    def remove(self, point_id):
+        with self._lock:
+            self._discard(point_id)
+
+    def get(self, point_id):
+        return self._points.get(point_id)
+
+    def _add(self, point_id, latitude, longitude):
+        latitude, longitude = float(latitude), float(longitude)
+        self._points[point_id] = (latitude, longitude)
+        self._max_abs_latitude = max(self._max_abs_latitude, abs(latitude))
+        self._cells[self._cell(latitude, longitude)][point_id] = (latitude, longitude)
+
+    def _discard(self, point_id):
+        point = self._points.pop(point_id, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        bucket = self._cells[cell]
+        bucket.pop(point_id, None)
+        if not bucket:
+            del self._cells[cell]
+
+    def nearest(self, latitude, longitude, k=1, metric=DEFAULT_METRIC):
+        """Return up to k (distance, id) pairs closest to the given point, nearest first"""
+        if k <= 0:
+            return []
+
+        with self._lock:
+            if not self._points:
+                return []
+
+            row, col = self._cell(latitude, longitude)
+            found = []
+            radius = 0
+
+            while True:
+                # once the ring square outgrows the occupied cells, scanning
+                # the buckets directly is cheaper than visiting empty cells
+                if (2 * radius + 1) ** 2 > 4 * len(self._cells):
+                    found = self._scan(latitude, longitude, self._cells.keys(), metric)
+                    break
+
+                found.extend(self._scan(latitude, longitude, self._ring(row, col, radius), metric))
+                found.sort()
+
+                # anything outside this ring is at least radius cells away
+                if len(found) >= k:
+                    bound = ring_lower_bound(metric, radius * self.cell_size, latitude, self._max_abs_latitude)
+                    if found[k - 1][0] < bound:
+                        break
+                if len(found) == len(self._points):
+                    break
+                radius += 1
+
+            found.sort()
+            return found[:k]
+
+    def _ring(self, row, col, radius):
+        if radius == 0:
+            yield (row, col)
+            return
+        for offset in range(-radius, radius + 1):
+            yield (row - radius, col + offset)
+            yield (row + radius, col + offset)
+        for offset in range(-radius + 1, radius):
+            yield (row + offset, col - radius)
+            yield (row + offset, col + radius)
+
+    def _scan(self, latitude, longitude, cells, metric):
+        ids = []
+        coords = []
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if not bucket:
+                continue
+            ids.extend(bucket.keys())
+            coords.extend(bucket.values())
+
+        if not ids:
+            return []
+
+        distances = distance_matrix(np.array([(latitude, longitude)]), np.array(coords), metric)[0]
+        return list(zip(distances.tolist(), ids))
+
+
+location_index = SpatialIndex()
@@ -1,7 +1,16 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from . import location_bp
 from app.extensions import db
-from app.models import Location
+from app.geo import METRICS
+from app.models import Customer, Location
+from app.pagination import wants_page, page_response
+from app.bulk import read_rows, in_chunks, BulkResults, insert_rows, update_rows, existing_ids, bad_id, is_id
+from app.cache import cache
+from app.conditional import conditional
+from app.reference import all_locations, locations_by_id
+from app.serializers import LOCATION
+from app.delivery.routing import route_keys_at, refresh_route_plans
+from .index import location_index
 
 
 @location_bp.route('/', methods=['POST'])
@@ -22,47 +31,137 @@ def create_location():
     db.session.add(new_location)
     db.session.commit()
 
+    location_index.insert(new_location.id, new_location.latitude, new_location.longitude)
+    cache.invalidate('location', new_location.id)
+
     return jsonify({'message': 'Location created successfully', 'id': new_location.id}), 201
 
 
+@location_bp.route('/bulk', methods=['POST'])
+def bulk_locations():
+    """Create locations, or update them when a row carries an id"""
+    try:
+        rows = read_rows()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        results = BulkResults(len(rows))
+        update_ids = existing_ids(Location, {row['id'] for row in rows if is_id(row.get('id'))})
+        fields = ('latitude', 'longitude', 'address', 'city', 'postal_code')
+
+        inserts, updates = [], []
+        for index, row in enumerate(rows):
+            location_id = row.get('id')
+
+            if bad_id(row, 'id'):
+                results.fail(index, 'id must be an integer')
+                continue
+            if location_id is None and not all(key in row for key in ['latitude', 'longitude']):
+                results.fail(index, 'Missing required fields: latitude and longitude')
+                continue
+            if location_id is not None and location_id not in update_ids:
+                results.fail(index, 'Location not found')
+                continue
+
+            values = {key: row[key] for key in fields if key in row}
+            try:
+                for key in ('latitude', 'longitude'):
+                    if key in values:
+                        values[key] = float(values[key])
+            except (TypeError, ValueError):
+                results.fail(index, 'latitude and longitude must be numbers')
+                continue
+
+            if location_id is None:
+                inserts.append((index, {key: values.get(key) for key in fields}))
+            elif values:
+                updates.append((index, dict(values, id=location_id)))
+            else:
+                results.fail(index, 'Nothing to update')
+
+        insert_rows(Location, inserts, results)
+        update_rows(Location, updates, results)
+
+        # refresh the index from what was actually stored
+        written = [row['id'] for row in results.rows if row['status'] != 'error']
+        cache.invalidate('location', *written)
+        for chunk in in_chunks(written):
+            for location_id, latitude, longitude in db.session.execute(
+                db.select(Location.id, Location.latitude, Location.longitude).where(Location.id.in_(chunk))
+            ):
+                location_index.insert(location_id, latitude, longitude)
+
+        # and the stored route plans through the locations that moved
+        moved = [
+            values['id'] for index, values in updates
+            if not results.failed(index) and ('latitude' in values or 'longitude' in values)
+        ]
+        route_keys = []
+        for chunk in in_chunks(moved):
+            route_keys.extend(route_keys_at(chunk))
+        refresh_route_plans(route_keys)
+
+        return jsonify(results.summary()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f"An error occurred: {str(e)}"}), 500
+
+
 @location_bp.route('/', methods=['GET'])
+@conditional('location')
 def get_all_locations():
-    locations = Location.query.all()
+    if wants_page():
+        return page_response(LOCATION.select(), Location.id, LOCATION, 'locations')
+
+    locations = all_locations()
 
     if not locations:
         return jsonify({'message': 'No locations found'}), 404
 
+    return jsonify({'locations': locations}), 200
+
+@location_bp.route('/nearest', methods=['GET'])
+@conditional('location')
+def get_nearest_locations():
+    latitude = request.args.get('lat', type=float)
+    longitude = request.args.get('lon', type=float)
+    k = request.args.get('k', default=5, type=int)
+    metric = request.args.get('metric', current_app.config['DISTANCE_METRIC'])
+
+    if latitude is None or longitude is None:
+        return jsonify({'message': 'Query parameters lat and lon are required'}), 400
+
+    if metric not in METRICS:
+        return jsonify({'message': f"Invalid metric. Must be one of {', '.join(METRICS)}"}), 400
+
+    if k < 1 or k > 100:
+        return jsonify({'message': 'k must be between 1 and 100'}), 400
+
+    matches = location_index.nearest(latitude, longitude, k, metric)
+
+    if not matches:
+        return jsonify({'message': 'No locations found'}), 404
+
+    locations = locations_by_id([location_id for _, location_id in matches])
+
     result = [
-        {
-            'id': location.id,
-            'latitude': location.latitude,
-            'longitude': location.longitude,
-            'address': location.address,
-            'city': location.city,
-            'postal_code': location.postal_code
-        }
-        for location in locations
+        dict(locations[location_id], distance=distance)
+        for distance, location_id in matches
+        if location_id in locations
     ]
 
-    return jsonify({'locations': result}), 200
+    return jsonify({'metric': metric, 'locations': result}), 200
 
 @location_bp.route('/<int:id>', methods=['GET'])
+@conditional('location')
 def get_location(id):
-    location = Location.query.get(id)
+    location = locations_by_id([id]).get(id)
 
     if not location:
         return jsonify({'message': 'Location not found'}), 404
 
-    result = {
-        'id': location.id,
-        'latitude': location.latitude,
-        'longitude': location.longitude,
-        'address': location.address,
-        'city': location.city,
-        'postal_code': location.postal_code
-    }
-
-    return jsonify(result), 200
+    return jsonify(location), 200
 
 
 @location_bp.route('/<int:id>', methods=['PUT'])
@@ -74,14 +173,31 @@ def update_location(id):
 
     data = request.get_json()
 
-    location.latitude = data.get('latitude', location.latitude)
-    location.longitude = data.get('longitude', location.longitude)
+    try:
+        latitude = float(data.get('latitude', location.latitude))
+        longitude = float(data.get('longitude', location.longitude))
+    except (TypeError, ValueError):
+        return jsonify({'message': 'latitude and longitude must be numbers'}), 400
+
+    if not -90 <= latitude <= 90:
+        return jsonify({'message': 'latitude must be a number between -90 and 90'}), 400
+    if not -180 <= longitude <= 180:
+        return jsonify({'message': 'longitude must be a number between -180 and 180'}), 400
+
+    location.latitude = latitude
+    location.longitude = longitude
     location.address = data.get('address', location.address)
     location.city = data.get('city', location.city)
     location.postal_code = data.get('postal_code', location.postal_code)
 
     db.session.commit()
 
+    location_index.insert(location.id, location.latitude, location.longitude)
+    cache.invalidate('location', id)
+    # the stored route plans through this location
+    if 'latitude' in data or 'longitude' in data:
+        refresh_route_plans(route_keys_at([id]))
+
     return jsonify({'message': 'Location updated successfully'}), 200
 
 
@@ -92,7 +208,13 @@ def delete_location(id):
     if not location:
         return jsonify({'message': 'Location not found'}), 404
 
+    # customers delivered there no longer have a delivery location
+    db.session.execute(db.update(Customer.__table__).where(Customer.location_id == id).values(location_id=None))
     db.session.delete(location)
     db.session.commit()
 
+    location_index.remove(id)
+    cache.invalidate('location', id)
+    cache.bump('customer')
+
     return jsonify({'message': f'Location {id} deleted successfully'}), 200
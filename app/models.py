@@ -1,5 +1,6 @@
 from .extensions import db
 from datetime import datetime
+from sqlalchemy.ext.hybrid import hybrid_method
 from flask_login import UserMixin
 
 
@@ -18,6 +19,8 @@ class Customer(db.Model):
     name = db.Column(db.String(100))
     address = db.Column(db.String(200))
     phone = db.Column(db.String(200), unique=True)
+    # where the customer's publications are dropped off; see app/delivery/manifest.py
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id', name='fk_customer_location'), nullable=True)
     subscriptions = db.relationship('Subscription', backref='customer_ref', cascade='all, delete')
 
     def __repr__(self):
@@ -33,6 +36,14 @@ class Publication(db.Model):
         return f"<Publication {self.title}>"
 
 class Subscription(db.Model):
+    __table_args__ = (
+        # subscribe/unsubscribe look up (customer, publication[, status])
+        db.Index('ix_subscription_customer_publication_status', 'customer_id', 'publication_id', 'status'),
+        # the lifecycle processor finds due rows by (status, date); see app/subscription/lifecycle.py
+        db.Index('ix_subscription_status_change_date', 'status', 'requested_change_date'),
+        db.Index('ix_subscription_status_end_date', 'status', 'end_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'))
     publication_id = db.Column(db.Integer, db.ForeignKey('publication.id'))
@@ -48,9 +59,17 @@ class Subscription(db.Model):
     def __repr__(self):
         return f"<Subscription {self.publication_id} for Customer {self.customer_id}>"
 
-    def is_active(self):
-        """Return whether subscription is active"""
-        return self.end_date is None or self.end_date >= datetime.today().date()
+    @hybrid_method
+    def is_active(self, day=None):
+        """Return whether subscription is active (on `day`, by default today)"""
+        day = day or datetime.today().date()
+        return self.end_date is None or self.end_date >= day
+
+    @is_active.expression
+    def is_active(cls, day=None):
+        # the same test as SQL, for filtering in the database
+        day = day or datetime.today().date()
+        return db.or_(cls.end_date.is_(None), cls.end_date >= day)
 
 class DeliveryPerson(db.Model):
     __tablename__ = 'delivery_persons'
@@ -89,7 +108,9 @@ class DeliveryPerson(db.Model):
 
 delivery_assignment_location = db.Table('delivery_assignment_location',
     db.Column('delivery_assignment_id', db.Integer, db.ForeignKey('delivery_assignment.id'), primary_key=True),
-    db.Column('location_id', db.Integer, db.ForeignKey('locations.id'), primary_key=True)
+    db.Column('location_id', db.Integer, db.ForeignKey('locations.id'), primary_key=True),
+    # the primary key covers assignment -> locations; this covers location -> assignments
+    db.Index('ix_delivery_assignment_location_location', 'location_id', 'delivery_assignment_id')
 )
 
 class Location(db.Model):
@@ -102,12 +123,32 @@ class Location(db.Model):
     city = db.Column(db.String(100), nullable=True)
     postal_code = db.Column(db.String(20), nullable=True)
 
-    delivery_assignments = db.relationship('DeliveryAssignment', secondary=delivery_assignment_location, backref='locations_')
+    # DeliveryAssignment.locations already writes this link table; a second
+    # writable mapping would delete each link twice
+    delivery_assignments = db.relationship(
+        'DeliveryAssignment', secondary=delivery_assignment_location,
+        backref=db.backref('locations_', viewonly=True), viewonly=True
+    )
 
     def __repr__(self):
         return f"<Location {self.city} - {self.address}>"
 
 class DeliveryAssignment(db.Model):
+    __table_args__ = (
+        # daily listings, optionally per carrier, and route building
+        db.Index('ix_delivery_assignment_date_person', 'date', 'delivery_person_id'),
+        # a carrier's deliveries across all dates
+        db.Index('ix_delivery_assignment_person_date', 'delivery_person_id', 'date'),
+        # assign_deliveries only ever looks for the unassigned rows of a date
+        db.Index(
+            'ix_delivery_assignment_unassigned_date', 'date',
+            sqlite_where=db.text('delivery_person_id IS NULL'),
+            postgresql_where=db.text('delivery_person_id IS NULL')
+        ),
+        # one generated stop per customer and day; rows created by hand have no customer
+        db.Index('uq_delivery_assignment_date_customer', 'date', 'customer_id', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     delivery_person_id = db.Column(
     db.Integer,
@@ -115,6 +156,8 @@ class DeliveryAssignment(db.Model):
 )
     date = db.Column(db.Date)
     location_id = db.Column(db.Integer, db.ForeignKey('locations.id', name='fk_delivery_assignments_location'))
+    # set on the stops generated from subscriptions
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id', name='fk_delivery_assignment_customer'), nullable=True)
    
     locations = db.relationship('Location', secondary=delivery_assignment_location, backref='delivery_assignment')
     carrier = db.relationship('DeliveryPerson', backref='delivery_person_assignments')
@@ -125,6 +168,10 @@ class DeliveryAssignment(db.Model):
 
 class DeliveryAssignmentPublication(db.Model):
     __tablename__ = 'delivery_assignment_publication'
+    __table_args__ = (
+        db.Index('ix_delivery_assignment_publication_assignment', 'delivery_assignment_id', 'publication_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     delivery_assignment_id = db.Column(db.Integer, db.ForeignKey('delivery_assignment.id'))
     publication_id = db.Column(
@@ -132,5 +179,33 @@ class DeliveryAssignmentPublication(db.Model):
     db.ForeignKey('publication.id', name='fk_delivery_assignment_pub_publication')
 )
 
-    delivery_assignment = db.relationship('DeliveryAssignment', backref='delivery_publications')
-    publication = db.relationship('Publication', backref='delivery_assignments')
\ No newline at end of file
+    # DeliveryAssignment.publications owns these rows; the reverse collections
+    # are read-only so deletes do not touch them twice
+    delivery_assignment = db.relationship('DeliveryAssignment', backref=db.backref('delivery_publications', viewonly=True))
+    publication = db.relationship('Publication', backref=db.backref('delivery_assignments', viewonly=True))
+
+class RoutePlan(db.Model):
+    __tablename__ = 'route_plans'
+    __table_args__ = (
+        db.UniqueConstraint('delivery_person_id', 'date', name='uq_route_plans_person_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    delivery_person_id = db.Column(
+    db.Integer,
+    db.ForeignKey('delivery_persons.id', name='fk_route_plans_delivery_persons'),
+    nullable=False
+)
+    date = db.Column(db.Date, nullable=False)
+    metric = db.Column(db.String(20), nullable=False)
+    # hash of the assignment ids and coordinates the plan was built from
+    signature = db.Column(db.String(40), nullable=False)
+    # [[assignment_id, leg_distance], ...] in visiting order
+    stops = db.Column(db.JSON, nullable=False)
+    total_distance = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    delivery_person = db.relationship('DeliveryPerson', backref=db.backref('route_plans', cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f"<RoutePlan {self.delivery_person_id} on {self.date}>"
@@ -0,0 +1,99 @@
+from flask import Response, current_app, jsonify, request, stream_with_context, url_for
+from app.extensions import db
+
+# Keyset pagination and streaming for list endpoints.
+#
+#   ?limit=N&after_id=X   one page of rows with id > X, as {key: [...], 'next': url}
+#   ?stream=ndjson        every row (after after_id, up to limit) one JSON object per line
+#   ?stream=json          the same rows as one JSON array, sent in chunks
+#
+# List endpoints keep their original whole-table response when none of these
+# parameters are given. Statements passed in are column selects whose rows are
+# turned into dicts by `serialize`, which receives a whole batch at a time so
+# it can load related rows for the batch in one go.
+
+PAGE_ARGS = ('after_id', 'limit', 'stream')
+STREAM_FORMATS = ('ndjson', 'json')
+
+
+def wants_page():
+    """True if the request asked for a page or a stream rather than the whole table"""
+    return any(arg in request.args for arg in PAGE_ARGS)
+
+
+def page_response(statement, id_column, serialize, key):
+    """Answer a list request with a keyset page or a streamed response"""
+    try:
+        after_id, limit, stream = page_args(request.args, current_app.config['MAX_PAGE_SIZE'])
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    statement = keyset(statement, id_column, after_id)
+
+    if stream:
+        if limit:
+            statement = statement.limit(limit)
+        return stream_response(statement, serialize, stream)
+
+    limit = limit or current_app.config['PAGE_SIZE']
+    # one extra row tells us whether there is a next page
+    rows = db.session.execute(statement.limit(limit + 1)).all()
+    items = serialize(rows[:limit])
+
+    next_url = None
+    if len(rows) > limit:
+        args = request.args.to_dict()
+        args.update(after_id=items[-1]['id'], limit=limit)
+        next_url = url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    response = jsonify({key: items, 'next': next_url})
+    if next_url:
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+
+def page_args(args, max_page_size):
+    """(after_id, limit, stream) from the query string; ValueError if invalid"""
+    after_id = args.get('after_id', type=int)
+    limit = args.get('limit', type=int)
+    stream = args.get('stream')
+
+    if 'after_id' in args and after_id is None:
+        raise ValueError('after_id must be an integer')
+    if 'limit' in args and (limit is None or not 1 <= limit <= max_page_size):
+        raise ValueError(f'limit must be between 1 and {max_page_size}')
+    if stream is not None and stream not in STREAM_FORMATS:
+        raise ValueError(f"Invalid stream format. Must be one of {', '.join(STREAM_FORMATS)}")
+    return after_id, limit, stream
+
+
+def keyset(statement, id_column, after_id):
+    statement = statement.order_by(id_column)
+    if after_id is not None:
+        statement = statement.where(id_column > after_id)
+    return statement
+
+
+def stream_response(statement, serialize, stream_format):
+    """Stream every row of `statement`, fetching STREAM_BATCH_SIZE rows at a time"""
+    batch_size = current_app.config['STREAM_BATCH_SIZE']
+    dumps = current_app.json.dumps
+
+    def generate():
+        result = db.session.execute(statement.execution_options(yield_per=batch_size))
+        separator = ''
+
+        if stream_format == 'json':
+            yield '['
+        for batch in result.partitions():
+            items = [dumps(item) for item in serialize(batch)]
+            if stream_format == 'ndjson':
+                yield ''.join(item + '\n' for item in items)
+            elif items:
+                yield separator + ','.join(items)
+                separator = ','
+        if stream_format == 'json':
+            yield ']'
+
+    mimetype = 'application/x-ndjson' if stream_format == 'ndjson' else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
@@ -1,25 +1,25 @@
 from flask import request, jsonify
 from app import db
 from app.models import Publication
+from app.pagination import wants_page, page_response
+from app.cache import cache
+from app.conditional import conditional
+from app.reference import all_publications, publications_by_id
+from app.serializers import PUBLICATION
 from . import publication_bp
 
 @publication_bp.route('/', methods=['GET'])
+@conditional('publication')
 def get_publications():
-    publications = Publication.query.all()
+    if wants_page():
+        return page_response(PUBLICATION.select(), Publication.id, PUBLICATION, 'publications')
+
+    publications = all_publications()
 
     if not publications:
         return jsonify({'message': 'No publications found.'}), 404
 
-    result = [
-        {
-            'id': p.id,
-            'title': p.title,
-            'type': p.type
-        }
-        for p in publications
-    ]
-    
-    return jsonify(result)
+    return jsonify(publications)
 
 
 @publication_bp.route('/', methods=['POST'])
@@ -40,30 +40,22 @@ def create_publication():
     try:
         db.session.add(new_publication)
         db.session.commit()
-        return jsonify({
-            'id': new_publication.id,
-            'title': new_publication.title,
-            'type': new_publication.type
-        }), 201
+        cache.invalidate('publication', new_publication.id)
+        return jsonify(PUBLICATION.from_instance(new_publication)), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
 
 
 @publication_bp.route('/<int:id>', methods=['GET'])
+@conditional('publication')
 def get_publication_by_id(id):
-    publication = Publication.query.get(id)
+    publication = publications_by_id([id]).get(id)
 
     if not publication:
         return jsonify({'message': 'Publication not found'}), 404
 
-    result = {
-        'id': publication.id,
-        'title': publication.title,
-        'type': publication.type
-    }
-
-    return jsonify(result)
+    return jsonify(publication)
 
 
 @publication_bp.route('/<int:id>', methods=['PUT'])
@@ -85,11 +77,8 @@ def update_publication(id):
 
     try:
         db.session.commit()
-        return jsonify({
-            'id': publication.id,
-            'title': publication.title,
-            'type': publication.type
-        })
+        cache.invalidate('publication', id)
+        return jsonify(PUBLICATION.from_instance(publication))
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 500
@@ -105,6 +94,7 @@ def delete_publication(id):
     try:
         db.session.delete(publication)
         db.session.commit()
+        cache.invalidate('publication', id)
         return jsonify({'message': 'Publication deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
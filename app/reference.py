@@ -0,0 +1,61 @@
+from collections import namedtuple
+
+from app.cache import cache
+from app.extensions import db
+from app.models import DeliveryPerson
+from app.serializers import CARRIER, LOCATION, PUBLICATION
+
+# Cached reads of reference data: publications, carriers and locations.
+# Every function here goes through app.cache; the blueprints that write these
+# tables call cache.invalidate(<entity>, id) after committing. Rows are turned
+# into dicts by the serializers of app/serializers.py.
+
+# what the assignment solvers need from a carrier
+CarrierPosition = namedtuple('CarrierPosition', ['id', 'latitude', 'longitude'])
+
+
+def _load_all(serializer, session=None):
+    id_column = serializer.columns[0]
+    return serializer.many((session or db.session).execute(serializer.select().order_by(id_column)))
+
+
+def _load_by_id(serializer, ids, session=None):
+    id_column = serializer.columns[0]
+    rows = (session or db.session).execute(serializer.select().where(id_column.in_(ids)))
+    return {item['id']: item for item in serializer.many(rows)}
+
+
+def all_publications():
+    return cache.get('publication', 'list:all', lambda: _load_all(PUBLICATION))
+
+
+def publications_by_id(ids):
+    return cache.get_many('publication', ids, lambda missing: _load_by_id(PUBLICATION, missing))
+
+
+def all_carriers():
+    return cache.get('carrier', 'list:all', lambda: _load_all(CARRIER))
+
+
+def carriers_by_id(ids):
+    return cache.get_many('carrier', ids, lambda missing: _load_by_id(CARRIER, missing))
+
+
+def active_carriers():
+    """Positions of every active carrier, ordered by id"""
+    return cache.get('carrier', 'list:active', lambda: [
+        CarrierPosition(*row)
+        for row in db.session.execute(
+            db.select(DeliveryPerson.id, DeliveryPerson.latitude, DeliveryPerson.longitude)
+            .where(DeliveryPerson.is_active == True)
+            .order_by(DeliveryPerson.id)
+        )
+    ])
+
+
+def all_locations():
+    return cache.get('location', 'list:all', lambda: _load_all(LOCATION))
+
+
+def locations_by_id(ids):
+    return cache.get_many('location', ids, lambda missing: _load_by_id(LOCATION, missing))
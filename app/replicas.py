@@ -0,0 +1,170 @@
+import itertools
+import math
+import threading
+import time
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import g, has_app_context, request
+from flask_sqlalchemy.session import Session
+
+from app.engine import engine_options, configure_engine
+
+# Read-replica routing. With SQLALCHEMY_REPLICA_URIS set, the SELECTs of a GET
+# or HEAD request go to one of the replicas, picked round-robin per request.
+# Everything else stays on the primary:
+#
+#   - flushes and INSERT/UPDATE/DELETE, and every statement after them in the
+#     same request (uncommitted rows only exist on the primary)
+#   - requests from a client that wrote within REPLICA_LAG_WINDOW seconds; a
+#     successful write sets a cookie saying so (or send X-Read-Primary: 1)
+#   - conditional GETs whose entities were written within the window, so a
+#     lagging replica never answers under the new ETag (see app/conditional.py)
+#   - views decorated with @primary, requests outside a request context
+#     (CLI, background threads) and the async views of app/asgi
+#
+# A replica whose queries fail with a connection-level error is skipped until
+# REPLICA_RETRY_INTERVAL seconds have passed and a `SELECT 1` succeeds again.
+# Replication itself is the database's business; for a local try, copy the
+# primary SQLite file (see benchmarks/replica_check.py).
+
+SAFE_METHODS = ('GET', 'HEAD')
+PIN_COOKIE = 'read_primary_until'
+
+
+class Replica:
+    def __init__(self, engine, retry_interval):
+        self.engine = engine
+        self.retry_interval = retry_interval
+        self.healthy = True
+        self.retry_at = 0.0
+        self.reads = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def available(self):
+        if self.healthy:
+            return True
+        if time.monotonic() < self.retry_at:
+            return False
+
+        with self._lock:
+            if self.healthy or time.monotonic() < self.retry_at:
+                return self.healthy
+            try:
+                with self.engine.connect() as connection:
+                    connection.execute(sa.text('SELECT 1'))
+            except sa.exc.DBAPIError:
+                self.retry_at = time.monotonic() + self.retry_interval
+                return False
+            self.healthy = True
+            return True
+
+    def mark_down(self):
+        self.healthy = False
+        self.failures += 1
+        self.retry_at = time.monotonic() + self.retry_interval
+
+    def stats(self):
+        return {
+            'url': self.engine.url.render_as_string(hide_password=True),
+            'healthy': self.healthy,
+            'reads': self.reads,
+            'failures': self.failures
+        }
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.replicas = []
+        self.lag_window = 5.0
+        self._cycle = None
+
+    def init_app(self, app):
+        self.lag_window = app.config['REPLICA_LAG_WINDOW']
+        self.replicas = []
+        for uri in app.config['SQLALCHEMY_REPLICA_URIS']:
+            engine = sa.create_engine(uri, **engine_options(app.config, uri))
+            configure_engine(engine, app.config)
+            replica = Replica(engine, app.config['REPLICA_RETRY_INTERVAL'])
+            sa.event.listen(engine, 'handle_error', self._failure_listener(replica))
+            self.replicas.append(replica)
+        self._cycle = itertools.cycle(self.replicas)
+
+        app.extensions['replicas'] = self
+        if self.replicas:
+            app.before_request(self._route_request)
+            app.after_request(self._pin_writer)
+
+    def pick(self):
+        """The next available replica, or None if all are down"""
+        for _ in range(len(self.replicas)):
+            replica = next(self._cycle)
+            if replica.available():
+                return replica
+        return None
+
+    def current(self):
+        """The replica chosen for this request, if any"""
+        return g.get('replica') if has_app_context() else None
+
+    def use_primary(self):
+        """Send the rest of this request to the primary"""
+        if has_app_context():
+            g.pop('replica', None)
+
+    def follow_versions(self, versions):
+        """Use the primary if an entity version is newer than the lag window"""
+        if max(versions) > time.time_ns() - self.lag_window * 1_000_000_000:
+            self.use_primary()
+
+    def stats(self):
+        return [replica.stats() for replica in self.replicas]
+
+    def _route_request(self):
+        if request.method not in SAFE_METHODS or request.headers.get('X-Read-Primary') == '1':
+            return
+        if request.cookies.get(PIN_COOKIE, type=float, default=0.0) > time.time():
+            return
+        g.replica = self.pick()
+
+    def _pin_writer(self, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, str(time.time() + self.lag_window), max_age=math.ceil(self.lag_window), httponly=True
+            )
+        return response
+
+    @staticmethod
+    def _failure_listener(replica):
+        def on_error(context):
+            if context.is_disconnect or isinstance(context.sqlalchemy_exception, sa.exc.OperationalError):
+                replica.mark_down()
+        return on_error
+
+
+class RoutingSession(Session):
+    """db.session that reads from the request's replica until it writes"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self.info.get('wrote'):
+            if self._flushing or isinstance(clause, sa.sql.dml.UpdateBase):
+                self.info['wrote'] = True
+            elif isinstance(clause, sa.Select):
+                replica = replicas.current()
+                if replica is not None:
+                    replica.reads += 1
+                    return replica.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def primary(view):
+    """Serve the decorated view from the primary only"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        replicas.use_primary()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+replicas = ReplicaRouter()
@@ -0,0 +1,72 @@
+from app.extensions import db
+from app.models import Customer, DeliveryPerson, Location, Publication, Subscription
+
+# Response dicts for the model listings, built straight from row tuples.
+#
+# A RowSerializer is declared with the columns it selects and compiles, once
+# at import, functions that read those columns by position:
+#
+#   CUSTOMER.many(rows)   [{'id': row[0], 'name': row[1], ...} for row in rows]
+#
+# so serializing a row costs one dict display, with no attribute lookups, key
+# mapping or per-field calls. Values are left as the driver returns them;
+# dates and datetimes are written as ISO 8601 by the JSON provider (app/json.py).
+
+
+class RowSerializer:
+    def __init__(self, *columns):
+        self.columns = columns
+        # the attribute name, or the label of a labelled column
+        self.fields = tuple(column.key for column in columns)
+
+        by_position = ', '.join(f'{field!r}: row[{index}]' for index, field in enumerate(self.fields))
+        by_attribute = ', '.join(f'{field!r}: obj.{field}' for field in self.fields)
+        source = (
+            f'def one(row):\n    return {{{by_position}}}\n'
+            f'def many(rows):\n    return [{{{by_position}}} for row in rows]\n'
+            f'def from_instance(obj):\n    return {{{by_attribute}}}\n'
+        )
+        namespace = {}
+        exec(compile(source, f'<serializer {", ".join(self.fields)}>', 'exec'), namespace)
+
+        self.one = namespace['one']
+        self.many = namespace['many']
+        # for a freshly written ORM instance; only for serializers of one model
+        self.from_instance = namespace['from_instance']
+
+    def __call__(self, rows):
+        return self.many(rows)
+
+    def select(self):
+        return db.select(*self.columns)
+
+
+CUSTOMER = RowSerializer(Customer.id, Customer.name, Customer.address, Customer.phone, Customer.location_id)
+
+PUBLICATION = RowSerializer(Publication.id, Publication.title, Publication.type)
+
+CARRIER = RowSerializer(
+    DeliveryPerson.id, DeliveryPerson.name, DeliveryPerson.vehicle_type, DeliveryPerson.vehicle_id,
+    DeliveryPerson.phone, DeliveryPerson.hire_date, DeliveryPerson.is_active,
+    DeliveryPerson.latitude, DeliveryPerson.longitude
+)
+
+LOCATION = RowSerializer(
+    Location.id, Location.latitude, Location.longitude, Location.address, Location.city, Location.postal_code
+)
+
+SUBSCRIPTION = RowSerializer(
+    Subscription.id, Subscription.customer_id, Customer.name.label('customer_name'),
+    Subscription.publication_id, Publication.title.label('publication_name'),
+    Subscription.start_date, Subscription.end_date, Subscription.status,
+    Subscription.requested_change_date, Subscription.change_approved
+)
+
+
+def subscriptions_select():
+    """SUBSCRIPTION's columns with the customer and publication joined in"""
+    return (
+        SUBSCRIPTION.select()
+        .outerjoin(Customer, Customer.id == Subscription.customer_id)
+        .outerjoin(Publication, Publication.id == Subscription.publication_id)
+    )
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 subscription_bp = Blueprint('subscription', __name__, url_prefix="/subscriptions")
 
-from . import routes
\ No newline at end of file
+from . import routes, lifecycle
\ No newline at end of file
@@ -0,0 +1,148 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import click
+from flask import current_app
+
+from app.cache import cache
+from app.extensions import db
+from app.models import Subscription
+from . import subscription_bp
+
+# Subscription state changes that fall due by date, applied in bulk:
+#
+#   activated   pending -> subscribed once the week of notice promised by
+#               POST /subscriptions/subscribe has passed since
+#               requested_change_date; start_date becomes the end of the notice
+#   expired     subscribed -> unsubscribed once end_date has passed
+#
+# Each transition is an UPDATE ... WHERE id IN (SELECT id ... LIMIT n), run and
+# committed again until it touches fewer than SUBSCRIPTION_LIFECYCLE_CHUNK_SIZE
+# rows, so no subscription is loaded into the ORM and no transaction holds
+# more than one chunk of rows, however large the table. Rows that have moved
+# no longer match, so a rerun (or two processes running at once) is harmless.
+#
+# Run it with `flask subscription process`, e.g. from cron, or set
+# SUBSCRIPTION_LIFECYCLE_INTERVAL to have each app process run it from a
+# background thread.
+
+NOTICE = timedelta(weeks=1)
+
+
+def process_subscriptions(today=None, chunk_size=None):
+    """Apply the transitions due on `today`; {transition: rows updated}"""
+    today = today or date.today()
+    chunk_size = chunk_size or current_app.config['SUBSCRIPTION_LIFECYCLE_CHUNK_SIZE']
+    counts = {'activated': 0, 'expired': 0}
+
+    # start_date depends on the request date; one pass per distinct date
+    # keeps the UPDATE free of dialect-specific date arithmetic
+    due_dates = db.session.execute(
+        db.select(Subscription.requested_change_date).distinct()
+        .where(Subscription.status == 'pending', Subscription.requested_change_date <= today - NOTICE)
+    ).scalars().all()
+    for requested in due_dates:
+        counts['activated'] += update_in_chunks(
+            (Subscription.status == 'pending', Subscription.requested_change_date == requested),
+            {'status': 'subscribed', 'start_date': requested + NOTICE, 'change_approved': True},
+            chunk_size
+        )
+
+    counts['expired'] = update_in_chunks(
+        (Subscription.status == 'subscribed', Subscription.end_date < today),
+        {'status': 'unsubscribed'},
+        chunk_size
+    )
+
+    if any(counts.values()):
+        cache.bump('subscription')
+    for transition, count in counts.items():
+        current_app.logger.info('Subscription lifecycle for %s: %d %s', today, count, transition)
+    return counts
+
+
+def update_in_chunks(criteria, values, chunk_size):
+    """Set `values` on every subscription matching `criteria`, committing every
+    `chunk_size` rows. Returns the number of rows updated."""
+    chunk = db.select(Subscription.id).where(*criteria).limit(chunk_size)
+    statement = db.update(Subscription.__table__).where(Subscription.id.in_(chunk)).values(**values)
+
+    total = 0
+    while True:
+        updated = db.session.execute(statement).rowcount
+        db.session.commit()
+        total += updated
+        if updated < chunk_size:
+            return total
+
+
+class LifecycleScheduler:
+    """Runs process_subscriptions every SUBSCRIPTION_LIFECYCLE_INTERVAL seconds"""
+
+    def __init__(self):
+        self.app = None
+        self.interval = 0.0
+        self.runs = 0
+        self.last_run = None
+        self.last_counts = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config['SUBSCRIPTION_LIFECYCLE_INTERVAL']
+        app.extensions['subscription_lifecycle'] = self
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='subscription-lifecycle', daemon=True)
+            self._thread.start()
+
+    def run_once(self):
+        with self.app.app_context():
+            counts = process_subscriptions()
+        self.runs += 1
+        self.last_run = time.time()
+        self.last_counts = counts
+        return counts
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'runs': self.runs,
+            'last_run': self.last_run,
+            'last_counts': self.last_counts
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                self.app.logger.exception('Subscription lifecycle run failed; retrying next interval')
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop.clear()
+
+
+lifecycle = LifecycleScheduler()
+
+
+@subscription_bp.cli.command('process')
+@click.option('--date', 'day', help='Apply the transitions due on this day (YYYY-MM-DD) instead of today')
+@click.option('--chunk-size', type=int, help='Rows per UPDATE (default SUBSCRIPTION_LIFECYCLE_CHUNK_SIZE)')
+def process_command(day, chunk_size):
+    """Activate pending subscriptions and expire ended ones."""
+    try:
+        today = datetime.strptime(day, '%Y-%m-%d').date() if day else None
+    except ValueError:
+        raise click.BadParameter('Please use YYYY-MM-DD', param_hint='--date')
+
+    started = time.perf_counter()
+    counts = process_subscriptions(today, chunk_size)
+    for transition, count in counts.items():
+        click.echo(f'{transition}: {count}')
+    click.echo(f'done in {time.perf_counter() - started:.1f}s')
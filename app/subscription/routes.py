@@ -1,33 +1,28 @@
 from flask import request, jsonify
 from . import subscription_bp
 from app.extensions import db
-from app.models import Subscription
+from app.models import Subscription, Customer, Publication
+from app.pagination import wants_page, page_response
+from app.cache import cache
+from app.conditional import conditional
+from app.bulk import read_rows, in_chunks, BulkResults, insert_rows, existing_ids, bad_id, is_id
+from app.serializers import SUBSCRIPTION, subscriptions_select
 from datetime import datetime, timedelta
 
+
 @subscription_bp.route('/', methods=['GET'])
+@conditional('subscription', 'customer', 'publication')
 def get_subscriptions():
-    subscriptions = Subscription.query.all()
+    if wants_page():
+        return page_response(subscriptions_select(), Subscription.id, SUBSCRIPTION, 'subscriptions')
+
+    # one joined select rather than a customer and a publication load per row
+    subscriptions = SUBSCRIPTION.many(db.session.execute(subscriptions_select().order_by(Subscription.id)))
 
     if not subscriptions:
         return jsonify({'message': 'No subscriptions found.'}), 404
 
-    result = [
-        {
-            'id': s.id,
-            'customer_id': s.customer_id,
-            'customer_name': s.customer.name,
-            'publication_id': s.publication_id,
-            'publication_name': s.publication.title,
-            'start_date': s.start_date.isoformat() if s.start_date else None,
-            'end_date': s.end_date.isoformat() if s.end_date is not None else None,
-            'status': s.status,
-            'requested_change_date': s.requested_change_date,
-            'change_approved': s.change_approved
-        }
-        for s in subscriptions
-    ]
-
-    return jsonify(result)
+    return jsonify(subscriptions)
 
 # subscribe
 @subscription_bp.route('/subscribe', methods=['POST'])
@@ -56,30 +51,79 @@ def subscribe():
 
     db.session.add(new_subscription)
     db.session.commit()
+    cache.bump('subscription')
 
     return jsonify({'message': 'Subscription request submitted. Change will be effective in 1 week.'}), 201
 
+@subscription_bp.route('/bulk', methods=['POST'])
+def bulk_subscribe():
+    """Subscribe many customers at once; each row is handled like POST /subscribe"""
+    try:
+        rows = read_rows()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        results = BulkResults(len(rows))
+        customer_ids = existing_ids(Customer, {row.get('customer_id') for row in rows if is_id(row.get('customer_id'))})
+        publication_ids = existing_ids(Publication, {row.get('publication_id') for row in rows if is_id(row.get('publication_id'))})
+
+        # pairs that already have a live subscription
+        active = set()
+        for chunk in in_chunks(list(customer_ids)):
+            active.update(db.session.execute(
+                db.select(Subscription.customer_id, Subscription.publication_id)
+                .where(Subscription.customer_id.in_(chunk), Subscription.status.in_(['subscribed', 'pending']))
+            ).all())
+
+        today = datetime.now().date()
+        inserts = []
+        for index, row in enumerate(rows):
+            customer_id = row.get('customer_id')
+            publication_id = row.get('publication_id')
+
+            key = bad_id(row, 'customer_id', 'publication_id')
+            if key:
+                results.fail(index, f'{key} must be an integer')
+                continue
+            if not customer_id or not publication_id:
+                results.fail(index, 'Customer ID and Publication ID are required.')
+                continue
+            if customer_id not in customer_ids:
+                results.fail(index, 'Customer not found')
+                continue
+            if publication_id not in publication_ids:
+                results.fail(index, 'Publication not found')
+                continue
+            if (customer_id, publication_id) in active:
+                results.fail(index, 'User is already subscribed to this publication or the subscription is pending')
+                continue
+
+            active.add((customer_id, publication_id))
+            inserts.append((index, {
+                'customer_id': customer_id,
+                'publication_id': publication_id,
+                'status': 'pending',
+                'requested_change_date': today
+            }))
+
+        insert_rows(Subscription, inserts, results)
+        cache.bump('subscription')
+
+        return jsonify(results.summary()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f"An error occurred: {str(e)}"}), 500
+
 @subscription_bp.route('/<int:id>', methods=['GET'])
+@conditional('subscription', 'customer', 'publication')
 def get_subscription_by_id(id):
-    subscription = Subscription.query.get(id)
+    row = db.session.execute(subscriptions_select().where(Subscription.id == id)).first()
 
-    if not subscription:
+    if not row:
         return jsonify({'message': 'Subscription not found'}), 404
 
-    result = {
-        'id': subscription.id,
-        'customer_id': subscription.customer_id,
-        'customer_name': subscription.customer.name,
-        'publication_id': subscription.publication_id,
-        'publication_name': subscription.publication.title,
-        'start_date': subscription.start_date.isoformat() if subscription.start_date is not None else None,
-        'end_date': subscription.end_date.isoformat() if subscription.end_date is not None else None,
-        'status': subscription.status,
-        'requested_change_date': subscription.requested_change_date,
-        'change_approved': subscription.change_approved
-    }
-
-    return jsonify(result)
+    return jsonify(SUBSCRIPTION.one(row))
 
 # TODO: remove me
 @subscription_bp.route('/<int:id>', methods=['PUT'])
@@ -95,6 +139,7 @@ def update_subscription(id):
         try:
             subscription.end_date = datetime.strptime(data['end_date'], '%Y-%m-%d').date()
             db.session.commit()
+            cache.bump('subscription')
             return jsonify({
                 'id': subscription.id,
                 'customer_id': subscription.customer_id,
@@ -138,6 +183,7 @@ def unsubscribe():
     subscription.change_approved = True 
 
     db.session.commit()
+    cache.bump('subscription')
 
     return jsonify({'message': 'Unsubscription request confirmed. You will be unsubscribed after 1 week.'}), 200
 
@@ -152,6 +198,7 @@ def delete_subscription(id):
     try:
         db.session.delete(subscription)
         db.session.commit()
+        cache.bump('subscription')
         return jsonify({'message': 'Subscription deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
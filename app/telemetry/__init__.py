@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+telemetry_bp = Blueprint('telemetry', __name__, url_prefix="/telemetry")
+
+from . import routes
@@ -0,0 +1,174 @@
+import atexit
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+from app.cache import cache
+from app.extensions import db
+from app.models import DeliveryPerson
+
+# Latest carrier positions, held in memory and written back in batches.
+#
+# Pings only touch the in-process table; the current position of a carrier is
+# read from it without a database hit. A background thread wakes every
+# TELEMETRY_FLUSH_INTERVAL seconds and writes the positions that changed since
+# its last run as one executemany UPDATE of delivery_persons, so however many
+# pings arrive in between, each carrier costs one row per flush. Positions are
+# per process: with several workers each flushes the pings it received.
+#
+# With TELEMETRY_HISTORY_PATH set, every accepted ping is also appended to
+# that file as a fixed 20-byte record (see HISTORY_DTYPE); read_history()
+# loads it back as a numpy structured array.
+
+HISTORY_RECORD = struct.Struct('<Idff')
+HISTORY_DTYPE = np.dtype([('carrier_id', '<u4'), ('timestamp', '<f8'), ('latitude', '<f4'), ('longitude', '<f4')])
+
+FLUSH_STATEMENT = (
+    db.update(DeliveryPerson.__table__)
+    .where(DeliveryPerson.id == db.bindparam('carrier_id'))
+    .values(latitude=db.bindparam('new_latitude'), longitude=db.bindparam('new_longitude'))
+)
+
+
+class PositionTable:
+    def __init__(self):
+        self.app = None
+        self.flush_interval = 5.0
+        self.history_path = None
+        self._positions = {}  # carrier_id -> (latitude, longitude, timestamp)
+        self._dirty = {}      # carrier_id -> (latitude, longitude, timestamp), not yet flushed
+        self._history = []    # packed history records, not yet written
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+        self.pings = 0
+        self.flushes = 0
+        self.rows_written = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config['TELEMETRY_FLUSH_INTERVAL']
+        self.history_path = app.config['TELEMETRY_HISTORY_PATH'] or None
+        app.extensions['telemetry'] = self
+        atexit.register(self.stop)
+
+    def record(self, carrier_id, latitude, longitude, timestamp=None):
+        """Take a ping. Pings older than the carrier's known position are
+        kept in the history but do not move the carrier. Returns whether the
+        carrier moved."""
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        position = (float(latitude), float(longitude), timestamp)
+
+        with self._lock:
+            self.pings += 1
+            if self.history_path:
+                self._history.append(HISTORY_RECORD.pack(carrier_id, timestamp, position[0], position[1]))
+
+            current = self._positions.get(carrier_id)
+            moved = current is None or current[2] <= timestamp
+            if moved:
+                self._positions[carrier_id] = position
+                self._dirty[carrier_id] = position
+
+        self._ensure_flusher()
+        return moved
+
+    def get(self, carrier_id):
+        """(latitude, longitude, timestamp) of a carrier's last ping, or None"""
+        return self._positions.get(carrier_id)
+
+    def snapshot(self):
+        """{carrier_id: (latitude, longitude, timestamp)} for every carrier seen"""
+        with self._lock:
+            return dict(self._positions)
+
+    def forget(self, carrier_id):
+        with self._lock:
+            self._positions.pop(carrier_id, None)
+            self._dirty.pop(carrier_id, None)
+
+    def flush(self):
+        """Write pending positions and history now. Needs an app context.
+        Returns the number of carriers written."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            history, self._history = self._history, []
+
+        if history:
+            with open(self.history_path, 'ab') as f:
+                f.write(b''.join(history))
+
+        if not dirty:
+            return 0
+
+        try:
+            db.session.execute(FLUSH_STATEMENT, [
+                {'carrier_id': carrier_id, 'new_latitude': latitude, 'new_longitude': longitude}
+                for carrier_id, (latitude, longitude, _) in dirty.items()
+            ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # put them back unless a newer ping has arrived meanwhile
+            with self._lock:
+                for carrier_id, position in dirty.items():
+                    self._dirty.setdefault(carrier_id, position)
+            raise
+
+        cache.invalidate('carrier', *dirty)
+        self.flushes += 1
+        self.rows_written += len(dirty)
+        return len(dirty)
+
+    def stats(self):
+        return {
+            'carriers': len(self._positions),
+            'pending': len(self._dirty),
+            'pings': self.pings,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'flush_interval': self.flush_interval,
+            'history_path': self.history_path
+        }
+
+    def _ensure_flusher(self):
+        # started on the first ping, so CLI commands and tests that never
+        # receive one do not get a background thread
+        if self._flusher is not None or self.app is None or self.flush_interval <= 0:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run, name='telemetry-flusher', daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception:
+                self.app.logger.exception('Telemetry flush failed; retrying next interval')
+
+    def stop(self):
+        """Stop the flusher and write whatever is pending"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self._stop.clear()
+        if self.app is not None:
+            with self.app.app_context():
+                self.flush()
+
+
+def read_history(path):
+    """The pings appended to a history file, as a HISTORY_DTYPE array"""
+    if not os.path.exists(path):
+        return np.empty(0, dtype=HISTORY_DTYPE)
+    return np.fromfile(path, dtype=HISTORY_DTYPE)
+
+
+positions = PositionTable()
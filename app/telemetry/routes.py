@@ -0,0 +1,100 @@
+from numbers import Real
+
+from flask import jsonify, current_app
+from . import telemetry_bp
+from app.bulk import read_rows
+from app.reference import carriers_by_id
+from app.events.hub import hub
+from .positions import positions
+
+
+def serialize_position(carrier_id, latitude, longitude, timestamp):
+    return {
+        'delivery_person_id': carrier_id,
+        'latitude': latitude,
+        'longitude': longitude,
+        'timestamp': timestamp
+    }
+
+
+def ping_error(row, known_carriers):
+    """Why a ping is unusable, or None if it is fine"""
+    carrier_id = row.get('carrier_id')
+    latitude = row.get('latitude')
+    longitude = row.get('longitude')
+    timestamp = row.get('timestamp')
+
+    if not isinstance(carrier_id, int) or isinstance(carrier_id, bool) or carrier_id <= 0:
+        return 'carrier_id must be a positive integer'
+    if carrier_id not in known_carriers:
+        return 'Carrier not found'
+    if not isinstance(latitude, Real) or not -90 <= latitude <= 90:
+        return 'latitude must be a number between -90 and 90'
+    if not isinstance(longitude, Real) or not -180 <= longitude <= 180:
+        return 'longitude must be a number between -180 and 180'
+    if timestamp is not None and not isinstance(timestamp, Real):
+        return 'timestamp must be seconds since the epoch'
+    return None
+
+
+def publish_positions(carrier_ids):
+    """Push the current position of the given carriers to the live feed"""
+    if not carrier_ids or not hub.listening('carrier'):
+        return
+    hub.publish('carrier', 'positions', {'positions': [
+        serialize_position(carrier_id, *positions.get(carrier_id)) for carrier_id in sorted(carrier_ids)
+    ]})
+
+
+@telemetry_bp.route('/pings', methods=['POST'])
+def ingest_pings():
+    """Take a batch of GPS pings (JSON array or NDJSON) of the form
+    {carrier_id, latitude, longitude, timestamp?}"""
+    try:
+        rows = read_rows()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    max_pings = current_app.config['TELEMETRY_MAX_PINGS']
+    if len(rows) > max_pings:
+        return jsonify({'message': f'At most {max_pings} pings per request'}), 413
+
+    known_carriers = carriers_by_id({row['carrier_id'] for row in rows if isinstance(row.get('carrier_id'), int)})
+
+    accepted = 0
+    rejected = []
+    moved = set()
+    for index, row in enumerate(rows):
+        error = ping_error(row, known_carriers)
+        if error:
+            rejected.append({'index': index, 'message': error})
+            continue
+        if positions.record(row['carrier_id'], row['latitude'], row['longitude'], row.get('timestamp')):
+            moved.add(row['carrier_id'])
+        accepted += 1
+
+    publish_positions(moved)
+
+    return jsonify({'accepted': accepted, 'rejected': rejected}), 202
+
+
+@telemetry_bp.route('/positions', methods=['GET'])
+def get_positions():
+    """Last reported position of every carrier that has pinged this process"""
+    return jsonify([
+        serialize_position(carrier_id, *position)
+        for carrier_id, position in sorted(positions.snapshot().items())
+    ])
+
+
+@telemetry_bp.route('/positions/<int:carrier_id>', methods=['GET'])
+def get_position(carrier_id):
+    position = positions.get(carrier_id)
+    if position is not None:
+        return jsonify(serialize_position(carrier_id, *position))
+
+    # no ping yet: the stored position, with no timestamp
+    carrier = carriers_by_id([carrier_id]).get(carrier_id)
+    if not carrier:
+        return jsonify({'message': 'Carrier not found'}), 404
+    return jsonify(serialize_position(carrier_id, carrier['latitude'], carrier['longitude'], None))
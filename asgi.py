@@ -0,0 +1,4 @@
+from app.asgi import create_asgi_app
+
+# hypercorn asgi:app (run.py remains the WSGI entry point)
+app = create_asgi_app()
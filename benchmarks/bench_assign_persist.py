@@ -0,0 +1,88 @@
+"""Persisting a day's assignment: one ORM flush per row against save_assignments.
+
+Seeds unassigned deliveries in an in-memory database and writes the same
+carrier assignment both ways, reporting wall time and SQL statement count.
+
+    python benchmarks/bench_assign_persist.py [--drops 50000] [--carriers 300]
+"""
+import argparse
+import time
+from datetime import date
+
+from query_count import count_queries
+
+from app import create_app
+from app.delivery.queries import save_assignments
+from app.extensions import db
+from app.models import DeliveryAssignment, DeliveryPerson
+from app.reference import CarrierPosition
+
+DAY = date(2025, 1, 1)
+
+
+def seed(drops, carriers):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(db.insert(DeliveryPerson), [
+        {'id': i, 'name': f'carrier {i}', 'latitude': -1.28, 'longitude': 36.82} for i in range(1, carriers + 1)
+    ])
+    db.session.execute(db.insert(DeliveryAssignment), [
+        {'id': i, 'delivery_person_id': None, 'date': DAY} for i in range(1, drops + 1)
+    ])
+    db.session.commit()
+
+
+def split(deliveries, carriers):
+    return [
+        (CarrierPosition(carrier, None, None), deliveries[carrier - 1::carriers])
+        for carrier in range(1, carriers + 1)
+    ]
+
+
+def per_row(assignment_list):
+    for carrier, deliveries in assignment_list:
+        for delivery in deliveries:
+            delivery.delivery_person_id = carrier.id
+            db.session.add(delivery)
+    db.session.commit()
+
+
+def bulk(assignment_list):
+    updated = save_assignments(
+        [delivery.id for _, deliveries in assignment_list for delivery in deliveries],
+        [carrier.id for carrier, deliveries in assignment_list for _ in deliveries]
+    )
+    db.session.commit()
+    return updated
+
+
+def run(name, persist, drops, carriers):
+    seed(drops, carriers)
+    deliveries = DeliveryAssignment.query.filter_by(date=DAY, delivery_person_id=None).all()
+    assignment_list = split(deliveries, carriers)
+
+    with count_queries(db.engine) as statements:
+        start = time.perf_counter()
+        persist(assignment_list)
+        elapsed = time.perf_counter() - start
+
+    db.session.expunge_all()
+    assigned = db.session.scalar(db.select(db.func.count()).where(DeliveryAssignment.delivery_person_id.is_not(None)))
+    assert assigned == drops, (name, assigned)
+    print(f'{name:10s} {elapsed:8.3f} s  {len(statements):6d} statements')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--drops', type=int, default=50000)
+    parser.add_argument('--carriers', type=int, default=300)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        run('per-row', per_row, args.drops, args.carriers)
+        run('bulk', bulk, args.drops, args.carriers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Concurrent writers against a SQLite file: "database is locked" errors.
+
+Runs a mix of write and read requests from --processes worker processes of
+--threads threads each (like several app server workers) through the Flask
+app for --duration seconds, once with the settings SQLite had before
+app/engine.py (rollback journal, synchronous=FULL, the driver's 5 s busy
+timeout, a pool of 5 + 10) and once with the configured ones, each in a fresh
+process and database. Reports requests per second, failed requests and how
+many of the failures were "database is locked".
+
+    python benchmarks/bench_concurrent_writes.py [--processes 4] [--threads 16] [--duration 10]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# what a SQLite file got before the engine settings existed
+LEGACY = {
+    'SQLITE_JOURNAL_MODE': 'DELETE',
+    'SQLITE_SYNCHRONOUS': 'FULL',
+    'SQLITE_BUSY_TIMEOUT': '5000',
+    'SQLITE_MMAP_SIZE': '0',
+    'SQLITE_CACHE_SIZE': '-2000',
+    'DB_POOL_SIZE': '5',
+    'DB_MAX_OVERFLOW': '10'
+}
+
+
+def run(threads, duration, seed_only):
+    sys.path.insert(0, ROOT)
+    from sqlalchemy import event
+    from sqlalchemy.exc import SAWarning
+    from app import create_app
+    from app.extensions import db
+
+    # the models' overlapping relationships warn on every mapper configuration
+    warnings.filterwarnings('ignore', category=SAWarning)
+
+    app = create_app()
+    if seed_only:
+        client = app.test_client()
+        for i in range(50):
+            client.post('/locations/', json={'latitude': -1.28 + i / 1000, 'longitude': 36.8, 'address': f'{i} Road'})
+        client.post('/publications/', json={'title': 'Daily', 'type': 'newspaper'})
+        return
+
+    locked = []
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'handle_error')
+    def count_locked(context):
+        if 'database is locked' in str(context.original_exception):
+            locked.append(1)
+
+    requests, failures = [], []
+    deadline = time.perf_counter() + duration
+
+    def worker(seed):
+        seed = f'{os.getpid()}-{seed}'
+        rng = random.Random(seed)
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            choice = rng.random()
+            if choice < 0.3:
+                response = client.post('/customers/', json={
+                    'name': 'customer', 'address': 'Moi Avenue', 'phone': f'{seed}-{rng.random()}'
+                })
+            elif choice < 0.6:
+                response = client.post('/deliveries/', json={
+                    'date': '2025-01-01', 'location_ids': [rng.randint(1, 50)], 'publication_ids': [1]
+                })
+            elif choice < 0.75:
+                response = client.put(f'/locations/{rng.randint(1, 50)}', json={'address': f'{rng.random()} Road'})
+            else:
+                response = client.get('/deliveries/?date=2025-01-01')
+            requests.append(1)
+            if response.status_code >= 500:
+                failures.append(response.status_code)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        'requests': len(requests),
+        'per_second': len(requests) / elapsed,
+        'failed': len(failures),
+        'locked': len(locked)
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=16, help='per process')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--seed-only', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run(args.threads, args.duration, args.seed_only)
+
+    print(f'{args.processes} processes x {args.threads} threads, {args.duration:.0f}s per configuration')
+    print(f'{"settings":10} {"requests":>9} {"req/s":>7} {"failed":>7} {"locked":>7}')
+    for name, overrides in (('legacy', LEGACY), ('configured', {})):
+        workdir = tempfile.mkdtemp()
+        env = dict(
+            os.environ, **overrides,
+            SQLALCHEMY_DATABASE_URI='sqlite:///' + os.path.join(workdir, 'writes.db'),
+            TELEMETRY_FLUSH_INTERVAL='0'
+        )
+        command = [sys.executable, __file__, '--worker', '--threads', str(args.threads), '--duration', str(args.duration)]
+        subprocess.run(command + ['--seed-only'], env=env, check=True)
+
+        workers = [
+            # the failing requests log their tracebacks; only the counts matter here
+            subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            for _ in range(args.processes)
+        ]
+        results = [json.loads(worker.communicate()[0].strip().splitlines()[-1]) for worker in workers]
+        total = {key: sum(result[key] for result in results) for key in ('requests', 'per_second', 'failed', 'locked')}
+        print(f'{name:10} {total["requests"]:9} {total["per_second"]:7.0f} {total["failed"]:7} {total["locked"]:7}')
+
+
+if __name__ == '__main__':
+    main()
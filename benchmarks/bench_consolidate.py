@@ -0,0 +1,147 @@
+"""Stop consolidation ahead of the assignment solvers in app/delivery/optimizer.py.
+
+Builds a day of --deliveries deliveries where --share of them are in
+--buildings buildings (many deliveries at one location) and the rest are
+single houses, and --carriers carriers. For the greedy and the balanced
+solver (at the route's default capacity, an even share, and with a tenth
+more room), times solving per delivery and over the consolidated stops, and
+reports the solver input, the total distance and the buildings split between
+carriers (the balanced solver splits one only when whole buildings do not
+fit the capacity). Checks that every delivery is assigned once, that the
+greedy solver splits no building, that capacity is respected, and that
+consolidating distinct points changes nothing.
+
+    python benchmarks/bench_consolidate.py [--deliveries 40000] [--buildings 400] [--share 0.8] [--carriers 40]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.delivery.optimizer import assign_balanced, assign_balanced_stops, assign_nearest, consolidate, stop_members
+from app.geo import distance_matrix
+
+METRIC = 'haversine'
+
+
+def random_points(count, rng):
+    # roughly a city-sized box around Nairobi
+    return np.column_stack([
+        rng.uniform(-1.45, -1.15, count),
+        rng.uniform(36.65, 37.05, count),
+    ])
+
+
+def owners(assignments, count):
+    """Carrier index per point from (carrier_index, indices) pairs; -1 if
+    unassigned, -2 if assigned twice"""
+    owner = np.full(count, -1)
+    for carrier_index, picked in assignments:
+        owner[picked] = np.where(owner[picked] == -1, carrier_index, -2)
+    return owner
+
+
+def total_distance(coords, carrier_coords, owner):
+    return float(distance_matrix(carrier_coords, coords, METRIC)[owner, np.arange(len(coords))].sum())
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--deliveries', type=int, default=40_000)
+    parser.add_argument('--buildings', type=int, default=400)
+    parser.add_argument('--share', type=float, default=0.8, help='fraction of the deliveries in buildings')
+    parser.add_argument('--carriers', type=int, default=40)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    in_buildings = int(args.deliveries * args.share)
+    houses = args.deliveries - in_buildings
+    # location ids: the buildings are 0..buildings-1, every house its own location
+    location_ids = rng.permutation(np.concatenate([
+        rng.integers(0, args.buildings, in_buildings),
+        np.arange(args.buildings, args.buildings + houses)
+    ]))
+    location_coords = random_points(args.buildings + houses, rng)
+    coords = location_coords[location_ids]
+    carrier_coords = random_points(args.carriers, rng)
+
+    per_carrier, remaining = divmod(args.deliveries, args.carriers)
+    even_share = -(-args.deliveries // args.carriers)
+
+    stops = consolidate(location_ids)
+    first, stop_of, weights = stops
+    members = stop_members(stop_of, len(first))
+    stop_coords = coords[first]
+    print(f'{args.deliveries} deliveries, {args.carriers} carriers: {len(first)} stops, '
+          f'{args.deliveries / len(first):.1f}x smaller solver input, largest stop {weights.max()}')
+
+    failures = []
+
+    def split(owner):
+        return sum(len(np.unique(owner[indices])) > 1 for indices in members)
+
+    def check(name, owner, whole=False):
+        if (owner < 0).any():
+            failures.append(f'{name}: {np.count_nonzero(owner == -1)} unassigned, {np.count_nonzero(owner == -2)} twice')
+        elif whole and split(owner):
+            failures.append(f'{name}: {split(owner)} stops split between carriers')
+
+    # greedy
+    plain, plain_time = timed(assign_nearest, coords, carrier_coords, per_carrier, remaining, METRIC)
+    plain_owner = owners(plain, args.deliveries)
+    grouped, stops_time = timed(assign_nearest, stop_coords, carrier_coords, per_carrier, remaining, METRIC, weights)
+    stops_owner = owners(grouped, len(first))[stop_of]
+    check('greedy', plain_owner)
+    check('greedy stops', stops_owner, whole=True)
+    loads = np.bincount(stops_owner, minlength=args.carriers)
+    print(f'greedy per delivery: {plain_time:.2f}s, total {total_distance(coords, carrier_coords, plain_owner):.0f} km')
+    print(f'greedy over stops:   {stops_time:.2f}s ({plain_time / stops_time:.0f}x), total '
+          f'{total_distance(coords, carrier_coords, stops_owner):.0f} km, loads {loads.min()}-{loads.max()} (quota {per_carrier})')
+
+    # balanced; an even share leaves whole buildings little room
+    for capacity in (even_share, int(even_share * 1.1)):
+        plain_owner, plain_time = timed(assign_balanced, coords, carrier_coords, capacity, METRIC)
+        stops_owner, stops_time = timed(assign_balanced_stops, coords, stops, carrier_coords, capacity, METRIC)
+        check(f'balanced {capacity}', plain_owner)
+        check(f'balanced {capacity} stops', stops_owner)
+        loads = np.bincount(stops_owner, minlength=args.carriers)
+        if loads.max() > capacity:
+            failures.append(f'balanced {capacity} stops: a carrier has {loads.max()} deliveries')
+        print(f'balanced, capacity {capacity}, per delivery: {plain_time:.2f}s, '
+              f'total {total_distance(coords, carrier_coords, plain_owner):.0f} km, {split(plain_owner)} buildings split')
+        print(f'balanced, capacity {capacity}, over stops:   {stops_time:.2f}s ({plain_time / stops_time:.0f}x), '
+              f'total {total_distance(coords, carrier_coords, stops_owner):.0f} km, {split(stops_owner)} buildings split')
+
+    # distinct points: one stop each, in order, so the results must not change
+    sample = min(args.deliveries, 5000)
+    points = random_points(sample, rng)
+    distinct = consolidate(np.round(points, 6))
+    first, _, weights = distinct
+    if len(first) != sample or (first != np.arange(sample)).any():
+        failures.append('distinct points were merged or reordered')
+    plain = assign_nearest(points, carrier_coords, sample // args.carriers, sample % args.carriers, METRIC)
+    grouped = assign_nearest(points, carrier_coords, sample // args.carriers, sample % args.carriers, METRIC, weights)
+    if any(a != b or not np.array_equal(p, q) for (a, p), (b, q) in zip(plain, grouped)):
+        failures.append('greedy over distinct stops differs from per delivery')
+    capacity = -(-sample // args.carriers)
+    if not np.array_equal(assign_balanced(points, carrier_coords, capacity, METRIC),
+                          assign_balanced_stops(points, distinct, carrier_coords, capacity, METRIC)):
+        failures.append('balanced over distinct stops differs from per delivery')
+
+    for failure in failures:
+        print('FAIL', failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
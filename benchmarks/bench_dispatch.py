@@ -0,0 +1,128 @@
+"""Loading a day's dispatch state for the assignment solvers.
+
+Seeds --deliveries unassigned deliveries, each linked to one of --locations
+locations, and --carriers active carriers in a SQLite file. Loads them the
+way POST /deliveries/assign used to (ORM instances, then each delivery's
+locations[0] lazy-loaded for its coordinates) and with the Core snapshot of
+app/delivery/dispatch.py, reporting the load time, SQL statements and peak
+Python memory (traced in a second load) of each, and checks that both give
+the same coordinates.
+
+    python benchmarks/bench_dispatch.py [--deliveries 40000] [--locations 10000] [--carriers 300]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import date
+
+workdir = tempfile.mkdtemp()
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'dispatch.db')
+os.environ['TELEMETRY_FLUSH_INTERVAL'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sqlalchemy.exc import SAWarning
+
+from app import create_app
+from app.delivery.dispatch import load_carriers, load_deliveries
+from app.delivery.optimizer import coordinates, pack_coordinates
+from app.extensions import db
+from app.models import DeliveryAssignment, DeliveryPerson, Location, delivery_assignment_location
+
+# the models' overlapping relationships warn on every mapper configuration
+warnings.filterwarnings('ignore', category=SAWarning)
+
+DAY = date(2025, 9, 1)
+
+
+def seed(deliveries, locations, carriers):
+    db.session.execute(db.insert(Location.__table__), [
+        {'latitude': -1.2 - i % 300 / 1000, 'longitude': 36.7 + i // 300 / 1000, 'address': f'{i} Road',
+         'city': 'Nairobi', 'postal_code': '00100'}
+        for i in range(locations)
+    ])
+    db.session.execute(db.insert(DeliveryPerson.__table__), [
+        {'name': f'carrier {i}', 'vehicle_type': 'bike', 'vehicle_id': f'KAA {i:03d}', 'phone': f'07{i:08d}',
+         'is_active': True, 'latitude': -1.3 + i % 20 / 100, 'longitude': 36.7 + i // 20 / 100}
+        for i in range(carriers)
+    ])
+    db.session.execute(db.insert(DeliveryAssignment.__table__), [
+        {'date': DAY, 'delivery_person_id': None} for _ in range(deliveries)
+    ])
+    db.session.execute(db.insert(delivery_assignment_location), [
+        {'delivery_assignment_id': i + 1, 'location_id': i * 7919 % locations + 1} for i in range(deliveries)
+    ])
+    db.session.commit()
+
+
+def orm_state():
+    deliveries = DeliveryAssignment.query.filter_by(date=DAY, delivery_person_id=None).all()
+    carriers = DeliveryPerson.query.filter_by(is_active=True).order_by(DeliveryPerson.id).all()
+    delivery_coords = pack_coordinates(
+        [(delivery.locations[0].latitude, delivery.locations[0].longitude) for delivery in deliveries]
+    )
+    carrier_coords = pack_coordinates([(carrier.latitude, carrier.longitude) for carrier in carriers])
+    return [delivery.id for delivery in deliveries], delivery_coords, carrier_coords
+
+
+def snapshot_state():
+    deliveries = load_deliveries([DeliveryAssignment.date == DAY, DeliveryAssignment.delivery_person_id.is_(None)])
+    carriers = load_carriers()
+    return deliveries['id'].tolist(), coordinates(deliveries), coordinates(carriers)
+
+
+def measure(name, load, count_queries):
+    """Load once for time and statements, and once under tracemalloc, whose
+    bookkeeping would distort the timing, for peak memory"""
+    db.session.remove()
+    with count_queries(db.engine) as statements:
+        started = time.perf_counter()
+        state = load()
+        elapsed = time.perf_counter() - started
+
+    db.session.remove()
+    tracemalloc.start()
+    load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:>8}: {elapsed:7.3f}s  {len(statements):6d} statements  peak {peak / 2 ** 20:7.1f} MiB')
+    return state, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--deliveries', type=int, default=40_000)
+    parser.add_argument('--locations', type=int, default=10_000)
+    parser.add_argument('--carriers', type=int, default=300)
+    args = parser.parse_args()
+
+    app = create_app()
+    # imported late: query_count points SQLALCHEMY_DATABASE_URI at an
+    # in-memory database on import, which must not reach the app's config
+    from query_count import count_queries
+
+    with app.app_context():
+        seed(args.deliveries, args.locations, args.carriers)
+        print(f'{args.deliveries} deliveries at {args.locations} locations, {args.carriers} carriers')
+
+        orm, orm_time = measure('ORM', orm_state, count_queries)
+        snapshot, snapshot_time = measure('snapshot', snapshot_state, count_queries)
+        print(f'snapshot is {orm_time / snapshot_time:.0f}x faster')
+
+    failures = []
+    if orm[0] != snapshot[0]:
+        failures.append('the two paths loaded different deliveries')
+    elif not (np.array_equal(orm[1], snapshot[1]) and np.array_equal(orm[2], snapshot[2])):
+        failures.append('the two paths loaded different coordinates')
+
+    for failure in failures:
+        print('FAIL', failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Throughput of the distance kernels in app/geo.py, in pairs per second.
+
+    python benchmarks/bench_distance.py [--origins 300] [--destinations 40000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.geo import distance_matrix, METRICS
+
+
+def random_points(count, rng):
+    # roughly a city-sized box around Nairobi
+    return np.column_stack([
+        rng.uniform(-1.45, -1.15, count),
+        rng.uniform(36.65, 37.05, count),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--origins', type=int, default=300)
+    parser.add_argument('--destinations', type=int, default=40000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    origins = random_points(args.origins, rng)
+    destinations = random_points(args.destinations, rng)
+    pairs = args.origins * args.destinations
+
+    # plain per-pair haversine with no algebraic shortcuts, for error reporting
+    lat1, lon1 = np.radians(origins).T[:, :, None]
+    lat2, lon2 = np.radians(destinations).T[:, None, :]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    reference = 2 * 6371.0088 * np.arcsin(np.sqrt(a))
+
+    print(f"{args.origins} x {args.destinations} = {pairs:,} pairs, best of {args.repeat}")
+    for metric in METRICS:
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = distance_matrix(origins, destinations, metric)
+            best = min(best, time.perf_counter() - start)
+
+        line = f"{metric:>16}: {pairs / best / 1e6:8.1f} M pairs/s ({best * 1000:.1f} ms)"
+        if metric != 'euclidean':
+            line += f", max error vs reference haversine {np.abs(result - reference).max() * 1000:.2f} m"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Live feed fan-out: latency from publish until every dashboard has the event.
+
+Subscribes N clients to the event hub, each drained by its own thread as a
+streaming response would be, then publishes position batches one at a time
+and measures the publish call and the time until the last client has read
+the frame.
+
+    python benchmarks/bench_events.py [--clients 500] [--events 200] [--positions 300]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from app.events.hub import EventHub
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--positions', type=int, default=300, help='carrier positions per event')
+    parser.add_argument('--buffer-size', type=int, default=256)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    hub = EventHub(args.buffer_size)
+    subscribers = [hub.subscribe(['carrier']) for _ in range(args.clients)]
+    done = threading.Event()
+
+    def drain(subscriber):
+        while not done.is_set():
+            subscriber.next_frames(0.1)
+
+    for subscriber in subscribers:
+        threading.Thread(target=drain, args=(subscriber,), daemon=True).start()
+
+    payload = {'positions': [
+        {'delivery_person_id': i, 'latitude': -1.28, 'longitude': 36.82, 'timestamp': 0.0} for i in range(args.positions)
+    ]}
+
+    publish_times, fanout_times = [], []
+    with app.app_context():
+        for _ in range(args.events):
+            start = time.perf_counter()
+            hub.publish('carrier', 'positions', payload)
+            published = time.perf_counter()
+            while hub.stats()['lagging']:
+                time.sleep(0.0002)
+            publish_times.append(published - start)
+            fanout_times.append(time.perf_counter() - start)
+    done.set()
+
+    publish_times = np.array(publish_times) * 1000
+    fanout_times = np.array(fanout_times) * 1000
+    print(f'{args.clients} clients, {args.events} events of {args.positions} positions')
+    print(f'publish call   p50 {np.percentile(publish_times, 50):7.2f} ms  p99 {np.percentile(publish_times, 99):7.2f} ms')
+    print(f'all delivered  p50 {np.percentile(fanout_times, 50):7.2f} ms  p99 {np.percentile(fanout_times, 99):7.2f} ms')
+    print(f'dropped        {hub.stats()["dropped"]} frames')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""The subscription lifecycle processor against a large subscription table.
+
+Seeds --rows subscriptions in a SQLite file: a quarter pending with their
+week of notice over (requested over the last --days days), a quarter
+subscribed with an end_date in the past, the rest not due. Runs
+process_subscriptions, checks it moved exactly the due rows and that a
+second run moves none, and reports the time, rows per second and the
+process's peak memory.
+
+    python benchmarks/bench_lifecycle.py [--rows 1000000] [--chunk-size 5000]
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import warnings
+from datetime import date, timedelta
+
+workdir = tempfile.mkdtemp()
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'lifecycle.db')
+os.environ['TELEMETRY_FLUSH_INTERVAL'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from sqlalchemy.exc import SAWarning
+
+from app import create_app
+from app.extensions import db
+from app.models import Customer, Publication, Subscription
+from app.subscription.lifecycle import NOTICE, process_subscriptions
+
+# the models' overlapping relationships warn on every mapper configuration
+warnings.filterwarnings('ignore', category=SAWarning)
+
+TODAY = date(2025, 9, 1)
+
+
+def subscription(i, days):
+    kind = i % 4
+    if kind == 0:
+        # pending, notice over
+        return 'pending', None, None, TODAY - NOTICE - timedelta(days=i % days)
+    if kind == 1:
+        # subscribed, ended
+        return 'subscribed', date(2024, 1, 1), TODAY - timedelta(days=1 + i % days), date(2023, 12, 25)
+    if kind == 2:
+        # pending, still within its notice
+        return 'pending', None, None, TODAY - timedelta(days=i % 7)
+    # subscribed, open-ended
+    return 'subscribed', date(2024, 1, 1), None, date(2023, 12, 25)
+
+
+def seed(count, days):
+    db.session.execute(db.insert(Publication.__table__), [{'title': f'Title {i}', 'type': 'newspaper'} for i in range(20)])
+    customers = count // 5
+    db.session.execute(db.insert(Customer.__table__), [
+        {'name': f'customer {i}', 'address': f'{i} Moi Avenue', 'phone': f'07{i:08d}'} for i in range(customers)
+    ])
+    for start in range(0, count, 100_000):
+        db.session.execute(db.insert(Subscription.__table__), [
+            dict(
+                zip(('status', 'start_date', 'end_date', 'requested_change_date'), subscription(i, days)),
+                customer_id=i % customers + 1, publication_id=i % 20 + 1, change_approved=False
+            )
+            for i in range(start, min(count, start + 100_000))
+        ])
+    db.session.commit()
+
+
+def by_status():
+    return dict(db.session.execute(db.select(Subscription.status, func.count()).group_by(Subscription.status)).all())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--days', type=int, default=30, help='spread of the due dates')
+    parser.add_argument('--chunk-size', type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        seed(args.rows, args.days)
+        print(f'seeded {args.rows} subscriptions in {time.perf_counter() - started:.1f}s: {by_status()}')
+        db.session.remove()
+
+        memory_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        counts = process_subscriptions(TODAY, args.chunk_size)
+        elapsed = time.perf_counter() - started
+        memory_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        moved = sum(counts.values())
+        print(f'processed in {elapsed:.1f}s ({moved / elapsed:.0f} rows/s): {counts}')
+        print(f'peak RSS {memory_after / 1024:.0f} MiB ({(memory_after - memory_before) / 1024:+.0f} MiB during the run)')
+        print(f'after: {by_status()}')
+
+        failures = []
+        expected = {'activated': (args.rows + 3) // 4, 'expired': (args.rows + 2) // 4}
+        if counts != expected:
+            failures.append(f'expected {expected}')
+        again = process_subscriptions(TODAY, args.chunk_size)
+        if any(again.values()):
+            failures.append(f'a second run moved {again}')
+        wrong_start = db.session.scalar(
+            db.select(func.count()).where(
+                Subscription.status == 'subscribed',
+                Subscription.start_date.is_(None) | (Subscription.start_date > TODAY)
+            )
+        )
+        if wrong_start:
+            failures.append(f'{wrong_start} activated subscriptions start after {TODAY}')
+
+    for failure in failures:
+        print('FAIL', failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""bcrypt logins per second per core at each cost, and what a login storm does
+to other requests.
+
+For each --costs value, times bcrypt.checkpw on one thread (logins/s per
+core) and on one thread per core. Then replays a morning rush: --storm
+clients log in continuously through a fixed pool of request threads (an app
+server's workers) while one client times GET /carriers/ through the same
+pool, once with the configured hashing pool and queue and once effectively
+unbounded (every login hashing at once, as before).
+
+    python benchmarks/bench_login.py [--costs 4,8,10,12] [--storm 32] [--duration 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+os.environ['TELEMETRY_FLUSH_INTERVAL'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+from sqlalchemy.exc import SAWarning
+
+from app import create_app
+from app.auth.utils import hasher
+
+# the models' overlapping relationships warn on every mapper configuration
+warnings.filterwarnings('ignore', category=SAWarning)
+
+CORES = os.cpu_count() or 1
+
+
+def rate(cost, threads, seconds=2.0):
+    hashed = bcrypt.hashpw(b'password', bcrypt.gensalt(rounds=cost))
+    deadline = time.perf_counter() + seconds
+    counts = [0] * threads
+
+    def work(index):
+        while time.perf_counter() < deadline:
+            bcrypt.checkpw(b'password', hashed)
+            counts[index] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(work, range(threads)))
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def storm(app, args, workers, queue):
+    """Logins and GET /carriers/ served by a fixed pool of request threads,
+    like an app server's workers"""
+    app.config['AUTH_HASH_WORKERS'] = workers
+    app.config['AUTH_HASH_QUEUE'] = queue
+    hasher.init_app(app)
+
+    server = ThreadPoolExecutor(args.server_threads)
+    deadline = time.perf_counter() + args.duration
+    logins, latencies = [], []
+
+    def log_in():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            response = server.submit(
+                client.post, '/auth/login', json={'email': 'staff@example.com', 'password': 'password'}
+            ).result()
+            logins.append(response.status_code)
+            if response.status_code == 503:
+                time.sleep(float(response.headers['Retry-After']))
+
+    def browse():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            server.submit(client.get, '/carriers/').result()
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=log_in) for _ in range(args.storm)] + [threading.Thread(target=browse)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+
+    latencies.sort()
+    return {
+        'logins': logins.count(200) / args.duration,
+        'busy': logins.count(503),
+        'p50': statistics.median(latencies) * 1000,
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--costs', default='4,8,10,12')
+    parser.add_argument('--storm', type=int, default=32, help='clients logging in at once')
+    parser.add_argument('--server-threads', type=int, default=16, help='request threads of the simulated server')
+    parser.add_argument('--storm-cost', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f'{CORES} cores')
+    print(f'{"cost":>4} {"logins/s/core":>14} {"logins/s, all cores":>20}')
+    for cost in [int(cost) for cost in args.costs.split(',')]:
+        print(f'{cost:4} {rate(cost, 1):14.1f} {rate(cost, CORES):20.1f}')
+
+    app = create_app()
+    app.config['BCRYPT_LOG_ROUNDS'] = args.storm_cost
+    hasher.init_app(app)
+    client = app.test_client()
+    client.post('/auth/register', json={'email': 'staff@example.com', 'password': 'password'})
+    for i in range(20):
+        client.post('/carriers/', json={'name': f'carrier {i}'})
+
+    print(f'\n{args.storm} clients logging in at cost {args.storm_cost} for {args.duration:.0f}s on '
+          f'{args.server_threads} request threads, GET /carriers/ timed alongside')
+    print(f'{"hashing":30} {"logins/s":>9} {"503s":>6} {"p50 ms":>8} {"p99 ms":>8}')
+    settings = (
+        (f'{CORES} per core, {app.config["AUTH_HASH_QUEUE"]} queued (default)', CORES, app.config['AUTH_HASH_QUEUE']),
+        ('unbounded (as before)', args.storm, args.storm)
+    )
+    for label, workers, queue in settings:
+        result = storm(app, args, workers, queue)
+        print(f'{label:30} {result["logins"]:9.1f} {result["busy"]:6} {result["p50"]:8.1f} {result["p99"]:8.1f}')
+
+
+if __name__ == '__main__':
+    main()
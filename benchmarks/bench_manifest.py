@@ -0,0 +1,143 @@
+"""Generating a day's delivery manifest from the subscriptions.
+
+Seeds --customers customers, each at one of --locations locations with one to
+three subscriptions (a tenth of the customers' subscriptions have ended),
+in a SQLite file. Times generate_manifest for one day and counts its SQL
+statements, checks the stops and links against the subscriptions, and
+checks that a second run creates nothing. For comparison, times creating
+--sample of the same stops one POST /deliveries/ at a time, the way they
+had to be entered before.
+
+    python benchmarks/bench_manifest.py [--customers 100000] [--locations 20000] [--sample 1000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+from datetime import date
+
+workdir = tempfile.mkdtemp()
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'manifest.db')
+os.environ['TELEMETRY_FLUSH_INTERVAL'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from sqlalchemy.exc import SAWarning
+
+from app import create_app
+from app.delivery.manifest import generate_manifest
+from app.extensions import db
+from app.models import Customer, DeliveryAssignment, DeliveryAssignmentPublication, Location, Publication, Subscription
+
+# the models' overlapping relationships warn on every mapper configuration
+warnings.filterwarnings('ignore', category=SAWarning)
+
+DAY = date(2025, 9, 1)
+PUBLICATIONS = 10
+
+
+def seed(customers, locations):
+    db.session.execute(db.insert(Publication.__table__), [
+        {'title': f'Title {i}', 'type': 'newspaper'} for i in range(PUBLICATIONS)
+    ])
+    db.session.execute(db.insert(Location.__table__), [
+        {'latitude': -1.2 + i % 200 / 1000, 'longitude': 36.7 + i // 200 / 1000, 'address': f'{i} Road',
+         'city': 'Nairobi', 'postal_code': '00100'}
+        for i in range(locations)
+    ])
+    db.session.execute(db.insert(Customer.__table__), [
+        {'name': f'customer {i}', 'address': f'{i % locations} Road', 'phone': f'07{i:08d}', 'location_id': i % locations + 1}
+        for i in range(customers)
+    ])
+    subscriptions = [
+        {
+            'customer_id': i + 1, 'publication_id': (i + k) % PUBLICATIONS + 1, 'status': 'subscribed',
+            'start_date': date(2025, 1, 1), 'end_date': date(2025, 6, 30) if (i + k) % 10 == 0 else None,
+            'requested_change_date': date(2024, 12, 25), 'change_approved': True
+        }
+        for i in range(customers) for k in range(i % 3 + 1)
+    ]
+    for start in range(0, len(subscriptions), 100_000):
+        db.session.execute(db.insert(Subscription.__table__), subscriptions[start:start + 100_000])
+    db.session.commit()
+    return len(subscriptions)
+
+
+def expected():
+    """(stops, publication links) for DAY, counted independently"""
+    live = db.select(Subscription.customer_id, Subscription.publication_id).distinct().where(
+        Subscription.status == 'subscribed', Subscription.is_active(DAY)
+    ).subquery()
+    return (
+        db.session.scalar(db.select(func.count(func.distinct(live.c.customer_id)))),
+        db.session.scalar(db.select(func.count()).select_from(live))
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--customers', type=int, default=100_000)
+    parser.add_argument('--locations', type=int, default=20_000)
+    parser.add_argument('--sample', type=int, default=1000, help='stops created one POST at a time')
+    args = parser.parse_args()
+
+    app = create_app()
+    # imported late: query_count points SQLALCHEMY_DATABASE_URI at an
+    # in-memory database on import, which must not reach the app's config
+    from query_count import count_queries
+
+    failures = []
+    with app.app_context():
+        subscriptions = seed(args.customers, args.locations)
+        stops, links = expected()
+        print(f'{args.customers} customers, {subscriptions} subscriptions; {stops} stops and {links} publications due on {DAY}')
+
+        with count_queries(db.engine) as statements:
+            started = time.perf_counter()
+            counts = generate_manifest(DAY)
+            elapsed = time.perf_counter() - started
+        print(f'generate_manifest: {elapsed:.2f}s, {len(statements)} statements, {counts["stops"] / elapsed:.0f} stops/s: {counts}')
+        if (counts['stops'], counts['location_links'], counts['publication_links']) != (stops, stops, links):
+            failures.append(f'expected {stops} stops and {links} publication links')
+
+        started = time.perf_counter()
+        again = generate_manifest(DAY)
+        print(f'second run: {time.perf_counter() - started:.2f}s: {again}')
+        if again['stops'] or again['location_links'] or again['publication_links']:
+            failures.append('the second run created rows')
+        totals = (
+            db.session.scalar(db.select(func.count()).select_from(DeliveryAssignment)),
+            db.session.scalar(db.select(func.count()).select_from(DeliveryAssignmentPublication))
+        )
+        if totals != (stops, links):
+            failures.append(f'{totals[0]} stops and {totals[1]} publication links stored')
+
+        sample = db.session.execute(
+            db.select(Subscription.customer_id, Customer.location_id, func.group_concat(Subscription.publication_id))
+            .join(Customer, Customer.id == Subscription.customer_id)
+            .where(Subscription.status == 'subscribed', Subscription.is_active(DAY))
+            .group_by(Subscription.customer_id, Customer.location_id)
+            .limit(args.sample)
+        ).all()
+        db.session.remove()
+
+    client = app.test_client()
+    started = time.perf_counter()
+    for _, location_id, publication_ids in sample:
+        client.post('/deliveries/', json={
+            'date': '2025-09-02', 'location_ids': [location_id],
+            'publication_ids': [int(publication_id) for publication_id in publication_ids.split(',')]
+        })
+    elapsed = time.perf_counter() - started
+    rate = len(sample) / elapsed
+    print(f'one POST per stop: {rate:.0f} stops/s, {stops / rate:.0f}s for the whole day')
+
+    for failure in failures:
+        print('FAIL', failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
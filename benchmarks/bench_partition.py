@@ -0,0 +1,131 @@
+"""Partitioned assignment (app/delivery/partition.py) against one city-wide pass.
+
+Builds a synthetic city of --drops deliveries at distinct locations and
+--carriers carriers as dispatch snapshot arrays, then times the city-wide
+greedy solver and the partitioned one over --regions spatial regions with
+1, 2, 4, ... up to --workers worker processes. Reports wall time, speed-up
+over the city-wide pass and over one worker, the total carrier-to-drop
+distance and the largest load, and checks that every drop is assigned and
+no carrier is over capacity. Small days, with fewer drops than carriers
+and regions left without drops, are checked the same way first.
+
+    python benchmarks/bench_partition.py [--drops 100000] [--carriers 500] [--regions 8] [--workers 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.delivery.dispatch import CARRIER_DTYPE, DELIVERY_DTYPE, UNASSIGNED
+from app.delivery.optimizer import coordinates, distribute_work
+from app.delivery.partition import partitioned_work, pool, spatial_groups
+from app.geo import distance_matrix
+
+METRIC = 'haversine'
+
+
+def random_points(count, rng):
+    # roughly a city-sized box around Nairobi
+    return np.column_stack([
+        rng.uniform(-1.45, -1.15, count),
+        rng.uniform(36.65, 37.05, count),
+    ])
+
+
+def snapshot(drops, carriers, rng):
+    deliveries = np.zeros(drops, dtype=DELIVERY_DTYPE)
+    deliveries['id'] = deliveries['location_id'] = np.arange(1, drops + 1)
+    deliveries['latitude'], deliveries['longitude'] = random_points(drops, rng).T
+    deliveries['carrier_id'] = UNASSIGNED
+
+    carrier_array = np.zeros(carriers, dtype=CARRIER_DTYPE)
+    carrier_array['id'] = np.arange(1, carriers + 1)
+    carrier_array['latitude'], carrier_array['longitude'] = random_points(carriers, rng).T
+    return deliveries, carrier_array
+
+
+def total_distance(deliveries, carriers, owner):
+    delivery_coords, carrier_coords = coordinates(deliveries), coordinates(carriers)
+    return sum(
+        float(distance_matrix(carrier_coords[carrier:carrier + 1], delivery_coords[owner == carrier], METRIC).sum())
+        for carrier in range(len(carriers))
+    )
+
+
+def small_days(regions, rng):
+    """Days with fewer drops than carriers leave some regions without drops"""
+    failures = []
+    for drops, carriers in ((0, 3), (1, 6), (3, 8), (5, 6)):
+        deliveries, carrier_array = snapshot(drops, carriers, rng)
+        groups, carrier_groups = spatial_groups(coordinates(deliveries), coordinates(carrier_array), regions)
+        if not drops:
+            continue
+        for strategy in ('greedy', 'balanced'):
+            owner = partitioned_work(deliveries, carrier_array, groups, strategy, 1, METRIC, carrier_group=carrier_groups)
+            loads = np.bincount(owner[owner >= 0], minlength=carriers)
+            if (owner < 0).any() or loads.max() > 1:
+                failures.append(f'{drops} drops, {carriers} carriers, {strategy}: owners {owner.tolist()}')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--drops', type=int, default=100_000)
+    parser.add_argument('--carriers', type=int, default=500)
+    parser.add_argument('--regions', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    deliveries, carriers = snapshot(args.drops, args.carriers, np.random.default_rng(0))
+    per_carrier, remaining = divmod(args.drops, args.carriers)
+    capacity = -(-args.drops // args.carriers)
+    print(f'{args.drops} drops, {args.carriers} carriers, {args.regions} regions; {os.cpu_count()} CPUs here')
+
+    failures = small_days(args.regions, np.random.default_rng(1))
+
+    def report(name, owner, elapsed, speedup=''):
+        loads = np.bincount(owner[owner >= 0], minlength=args.carriers)
+        print(f'{name:>22}: {elapsed:6.2f}s {speedup:<34} total {total_distance(deliveries, carriers, owner):7.0f} km, '
+              f'largest load {loads.max()}')
+        if (owner < 0).any():
+            failures.append(f'{name}: {np.count_nonzero(owner < 0)} drops unassigned')
+
+    started = time.perf_counter()
+    owner = distribute_work(deliveries, carriers, per_carrier, remaining, METRIC)
+    citywide = time.perf_counter() - started
+    report('city-wide greedy', owner, citywide)
+
+    groups, carrier_groups = spatial_groups(coordinates(deliveries), coordinates(carriers), args.regions)
+    workers = 1
+    single = None
+    while workers <= args.workers:
+        pool.shutdown()
+        pool.workers = workers
+        # start the worker processes outside the timing, as a running app would have
+        partitioned_work(deliveries[:args.regions * 10], carriers, groups[:args.regions * 10], 'greedy', 10, METRIC,
+                         carrier_group=carrier_groups)
+
+        started = time.perf_counter()
+        owner = partitioned_work(deliveries, carriers, groups, 'greedy', capacity, METRIC, carrier_group=carrier_groups)
+        elapsed = time.perf_counter() - started
+        single = single or elapsed
+        report(f'partitioned, {workers} worker{"s" if workers > 1 else ""}', owner, elapsed,
+               f'({citywide / elapsed:.1f}x city-wide, {single / elapsed:.1f}x one worker)')
+
+        loads = np.bincount(owner[owner >= 0], minlength=args.carriers)
+        if loads.max() > capacity:
+            failures.append(f'{workers} workers: a carrier has {loads.max()} drops, capacity {capacity}')
+        workers *= 2
+    pool.shutdown()
+
+    for failure in failures:
+        print('FAIL', failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
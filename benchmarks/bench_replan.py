@@ -0,0 +1,108 @@
+"""Incremental re-plan after a carrier goes off shift.
+
+Seeds a day of assigned drops in an in-memory database, builds every
+carrier's route plan, then deactivates one carrier and times
+replan_stranded() as deactivate_carrier runs it, which moves only that
+carrier's drops to the nearest carriers within --slack of the even share.
+A second carrier is taken off shift without a re-plan beforehand, and its
+drops must stay where they are.
+
+    python benchmarks/bench_replan.py [--drops 50000] [--carriers 300] [--slack 0.1]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+from query_count import count_queries
+
+from app import create_app
+from app.cache import cache
+from app.delivery.dispatch import CARRIER_DTYPE, DELIVERY_DTYPE
+from app.delivery.optimizer import distribute_work
+from app.delivery.replan import replan_stranded
+from app.delivery.routing import refresh_route_plans
+from app.extensions import db
+from app.models import DeliveryAssignment, DeliveryPerson, Location, delivery_assignment_location
+
+
+def seed(drops, carriers, day):
+    random.seed(7)
+    db.drop_all()
+    db.create_all()
+    carrier_array = np.zeros(carriers, dtype=CARRIER_DTYPE)
+    carrier_array['id'] = np.arange(1, carriers + 1)
+    carrier_array['latitude'] = [-1.35 + random.random() / 5 for _ in range(carriers)]
+    carrier_array['longitude'] = [36.7 + random.random() / 5 for _ in range(carriers)]
+    deliveries = np.zeros(drops, dtype=DELIVERY_DTYPE)
+    deliveries['id'] = deliveries['location_id'] = np.arange(1, drops + 1)
+    deliveries['latitude'] = [-1.35 + random.random() / 5 for _ in range(drops)]
+    deliveries['longitude'] = [36.7 + random.random() / 5 for _ in range(drops)]
+    # each carrier holds the drops around them, as after /deliveries/assign
+    owner = distribute_work(deliveries, carrier_array, drops // carriers, drops % carriers)
+
+    db.session.execute(db.insert(DeliveryPerson), [
+        {'id': int(carrier['id']), 'name': f'carrier {carrier["id"]}', 'is_active': True,
+         'latitude': float(carrier['latitude']), 'longitude': float(carrier['longitude'])}
+        for carrier in carrier_array
+    ])
+    db.session.execute(db.insert(Location), [
+        {'id': int(delivery['id']), 'latitude': float(delivery['latitude']), 'longitude': float(delivery['longitude']),
+         'address': f'{delivery["id"]} Road'}
+        for delivery in deliveries
+    ])
+    db.session.execute(db.insert(DeliveryAssignment), [
+        {'id': i + 1, 'delivery_person_id': int(carrier_array['id'][carrier]), 'date': day}
+        for i, carrier in enumerate(owner)
+    ])
+    db.session.execute(db.insert(delivery_assignment_location), [
+        {'delivery_assignment_id': i, 'location_id': i} for i in range(1, drops + 1)
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--drops', type=int, default=50000)
+    parser.add_argument('--carriers', type=int, default=300)
+    parser.add_argument('--slack', type=float, default=0.1)
+    args = parser.parse_args()
+
+    app = create_app()
+    day = date.today()
+    with app.app_context():
+        seed(args.drops, args.carriers, day)
+
+        start = time.perf_counter()
+        refresh_route_plans([(carrier_id, day) for carrier_id in range(1, args.carriers + 1)])
+        print(f'initial plans     {time.perf_counter() - start:8.3f} s')
+
+        db.session.execute(db.update(DeliveryPerson).where(DeliveryPerson.id.in_([1, 2])).values(is_active=False))
+        db.session.commit()
+        cache.invalidate('carrier', 1)
+        cache.invalidate('carrier', 2)
+        untouched = DeliveryAssignment.query.filter_by(delivery_person_id=2).count()
+
+        with count_queries(db.engine) as statements:
+            start = time.perf_counter()
+            result = replan_stranded(day, carrier_id=1, slack=args.slack)
+            elapsed = time.perf_counter() - start
+
+        print(f'replan            {elapsed * 1000:8.1f} ms  {len(statements)} statements, '
+              f'{result["moved"]} drops to {len(result["carriers"])} carriers')
+
+        failures = []
+        if DeliveryAssignment.query.filter_by(delivery_person_id=1).count():
+            failures.append('the deactivated carrier still holds drops')
+        if DeliveryAssignment.query.filter_by(delivery_person_id=2).count() != untouched:
+            failures.append("another inactive carrier's drops moved")
+
+    for failure in failures:
+        print('FAIL', failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Rows per second turning customers and subscriptions into a JSON body.
+
+Seeds --rows customers, each with one subscription, in an in-memory database
+and times three ways of answering the whole-table listings, split into
+loading the rows, building the dicts and encoding them:
+
+    before      ORM instances (subscriptions lazy-load their customer and
+                publication), dicts built by hand, Flask's default provider
+    rows        column select, dicts built by hand from named row
+                attributes, Flask's default provider
+    serializer  column select, app.serializers.RowSerializer, the orjson
+                provider (app/json.py)
+
+Checks that the three produce the same documents.
+
+    python benchmarks/bench_serialize.py [--rows 100000] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from datetime import date
+
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+os.environ['TELEMETRY_FLUSH_INTERVAL'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy.exc import SAWarning
+
+from app import create_app
+from app.extensions import db
+from app.models import Customer, Publication, Subscription
+from app.serializers import CUSTOMER, SUBSCRIPTION, subscriptions_select
+
+# the models' overlapping relationships warn on every mapper configuration
+warnings.filterwarnings('ignore', category=SAWarning)
+
+
+def seed(count):
+    db.session.execute(db.insert(Publication), [{'title': f'Title {i}', 'type': 'newspaper'} for i in range(20)])
+    db.session.execute(db.insert(Customer), [
+        {'name': f'customer {i}', 'address': f'{i} Moi Avenue', 'phone': f'07{i:08d}'} for i in range(count)
+    ])
+    db.session.execute(db.insert(Subscription), [
+        {
+            'customer_id': i + 1, 'publication_id': i % 20 + 1, 'start_date': date(2025, 1, 1),
+            'status': 'subscribed', 'requested_change_date': date(2024, 12, 25), 'change_approved': i % 2 == 0
+        }
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def customers_before():
+    customers = Customer.query.all()
+    yield
+    yield [{'id': c.id, 'name': c.name, 'address': c.address, 'phone': c.phone} for c in customers]
+
+
+def customers_rows():
+    rows = db.session.execute(CUSTOMER.select().order_by(Customer.id)).all()
+    yield
+    yield [{'id': row.id, 'name': row.name, 'address': row.address, 'phone': row.phone} for row in rows]
+
+
+def customers_serializer():
+    rows = db.session.execute(CUSTOMER.select().order_by(Customer.id)).all()
+    yield
+    yield CUSTOMER.many(rows)
+
+
+def subscriptions_before():
+    subscriptions = Subscription.query.all()
+    yield
+    yield [
+        {
+            'id': s.id,
+            'customer_id': s.customer_id,
+            'customer_name': s.customer.name,
+            'publication_id': s.publication_id,
+            'publication_name': s.publication.title,
+            'start_date': s.start_date.isoformat() if s.start_date else None,
+            'end_date': s.end_date.isoformat() if s.end_date is not None else None,
+            'status': s.status,
+            'requested_change_date': s.requested_change_date.isoformat(),
+            'change_approved': s.change_approved
+        }
+        for s in subscriptions
+    ]
+
+
+def subscriptions_rows():
+    rows = db.session.execute(subscriptions_select().order_by(Subscription.id)).all()
+    yield
+    yield [
+        {
+            'id': row.id,
+            'customer_id': row.customer_id,
+            'customer_name': row.customer_name,
+            'publication_id': row.publication_id,
+            'publication_name': row.publication_name,
+            'start_date': row.start_date.isoformat() if row.start_date else None,
+            'end_date': row.end_date.isoformat() if row.end_date is not None else None,
+            'status': row.status,
+            'requested_change_date': row.requested_change_date.isoformat(),
+            'change_approved': row.change_approved
+        }
+        for row in rows
+    ]
+
+
+def subscriptions_serializer():
+    rows = db.session.execute(subscriptions_select().order_by(Subscription.id)).all()
+    yield
+    yield SUBSCRIPTION.many(rows)
+
+
+def measure(build, dumps, repeat):
+    """Best (load, build, encode) seconds over `repeat` runs, and the body"""
+    best = None
+    for _ in range(repeat):
+        # a fresh session each time, as in a request
+        db.session.remove()
+        steps = build()
+        started = time.perf_counter()
+        next(steps)
+        loaded = time.perf_counter()
+        items = next(steps)
+        built = time.perf_counter()
+        body = dumps(items)
+        encoded = time.perf_counter()
+        times = (loaded - started, built - loaded, encoded - built)
+        if best is None or sum(times) < sum(best):
+            best = times
+    return best, body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+    default_dumps = DefaultJSONProvider(app).dumps
+
+    with app.app_context():
+        seed(args.rows)
+
+        print(f'{args.rows} rows, best of {args.repeat}; rows/s per step and overall')
+        print(f'{"listing":14} {"method":11} {"load":>10} {"build":>10} {"encode":>10} {"total":>10} {"speedup":>8}')
+        failed = False
+        for name, methods in (
+            ('customers', (('before', customers_before), ('rows', customers_rows), ('serializer', customers_serializer))),
+            ('subscriptions', (('before', subscriptions_before), ('rows', subscriptions_rows),
+                               ('serializer', subscriptions_serializer)))
+        ):
+            baseline, documents = None, []
+            for method, build in methods:
+                dumps = app.json.dumps if method == 'serializer' else default_dumps
+                times, body = measure(build, dumps, args.repeat)
+                documents.append(orjson.loads(body))
+                total = sum(times)
+                baseline = baseline or total
+                rates = ''.join(f' {args.rows / seconds:10.0f}' for seconds in (*times, total))
+                print(f'{name:14} {method:11}{rates} {baseline / total:7.1f}x')
+            if any(document != documents[0] for document in documents):
+                print(f'FAIL {name}: the methods disagree')
+                failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
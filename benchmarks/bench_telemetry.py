@@ -0,0 +1,106 @@
+"""GPS ping ingestion: a committed UPDATE per ping against the telemetry table.
+
+Replays rounds of pings from a fleet of carriers into a SQLite file, once the
+old way (SELECT + UPDATE + COMMIT per ping) and once through the in-memory
+position table with a flush every few rounds, and reports pings per second
+and the number of database writes. Optionally appends the history file and
+reads it back.
+
+    python benchmarks/bench_telemetry.py [--carriers 300] [--rounds 10] [--flush-every 1] [--history]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+
+workdir = tempfile.mkdtemp()
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'telemetry.db')
+os.environ['TELEMETRY_FLUSH_INTERVAL'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import SAWarning
+
+from app import create_app
+from app.extensions import db
+from app.models import DeliveryPerson
+from app.telemetry.positions import positions, read_history
+
+# the models' overlapping relationships warn on every mapper configuration
+warnings.filterwarnings('ignore', category=SAWarning)
+
+
+def seed(carriers):
+    db.session.execute(db.delete(DeliveryPerson))
+    db.session.execute(db.insert(DeliveryPerson), [
+        {'id': i, 'name': f'carrier {i}', 'latitude': -1.28, 'longitude': 36.82} for i in range(1, carriers + 1)
+    ])
+    db.session.commit()
+
+
+def pings(carriers, rounds):
+    random.seed(5)
+    for round_number in range(rounds):
+        for carrier_id in range(1, carriers + 1):
+            yield carrier_id, -1.3 + random.random() / 10, 36.8 + random.random() / 10, float(round_number)
+
+
+def per_ping(carriers, rounds):
+    writes = 0
+    for carrier_id, latitude, longitude, _ in pings(carriers, rounds):
+        carrier = db.session.get(DeliveryPerson, carrier_id)
+        carrier.latitude = latitude
+        carrier.longitude = longitude
+        db.session.commit()
+        writes += 1
+    return writes
+
+
+def coalesced(carriers, rounds, flush_every):
+    writes = 0
+    for carrier_id, latitude, longitude, timestamp in pings(carriers, rounds):
+        positions.record(carrier_id, latitude, longitude, timestamp)
+        if carrier_id == carriers and int(timestamp) % flush_every == flush_every - 1:
+            positions.flush()
+            writes += 1
+    positions.flush()
+    return writes + 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--carriers', type=int, default=300)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--flush-every', type=int, default=1, help='rounds of pings per flush')
+    parser.add_argument('--history', action='store_true')
+    args = parser.parse_args()
+
+    app = create_app()
+    if args.history:
+        positions.history_path = os.path.join(workdir, 'history.bin')
+
+    total = args.carriers * args.rounds
+    with app.app_context():
+        for name, run in (('per-ping', lambda: per_ping(args.carriers, args.rounds)),
+                          ('coalesced', lambda: coalesced(args.carriers, args.rounds, args.flush_every))):
+            seed(args.carriers)
+            start = time.perf_counter()
+            writes = run()
+            elapsed = time.perf_counter() - start
+            print(f'{name:10s} {total / elapsed:10.0f} pings/s  {writes:6d} committed transactions')
+
+        db.session.expire_all()
+        last = db.session.get(DeliveryPerson, args.carriers)
+        assert positions.get(args.carriers)[:2] == (last.latitude, last.longitude)
+
+    if args.history:
+        history = read_history(positions.history_path)
+        size = os.path.getsize(positions.history_path)
+        print(f'history    {len(history)} pings in {size} bytes')
+        assert len(history) == total
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Query plans of the hot delivery and subscription endpoints.
+
+Runs each endpoint against a seeded in-memory database, collects the SQL it
+executes and asks SQLite for EXPLAIN QUERY PLAN on every statement. Exits
+non-zero if any of them scans one of the large tables instead of searching
+an index.
+
+    python benchmarks/explain_check.py [--rows 2000]
+"""
+import argparse
+import re
+import sys
+from datetime import date
+
+from query_count import count_queries, seed
+
+from app import create_app
+from app.extensions import db
+from app.models import Customer, DeliveryAssignment, Subscription, delivery_assignment_location
+
+# tables that grow with the business; everything else is small reference data
+LARGE_TABLES = {'delivery_assignment', 'delivery_assignment_location', 'delivery_assignment_publication', 'subscription'}
+
+# "SCAN delivery_assignment" (3.36+) or "SCAN TABLE delivery_assignment" (older),
+# with or without "USING [COVERING] INDEX", is a pass over the whole table
+SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+REQUESTS = [
+    ('GET', '/deliveries/daily/2025-01-01', None),
+    ('GET', '/deliveries/daily/2025-01-01?delivery_person_id=1', None),
+    ('GET', '/deliveries/person/1', None),
+    ('GET', '/deliveries/person/1?date=2025-01-01', None),
+    ('POST', '/deliveries/assign/2025-01-02', None),
+    ('POST', '/subscriptions/subscribe', {'customer_id': 1, 'publication_id': 2}),
+    ('POST', '/subscriptions/unsubscribe', {'customer_id': 2, 'publication_id': 1}),
+    ('DELETE', '/locations/3', None),
+]
+
+
+def seed_extra(count):
+    """Unassigned deliveries for the assign run, plus customers and subscriptions"""
+    start = count + 1
+    db.session.execute(db.insert(DeliveryAssignment), [
+        {'id': i, 'delivery_person_id': None, 'date': date(2025, 1, 2)} for i in range(start, start + 50)
+    ])
+    db.session.execute(db.insert(Customer), [
+        {'id': i, 'name': f'customer {i}', 'address': f'{i} Road', 'phone': str(i)} for i in range(1, count + 1)
+    ])
+    db.session.execute(db.insert(Subscription), [
+        {'customer_id': i, 'publication_id': 1, 'status': 'subscribed', 'requested_change_date': date(2025, 1, 1)}
+        for i in range(1, count + 1)
+    ])
+    db.session.execute(db.insert(delivery_assignment_location), [
+        {'delivery_assignment_id': i, 'location_id': 1 + i % count} for i in range(start, start + 50)
+    ])
+    db.session.commit()
+
+
+def plan(connection, statement, parameters):
+    cursor = connection.cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return [row[3] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+
+    failed = False
+    with app.app_context():
+        seed(args.rows)
+        seed_extra(args.rows)
+
+        for method, url, body in REQUESTS:
+            with count_queries(db.engine, with_parameters=True) as statements:
+                response = client.open(url, method=method, json=body)
+            assert response.status_code < 500, (url, response.status_code)
+
+            connection = db.engine.raw_connection()
+            scans = []
+            try:
+                for statement, parameters in statements:
+                    if not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+                        continue
+                    for detail in plan(connection, statement, parameters):
+                        match = SCAN.match(detail)
+                        if match and match.group(1) in LARGE_TABLES:
+                            scans.append((detail, ' '.join(statement.split())[:160]))
+            finally:
+                connection.close()
+
+            print(f'{method:6s} {url:55s} {len(statements):3d} statements  {"FULL SCAN" if scans else "ok"}')
+            for detail, statement in scans:
+                print(f'         {detail}\n           in: {statement}')
+            failed = failed or bool(scans)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""Latency and throughput of the WSGI and ASGI entry points under load.
+
+Seeds a SQLite file, starts the Flask dev server (run.py's WSGI app) and
+hypercorn on asgi.py against it, then has --clients concurrent keep-alive
+connections issue a mix of the read endpoints served asynchronously in ASGI
+mode for --duration seconds each, and reports p50/p99 latency and requests
+per second. Pass --wsgi-url / --asgi-url to load servers started elsewhere
+(e.g. gunicorn, or PostgreSQL behind both) instead.
+
+    python benchmarks/load_test.py [--clients 500] [--duration 20] [--mode both|wsgi|asgi]
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import warnings
+from datetime import date
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+workdir = tempfile.mkdtemp()
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(workdir, 'load.db')
+os.environ['TELEMETRY_FLUSH_INTERVAL'] = '0'
+sys.path.insert(0, ROOT)
+
+from sqlalchemy.exc import SAWarning
+
+# the models' overlapping relationships warn on every mapper configuration
+warnings.filterwarnings('ignore', category=SAWarning)
+
+DAY = date(2025, 1, 1)
+
+
+def seed(customers, carriers, locations, deliveries):
+    from app import create_app
+    from app.extensions import db
+    from app.models import Customer, DeliveryAssignment, DeliveryPerson, Location, delivery_assignment_location
+
+    app = create_app()
+    with app.app_context():
+        rng = random.Random(1)
+        db.session.execute(db.insert(Customer), [
+            {'id': i, 'name': f'customer {i}', 'address': f'{i} Moi Avenue', 'phone': f'07{i:08d}'}
+            for i in range(1, customers + 1)
+        ])
+        db.session.execute(db.insert(DeliveryPerson), [
+            {'id': i, 'name': f'carrier {i}', 'latitude': -1.28 + rng.random() / 10, 'longitude': 36.8 + rng.random() / 10}
+            for i in range(1, carriers + 1)
+        ])
+        db.session.execute(db.insert(Location), [
+            {'id': i, 'latitude': -1.28 + rng.random() / 10, 'longitude': 36.8 + rng.random() / 10, 'address': f'{i} Road'}
+            for i in range(1, locations + 1)
+        ])
+        db.session.execute(db.insert(DeliveryAssignment), [
+            {'id': i, 'date': DAY, 'delivery_person_id': rng.randint(1, carriers)} for i in range(1, deliveries + 1)
+        ])
+        db.session.execute(db.insert(delivery_assignment_location), [
+            {'delivery_assignment_id': i, 'location_id': rng.randint(1, locations)} for i in range(1, deliveries + 1)
+        ])
+        db.session.commit()
+
+
+def request_paths(args, rng):
+    while True:
+        yield rng.choice([
+            f'/customers/{rng.randint(1, args.customers)}',
+            f'/customers/?limit=50&after_id={rng.randint(0, args.customers)}',
+            '/carriers/',
+            f'/carriers/{rng.randint(1, args.carriers)}',
+            f'/locations/nearest?lat={-1.28 + rng.random() / 10}&lon={36.8 + rng.random() / 10}&k=5',
+            f'/deliveries/daily/{DAY.isoformat()}?delivery_person_id={rng.randint(1, args.carriers)}',
+            f'/deliveries/{rng.randint(1, args.deliveries)}',
+        ])
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        headers['connection'] = 'close'
+
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def client(host, port, paths, deadline, latencies, errors):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            path = next(paths)
+            started = time.perf_counter()
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n'.encode())
+            status, keep_alive = await read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            if status >= 500:
+                errors.append(status)
+            if not keep_alive:
+                writer.close()
+                writer = None
+        except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def load(url, args):
+    parts = urlsplit(url)
+    rng = random.Random(2)
+    latencies, errors = [], []
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        client(parts.hostname, parts.port, request_paths(args, random.Random(rng.random())), deadline, latencies, errors)
+        for _ in range(args.clients)
+    ])
+    return latencies, errors, time.perf_counter() - started
+
+
+def wait_until_up(url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f'server for {url} exited with {process.returncode}')
+        try:
+            urllib.request.urlopen(url + '/publications/', timeout=1)
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f'server for {url} did not come up')
+
+
+def start_server(mode, port):
+    if mode == 'wsgi':
+        command = [sys.executable, '-m', 'flask', '--app', 'run:app', 'run', '--port', str(port), '--with-threads']
+    else:
+        command = [sys.executable, '-m', 'hypercorn', 'asgi:app', '--bind', f'127.0.0.1:{port}']
+    return subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of load per mode')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--mode', choices=('both', 'wsgi', 'asgi'), default='both')
+    parser.add_argument('--wsgi-url', help='load this server instead of starting the dev server')
+    parser.add_argument('--asgi-url', help='load this server instead of starting hypercorn')
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--carriers', type=int, default=100)
+    parser.add_argument('--locations', type=int, default=5000)
+    parser.add_argument('--deliveries', type=int, default=10000)
+    args = parser.parse_args()
+
+    if not (args.wsgi_url and args.asgi_url):
+        seed(args.customers, args.carriers, args.locations, args.deliveries)
+
+    modes = ('wsgi', 'asgi') if args.mode == 'both' else (args.mode,)
+    print(f'{args.clients} clients, {args.duration:.0f}s per mode')
+    print(f'{"mode":6} {"requests":>9} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+
+    for port, mode in enumerate(modes, start=8761):
+        url = getattr(args, f'{mode}_url')
+        process = None
+        if not url:
+            url = f'http://127.0.0.1:{port}'
+            process = start_server(mode, port)
+        try:
+            wait_until_up(url, process)
+            if args.warmup:
+                asyncio.run(load(url, argparse.Namespace(**dict(vars(args), duration=args.warmup))))
+            latencies, errors, elapsed = asyncio.run(load(url, args))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+        latencies.sort()
+        if not latencies:
+            print(f'{mode:6} no successful requests; {len(errors)} errors')
+            continue
+        print(f'{mode:6} {len(latencies):9} {len(latencies) / elapsed:8.0f} '
+              f'{percentile(latencies, 0.5) * 1000:8.1f} {percentile(latencies, 0.99) * 1000:8.1f} {len(errors):7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Read-replica routing against two SQLite replicas of a SQLite primary.
+
+"Replication" is a copy of the primary file made with SQLite's backup API
+whenever the script says so, which makes replica lag easy to observe. Checks
+that GETs read from the replicas in turn, writes and the writer's next reads
+stay on the primary, recently written entities are read from the primary, a
+replica that breaks is skipped and comes back once it works again. Exits
+non-zero if any check fails.
+
+    python benchmarks/replica_check.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import warnings
+
+workdir = tempfile.mkdtemp()
+PRIMARY = os.path.join(workdir, 'primary.db')
+REPLICAS = [os.path.join(workdir, f'replica{i}.db') for i in (1, 2)]
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + PRIMARY
+os.environ['SQLALCHEMY_REPLICA_URIS'] = ','.join('sqlite:///' + path for path in REPLICAS)
+os.environ['REPLICA_LAG_WINDOW'] = '1'
+os.environ['REPLICA_RETRY_INTERVAL'] = '1'
+os.environ['TELEMETRY_FLUSH_INTERVAL'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import SAWarning
+
+from app import create_app
+from app.extensions import db
+from app.replicas import replicas
+
+# the models' overlapping relationships warn on every mapper configuration
+warnings.filterwarnings('ignore', category=SAWarning)
+
+failures = []
+
+
+def check(label, condition):
+    print(f'{"ok  " if condition else "FAIL"} {label}')
+    if not condition:
+        failures.append(label)
+
+
+def replicate():
+    with sqlite3.connect(PRIMARY) as source:
+        for path in REPLICAS:
+            with sqlite3.connect(path) as target:
+                source.backup(target)
+
+
+def reads():
+    return [replica.reads for replica in replicas.replicas]
+
+
+def primary_statements(client, *args, **kwargs):
+    """(response, number of statements the primary ran for it)"""
+    # imported late: query_count points SQLALCHEMY_DATABASE_URI at an
+    # in-memory database on import, which must not reach the app's config
+    from query_count import count_queries
+    with app.app_context():
+        engine = db.engine
+    with count_queries(engine) as statements:
+        response = client.open(*args, **kwargs)
+    return response, len(statements)
+
+
+app = create_app()
+reader = app.test_client()
+writer = app.test_client()
+
+for i in range(5):
+    writer.post('/locations/', json={'latitude': -1.28, 'longitude': 36.8 + i / 100, 'address': f'{i} Road'})
+    writer.post('/customers/', json={'name': f'customer {i}', 'address': f'{i} Road', 'phone': str(i)})
+replicate()
+time.sleep(1.1)
+
+before = reads()
+response, on_primary = primary_statements(reader, '/customers/')
+check('GET /customers/ reads from a replica', response.status_code == 200 and on_primary == 0 and sum(reads()) > sum(before))
+primary_statements(reader, '/customers/1')
+after = reads()
+check('consecutive GETs alternate between the replicas', all(count > 0 for count in after))
+
+response, on_primary = primary_statements(writer, '/customers/', method='POST', json={'name': 'new', 'address': 'x', 'phone': 'new'})
+check('POST writes to the primary', response.status_code == 201 and on_primary > 0)
+new_id = response.json['id']
+
+response, on_primary = primary_statements(writer, f'/customers/{new_id}')
+check("the writer reads its own write from the primary", response.status_code == 200 and on_primary > 0)
+
+other = app.test_client()
+response, on_primary = primary_statements(other, f'/customers/{new_id}')
+check('a recently written entity is read from the primary by everyone', response.status_code == 200 and on_primary > 0)
+
+response, on_primary = primary_statements(other, '/locations/?limit=10')
+check('entities not written lately still read from a replica', response.status_code == 200 and on_primary == 0)
+
+time.sleep(1.1)
+response, on_primary = primary_statements(other, f'/customers/{new_id}')
+check('after the lag window, an unreplicated row is missing on the replica', response.status_code == 404 and on_primary == 0)
+replicate()
+response = other.get(f'/customers/{new_id}')
+check('and present once replicated', response.status_code == 200)
+
+# lose the second replica: its next connection opens an empty file
+os.remove(REPLICAS[1])
+replicas.replicas[1].engine.dispose()
+statuses = [other.get('/customers/').status_code for _ in range(4)]
+check('a broken replica fails one request and is then skipped', statuses.count(500) == 1 and statuses[-2:] == [200, 200])
+check('and is reported unhealthy', not replicas.replicas[1].healthy)
+
+replicate()
+time.sleep(1.1)
+before = reads()
+statuses = [other.get('/customers/').status_code for _ in range(4)]
+check('it rejoins after the retry interval once it answers again',
+      statuses == [200] * 4 and replicas.replicas[1].healthy and reads()[1] > before[1])
+
+sys.exit(1 if failures else 0)
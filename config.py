@@ -8,4 +8,98 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///fallback.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     DEBUG = os.getenv('DEBUG', 'False') == 'True'
-    SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
\ No newline at end of file
+    SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
+
+    # password hashing: bcrypt cost of new hashes (4-31; each step doubles the
+    # work), threads that hash at once (0 = one per core) and how many more
+    # logins may wait for one before the rest get 503; see app/auth/utils.py
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', '12'))
+    AUTH_HASH_WORKERS = int(os.getenv('AUTH_HASH_WORKERS', '0'))
+    AUTH_HASH_QUEUE = int(os.getenv('AUTH_HASH_QUEUE', '8'))
+
+    # connection pool: sizing applies to server databases and SQLite files,
+    # pre-ping and recycle (seconds) to server databases only; see app/engine.py
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True') == 'True'
+
+    # read replicas: comma-separated URIs that GET requests read from, round-robin.
+    # Writers and entities written in the last REPLICA_LAG_WINDOW seconds read
+    # from the primary; a failing replica is retried after REPLICA_RETRY_INTERVAL
+    # seconds. See app/replicas.py
+    SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in os.getenv('SQLALCHEMY_REPLICA_URIS', '').split(',') if uri.strip()]
+    REPLICA_LAG_WINDOW = float(os.getenv('REPLICA_LAG_WINDOW', '5'))
+    REPLICA_RETRY_INTERVAL = float(os.getenv('REPLICA_RETRY_INTERVAL', '10'))
+
+    # pragmas set on every SQLite connection; busy_timeout in milliseconds,
+    # mmap_size in bytes, a negative cache_size in KiB
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '15000'))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '-64000'))
+
+    # grid cell size (degrees) of the in-process location index
+    LOCATION_INDEX_CELL_SIZE = float(os.getenv('LOCATION_INDEX_CELL_SIZE', '0.01'))
+
+    # haversine, equirectangular or euclidean (raw degrees); see app/geo.py
+    DISTANCE_METRIC = os.getenv('DISTANCE_METRIC', 'haversine')
+
+    # deliveries the assignment solver treats as one stop: same location,
+    # same coordinates rounded to STOP_COORDINATE_PRECISION decimal places
+    # (4 is about 11 m), or none; see app/delivery/optimizer.py
+    STOP_CONSOLIDATION = os.getenv('STOP_CONSOLIDATION', 'location')
+    STOP_COORDINATE_PRECISION = int(os.getenv('STOP_COORDINATE_PRECISION', '4'))
+
+    # incremental re-plan on carrier activate/deactivate: how far (a fraction)
+    # above the day's even share a carrier may be filled with another's drops,
+    # so they go to the nearest carriers; see app/delivery/replan.py
+    REPLAN_CAPACITY_SLACK = float(os.getenv('REPLAN_CAPACITY_SLACK', '0.1'))
+
+    # partitioned assignment: how deliveries are grouped by default (none, city,
+    # postal_code or spatial), the spatial regions per day and the worker
+    # processes solving the groups (1 = in the request); see app/delivery/partition.py
+    DISPATCH_PARTITION = os.getenv('DISPATCH_PARTITION', 'none')
+    DISPATCH_REGIONS = int(os.getenv('DISPATCH_REGIONS', str(os.cpu_count() or 1)))
+    DISPATCH_WORKERS = int(os.getenv('DISPATCH_WORKERS', str(os.cpu_count() or 1)))
+
+    # keyset pagination (?limit=&after_id=) and streaming (?stream=) on list endpoints; see app/pagination.py
+    PAGE_SIZE = int(os.getenv('PAGE_SIZE', '100'))
+    MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '1000'))
+    STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', '1000'))
+
+    # subscription lifecycle (pending -> subscribed, expiry): rows per UPDATE and
+    # seconds between runs in a background thread of each app process (0 = only
+    # when run with `flask subscription process`); see app/subscription/lifecycle.py
+    SUBSCRIPTION_LIFECYCLE_CHUNK_SIZE = int(os.getenv('SUBSCRIPTION_LIFECYCLE_CHUNK_SIZE', '5000'))
+    SUBSCRIPTION_LIFECYCLE_INTERVAL = float(os.getenv('SUBSCRIPTION_LIFECYCLE_INTERVAL', '0'))
+
+    # rows per transaction (and per IN list) for the POST /<resource>/bulk endpoints
+    BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '1000'))
+
+    # reference-data cache: memory (per-process LRU), redis or none; see app/cache.py
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_TTL = int(os.getenv('CACHE_TTL', '300'))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '10000'))
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    # conditional GETs (ETag / 304) need entity versions every worker sees:
+    # the redis backend, or set this when the app runs as one process
+    CACHE_SINGLE_PROCESS = os.getenv('CACHE_SINGLE_PROCESS', 'False') == 'True'
+
+    # GPS pings are kept in memory and written to delivery_persons every
+    # TELEMETRY_FLUSH_INTERVAL seconds (0 disables the background flusher);
+    # set TELEMETRY_HISTORY_PATH to also append every ping to that file. See app/telemetry/positions.py
+    TELEMETRY_FLUSH_INTERVAL = float(os.getenv('TELEMETRY_FLUSH_INTERVAL', '5'))
+    TELEMETRY_HISTORY_PATH = os.getenv('TELEMETRY_HISTORY_PATH', '')
+    TELEMETRY_MAX_PINGS = int(os.getenv('TELEMETRY_MAX_PINGS', '10000'))
+
+    # live feed (GET /events): frames a client may fall behind before it is
+    # told to resync, and seconds between keepalive comments; see app/events/hub.py
+    EVENTS_BUFFER_SIZE = int(os.getenv('EVENTS_BUFFER_SIZE', '256'))
+    EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', '15'))
+
+    # database for the async views of the ASGI entry point (asgi.py); by default
+    # SQLALCHEMY_DATABASE_URI with its async driver (aiosqlite, asyncpg). See app/asgi
+    ASYNC_SQLALCHEMY_DATABASE_URI = os.getenv('ASYNC_SQLALCHEMY_DATABASE_URI', '')
@@ -1,6 +1,9 @@
 from app import create_app
 
-app = create_app()
+# the dispatch worker processes (app/delivery/partition.py) import the entry
+# module again as __mp_main__; they need no app, its threads or its connections
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)